@@ -1,10 +1,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import random
+
+from utils.config import HISTORY_DAYS, LIVE_INTERVAL, SAMPLE_DAYS, SEED
+from utils.data_sources import SCHEMAS, current_version, get_source, shared_dataset
+from utils.downsampling import FULL_WIDTH_PX, HALF_WIDTH_PX, downsample
+from utils.figures import make_figure
+from utils.kpis import KpiEngine, format_change, format_difference
+from utils.live import LiveFeed, LiveState, SyntheticEvents, patch_figure
+from utils.profiler import render_sidebar_summary, start_fragment_run, start_run
+from utils.registry import time_slice
+from utils.result_cache import cached_result
+from utils.startup import lazy_import
+from utils.table_index import SortedTable
+
+# Imported when a chart skeleton is first built (utils.startup)
+px = lazy_import('plotly.express')
 
 st.set_page_config(
     page_title="Dashboard Demo",
@@ -12,6 +25,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+run = start_run('app')
 
 st.title("📊 Dashboard Streamlit Demo")
 st.markdown("---")
@@ -20,7 +34,8 @@ st.markdown("---")
 st.sidebar.header("Paramètres")
 date_range = st.sidebar.date_input(
     "Période d'analyse",
-    value=[datetime.now() - timedelta(days=30), datetime.now()],
+    value=[datetime.now() - timedelta(days=SAMPLE_DAYS - 1), datetime.now()],
+    min_value=datetime.now() - timedelta(days=HISTORY_DAYS - 1),
     max_value=datetime.now()
 )
 
@@ -29,169 +44,359 @@ metric_type = st.sidebar.selectbox(
     ["Ventes", "Utilisateurs", "Revenus", "Conversions"]
 )
 
-# Generate sample data
-@st.cache_data
-def generate_sample_data(days=30):
-    dates = pd.date_range(start=datetime.now() - timedelta(days=days), end=datetime.now(), freq='D')
-    data = []
+live_mode = st.sidebar.toggle(
+    "⚡ Mode temps réel",
+    value=False,
+    help=f"Intègre les nouveaux événements toutes les {LIVE_INTERVAL:g} s (DASHBOARD_LIVE_INTERVAL)"
+)
+
+# Goals of the period
+SALES_GOAL = 2000
+REVENUE_GOAL = 80000
+
+# Sample data, read from the shared data source (utils.data_sources, synthetic
+# by default) and refreshed in the background. The source keeps twice
+# SAMPLE_DAYS of history for the period-over-period deltas of the metrics;
+# charts and table show the last SAMPLE_DAYS, a view of the rows that every
+# session shares (utils.registry). Older periods, back to HISTORY_DAYS, are
+# read from the time partitions of the source (only those they overlap)
+source = get_source()
+
+with run.section('data'):
+    data_version = current_version('sample')
+    history = shared_dataset('sample')
+    df = history.tail(SAMPLE_DAYS)
+    kpis = cached_result(
+        'app/kpis', data_version, lambda: KpiEngine.from_frame(history.frame, 'date', SCHEMAS['sample'][1])
+    )
+    # Rolling means of the history, extended point by point by the source
+    rolling = cached_result('app/rolling', data_version, lambda: source.rolling('sample'))
+
+# Sort orders of the detail table, rebuilt only when the data changes
+@st.cache_resource(max_entries=2)
+def get_sorted_table(data_version):
+    return SortedTable(df, ['date', 'ventes', 'utilisateurs', 'revenus'])
 
-    for date in dates:
-        data.append({
-            'date': date,
-            'ventes': random.randint(50, 200),
-            'utilisateurs': random.randint(100, 500),
-            'revenus': round(random.uniform(1000, 5000), 2),
-            'conversions': round(random.uniform(2, 8), 2)
-        })
+# The selected period is the visible window of the time-series charts: each
+# trace is cut to about one point per pixel of that window
+view_range = None
+if len(date_range) == 2:
+    view_range = (pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]) + pd.Timedelta(days=1))
 
-    return pd.DataFrame(data)
+# Rows of the time-series charts: those of a selected period that starts
+# before the last SAMPLE_DAYS come from the partitions
+period_df = df
+if view_range is not None and view_range[0] < df['date'].iloc[0]:
+    with run.section('data'):
+        period_df = cached_result('app/period', (data_version, view_range), lambda: source.frame('sample', *view_range))
 
-df = generate_sample_data()
+# Main metrics over the selected period (the last SAMPLE_DAYS by default),
+# compared with the period of the same length just before it
+with run.section('metrics'):
+    kpi_range = view_range or (df['date'].iloc[0], df['date'].iloc[-1] + pd.Timedelta(days=1))
+    previous_start = kpi_range[0] - (kpi_range[1] - kpi_range[0])
+    if previous_start < history.frame['date'].iloc[0]:
+        kpis = cached_result(
+            'app/period_kpis', (data_version, kpi_range),
+            lambda: KpiEngine.from_frame(source.frame('sample', previous_start, kpi_range[1]), 'date', SCHEMAS['sample'][1])
+        )
+    kpi = kpis.compare(*kpi_range, {'ventes': 'sum', 'utilisateurs': 'mean', 'revenus': 'sum', 'conversions': 'mean'})
 
-# Main metrics
 col1, col2, col3, col4 = st.columns(4)
 
-with col1:
-    total_sales = df['ventes'].sum()
+with col1, run.section('metrics'):
+    total_sales = kpi['ventes']['value']
     st.metric(
         label="Ventes Totales",
-        value=f"{total_sales:,}",
-        delta=f"+{random.randint(5, 15)}%"
+        value=f"{total_sales:,.0f}",
+        delta=format_change(kpi['ventes'])
     )
 
-with col2:
-    avg_users = df['utilisateurs'].mean()
+with col2, run.section('metrics'):
+    avg_users = kpi['utilisateurs']['value'] or 0
     st.metric(
         label="Utilisateurs Moyens",
         value=f"{avg_users:.0f}",
-        delta=f"+{random.randint(2, 10)}%"
+        delta=format_change(kpi['utilisateurs'])
     )
 
-with col3:
-    total_revenue = df['revenus'].sum()
+with col3, run.section('metrics'):
+    total_revenue = kpi['revenus']['value']
     st.metric(
         label="Revenus Totaux",
         value=f"${total_revenue:,.2f}",
-        delta=f"+{random.randint(8, 20)}%"
+        delta=format_change(kpi['revenus'])
     )
 
-with col4:
-    avg_conversion = df['conversions'].mean()
+with col4, run.section('metrics'):
+    avg_conversion = kpi['conversions']['value'] or 0
     st.metric(
         label="Taux Conversion Moyen",
         value=f"{avg_conversion:.1f}%",
-        delta=f"+{random.uniform(0.1, 0.5):.1f}%"
+        delta=format_difference(kpi['conversions'], '{:+.1f} pt')
     )
 
 st.markdown("---")
 
-# Charts
+def render_goals(total_sales, total_revenue):
+    # Progress bars for goals
+    sales_progress = min(total_sales / SALES_GOAL, 1.0)
+    revenue_progress = min(total_revenue / REVENUE_GOAL, 1.0)
+
+    st.markdown("**Objectif Ventes**")
+    st.progress(sales_progress)
+    st.write(f"{total_sales:,.0f} / {SALES_GOAL:,} ({sales_progress:.1%})")
+
+    st.markdown("**Objectif Revenus**")
+    st.progress(revenue_progress)
+    st.write(f"${total_revenue:,.0f} / ${REVENUE_GOAL:,} ({revenue_progress:.1%})")
+
+# Live mode: one event feed per process, shared by every session and seeded
+# with the days of the batch data (again after each refresh of it). Events
+# (synthetic here, in place of a real queue or socket) are folded into running
+# totals; the panel below is a fragment redrawn every LIVE_INTERVAL seconds on
+# its own, which only patches the days that changed into the figure of the
+# session. The producer runs while sessions in live mode drain the feed
+@st.cache_resource
+def get_live_feed():
+    feed = LiveFeed(LiveState(df, SAMPLE_DAYS), base=data_version)
+    feed.events = SyntheticEvents(feed, seed=SEED)
+    return feed
+
+def build_fig_live(state):
+    days = state.frame()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=days['date'], y=days['revenus'], mode='lines+markers', name='Revenus',
+        line=dict(color='#2ca02c', width=3), marker=dict(size=6)
+    ))
+    fig.add_trace(go.Scatter(
+        x=days['date'], y=days['tendance'], mode='lines', name='Moyenne mobile (7j)',
+        line=dict(color='#d62728', width=2, dash='dash')
+    ))
+    fig.update_layout(title="Revenus quotidiens en direct", xaxis_title="Date", yaxis_title="Revenus ($)", height=400)
+    return fig
+
+def live_figure(state):
+    drawn = st.session_state.get('live_figure')
+    if drawn is None or drawn[0] is not state:
+        version, _ = state.snapshot()
+        fig = build_fig_live(state)
+    else:
+        _, fig, since = drawn
+        version, changes, first = state.changes(since)
+        patch_figure(fig, changes, ['revenus', 'tendance'], first)
+    st.session_state['live_figure'] = (state, fig, version)
+    return fig
+
+@st.fragment(run_every=LIVE_INTERVAL)
+def render_live():
+    live_run = start_fragment_run('app', 'live')
+    feed = get_live_feed()
+
+    with live_run.section('drain'):
+        # The fragment reruns alone: the batch data may have been refreshed since the page ran
+        state = feed.rebase(
+            current_version('sample'), lambda: LiveState(shared_dataset('sample').tail(SAMPLE_DAYS), SAMPLE_DAYS)
+        )
+        feed.drain()
+        feed.events.start()
+        _, totals = state.snapshot()
+        stats = feed.stats()
+
+    with live_run.section('metrics'):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric(f"Ventes ({SAMPLE_DAYS} j)", f"{totals['ventes']:,.0f}")
+        with col2:
+            st.metric(f"Revenus ({SAMPLE_DAYS} j)", f"${totals['revenus']:,.2f}")
+        with col3:
+            st.metric("Événements reçus", f"{stats['received']:,}")
+        with col4:
+            st.metric(
+                "En file d'attente",
+                f"{stats['queued']:,}",
+                help=f"{stats['coalesced']:,} événements regroupés faute de place dans la file"
+            )
+
+    col1, col2 = st.columns([2, 1])
+    with col1, live_run.section('fig_live'):
+        live_run.plotly_chart('fig_live', live_figure(state), use_container_width=True)
+    with col2, live_run.section('goals'):
+        st.subheader("🎯 Objectifs")
+        render_goals(totals['ventes'], totals['revenus'])
+
+    live_run.finish()
+
+if live_mode:
+    st.subheader("⚡ Temps réel")
+    with run.section('live'):
+        render_live()
+    st.markdown("---")
+
+# Charts are rebuilt only when their inputs change (data refresh, period);
+# other widgets and other sessions reuse the figures of the shared result cache.
+# A rebuild only attaches the new arrays to the chart's skeleton (utils.figures)
+
+def build_fig_sales():
+    points = downsample(period_df, 'date', 'ventes', HALF_WIDTH_PX, x_range=view_range, method='minmax')
+    trend = time_slice(rolling, 'date', view_range[0] if view_range is not None else df['date'].iloc[0])
+
+    def build():
+        fig = px.line(
+            points,
+            x='date',
+            y='ventes',
+            title="Ventes par jour",
+            color_discrete_sequence=['#1f77b4']
+        )
+        fig.add_scatter(
+            x=trend['date'],
+            y=trend['ventes_mean_28d'],
+            mode='lines',
+            name='Moyenne mobile (28j)',
+            line=dict(color='#9467bd', width=2, dash='dot')
+        )
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('app/fig_sales', build, [
+        {'x': points['date'], 'y': points['ventes']},
+        {'x': trend['date'], 'y': trend['ventes_mean_28d']},
+    ])
+
+def build_fig_users():
+    last_days = df.tail(7)
+
+    def build():
+        fig = px.bar(
+            last_days,
+            x='date',
+            y='utilisateurs',
+            title="Utilisateurs - 7 derniers jours",
+            color_discrete_sequence=['#ff7f0e']
+        )
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('app/fig_users', build, [{'x': last_days['date'], 'y': last_days['utilisateurs']}])
+
+def build_fig_revenue():
+    trend = rolling[['date', 'revenus_mean_7d']].rename(columns={'revenus_mean_7d': 'tendance'})
+    df_revenue = period_df[['date', 'revenus']].merge(trend, on='date', how='left')
+    revenue_points = downsample(df_revenue, 'date', 'revenus', FULL_WIDTH_PX * 2 // 3, x_range=view_range, method='minmax')
+    trend_points = downsample(df_revenue, 'date', 'tendance', FULL_WIDTH_PX * 2 // 3, x_range=view_range)
+
+    def build():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=revenue_points['date'],
+            y=revenue_points['revenus'],
+            mode='lines+markers',
+            name='Revenus',
+            line=dict(color='#2ca02c', width=3),
+            marker=dict(size=6)
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=trend_points['date'],
+            y=trend_points['tendance'],
+            mode='lines',
+            name='Moyenne mobile (7j)',
+            line=dict(color='#d62728', width=2, dash='dash')
+        ))
+
+        fig.update_layout(
+            title="Revenus quotidiens avec tendance",
+            xaxis_title="Date",
+            yaxis_title="Revenus ($)",
+            height=400
+        )
+        return fig
+
+    return make_figure('app/fig_revenue', build, [
+        {'x': revenue_points['date'], 'y': revenue_points['revenus']},
+        {'x': trend_points['date'], 'y': trend_points['tendance']},
+    ])
+
 col1, col2 = st.columns(2)
 
-with col1:
+with col1, run.section('fig_sales'):
     st.subheader("📈 Évolution des Ventes")
-    fig_sales = px.line(
-        df,
-        x='date',
-        y='ventes',
-        title="Ventes par jour",
-        color_discrete_sequence=['#1f77b4']
-    )
-    fig_sales.update_layout(height=400)
-    st.plotly_chart(fig_sales, use_container_width=True)
+    fig_sales = cached_result('app/fig_sales', (data_version, view_range), build_fig_sales)
+    run.plotly_chart('fig_sales', fig_sales, use_container_width=True)
 
-with col2:
+with col2, run.section('fig_users'):
     st.subheader("👥 Distribution des Utilisateurs")
-    fig_users = px.bar(
-        df.tail(7),
-        x='date',
-        y='utilisateurs',
-        title="Utilisateurs - 7 derniers jours",
-        color_discrete_sequence=['#ff7f0e']
-    )
-    fig_users.update_layout(height=400)
-    st.plotly_chart(fig_users, use_container_width=True)
+    fig_users = cached_result('app/fig_users', (data_version,), build_fig_users)
+    run.plotly_chart('fig_users', fig_users, use_container_width=True)
 
 # Revenue analysis
 st.subheader("💰 Analyse des Revenus")
 col1, col2 = st.columns([2, 1])
 
-with col1:
-    fig_revenue = go.Figure()
-    fig_revenue.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['revenus'],
-        mode='lines+markers',
-        name='Revenus',
-        line=dict(color='#2ca02c', width=3),
-        marker=dict(size=6)
-    ))
+with col1, run.section('fig_revenue'):
+    fig_revenue = cached_result('app/fig_revenue', (data_version, view_range), build_fig_revenue)
+    run.plotly_chart('fig_revenue', fig_revenue, use_container_width=True)
 
-    fig_revenue.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['revenus'].rolling(window=7).mean(),
-        mode='lines',
-        name='Moyenne mobile (7j)',
-        line=dict(color='#d62728', width=2, dash='dash')
-    ))
+with col2, run.section('goals'):
+    st.subheader("🎯 Objectifs")
 
-    fig_revenue.update_layout(
-        title="Revenus quotidiens avec tendance",
-        xaxis_title="Date",
-        yaxis_title="Revenus ($)",
-        height=400
-    )
-    st.plotly_chart(fig_revenue, use_container_width=True)
+    render_goals(total_sales, total_revenue)
 
-with col2:
-    st.subheader("🎯 Objectifs")
+# Data table
+st.markdown("---")
+st.subheader("📋 Données Détaillées")
 
-    # Progress bars for goals
-    sales_goal = 2000
-    revenue_goal = 80000
+# The table is a fragment: its filters, sort and pagination only rerun this
+# function, not the metrics and charts above
+@st.fragment
+def render_table():
+    table_run = start_fragment_run('app', 'table')
 
-    sales_progress = min(total_sales / sales_goal, 1.0)
-    revenue_progress = min(total_revenue / revenue_goal, 1.0)
+    with table_run.section('table'):
+        # Filters for the table
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            min_sales = st.number_input("Ventes minimum", min_value=0, value=0)
+        with col2:
+            min_users = st.number_input("Utilisateurs minimum", min_value=0, value=0)
+        with col3:
+            sort_by = st.selectbox("Trier par", ["date", "ventes", "utilisateurs", "revenus"])
+        with col4:
+            page_size = st.selectbox("Lignes par page", [25, 50, 100, 500], index=1)
 
-    st.markdown("**Objectif Ventes**")
-    st.progress(sales_progress)
-    st.write(f"{total_sales:,} / {sales_goal:,} ({sales_progress:.1%})")
+        # Apply filters with binary search over the sorted indexes; only the visible
+        # page is sent to the browser
+        sorted_table = get_sorted_table(data_version)
+        row_ids = cached_result(
+            'app/table_rows', (data_version, min_sales, min_users, sort_by),
+            lambda: sorted_table.row_ids({'ventes': min_sales, 'utilisateurs': min_users}, sort_by, ascending=False)
+        )
+        total_rows = len(row_ids)
+        page_count = max(1, -(-total_rows // page_size))
+        page_number = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, value=1)
+        filtered_df = sorted_table.take(row_ids, page=page_number - 1, page_size=page_size)
+        first_row = (page_number - 1) * page_size
+        st.caption(f"Lignes {min(first_row + 1, total_rows)}–{first_row + len(filtered_df)} sur {total_rows:,}")
 
-    st.markdown("**Objectif Revenus**")
-    st.progress(revenue_progress)
-    st.write(f"${total_revenue:,.0f} / ${revenue_goal:,} ({revenue_progress:.1%})")
+        st.dataframe(
+            filtered_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "date": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+                "ventes": st.column_config.NumberColumn("Ventes", format="%d"),
+                "utilisateurs": st.column_config.NumberColumn("Utilisateurs", format="%d"),
+                "revenus": st.column_config.NumberColumn("Revenus", format="$%.2f"),
+                "conversions": st.column_config.NumberColumn("Conversions", format="%.1f%%")
+            }
+        )
 
-# Data table
-st.markdown("---")
-st.subheader("📋 Données Détaillées")
+    table_run.finish()
 
-# Filters for the table
-col1, col2, col3 = st.columns(3)
-with col1:
-    min_sales = st.number_input("Ventes minimum", min_value=0, value=0)
-with col2:
-    min_users = st.number_input("Utilisateurs minimum", min_value=0, value=0)
-with col3:
-    sort_by = st.selectbox("Trier par", ["date", "ventes", "utilisateurs", "revenus"])
-
-# Apply filters
-filtered_df = df[
-    (df['ventes'] >= min_sales) &
-    (df['utilisateurs'] >= min_users)
-].sort_values(by=sort_by, ascending=False)
-
-st.dataframe(
-    filtered_df,
-    use_container_width=True,
-    hide_index=True,
-    column_config={
-        "date": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
-        "ventes": st.column_config.NumberColumn("Ventes", format="%d"),
-        "utilisateurs": st.column_config.NumberColumn("Utilisateurs", format="%d"),
-        "revenus": st.column_config.NumberColumn("Revenus", format="$%.2f"),
-        "conversions": st.column_config.NumberColumn("Conversions", format="%.1f%%")
-    }
-)
+with run.section('table'):
+    render_table()
 
 # Footer
 st.markdown("---")
@@ -204,4 +409,7 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+run.finish()
+render_sidebar_summary(run)
@@ -0,0 +1,66 @@
+"""Compare the exact and approximate audience KPIs of utils/audience.py.
+
+For each bucket frequency of the analytics dataset, the benchmark sketches
+every day once (the cost ``AudienceSketches.update`` pays when the data is
+loaded), then, for each period, reports the time of an estimate and of the
+exact scan, the relative error of each estimate and whether the exact value
+falls in its 95 % interval.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_approx
+    python -m benchmarks.bench_approx --freqs h 15min --periods 7 30
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.audience import METRICS, AudienceSketches, exact_audience
+from utils.data_generator import analytics_columns
+
+DAYS = 90
+
+
+def analytics_frame(freq, days):
+    end = pd.Timestamp.now().floor(freq)
+    dates = pd.date_range(start=end - pd.Timedelta(days=days), end=end, freq=freq)
+    return analytics_columns(dates, np.random.default_rng(0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--freqs', nargs='+', default=['h', '15min', 'min'], help="bucket frequencies")
+    parser.add_argument('--periods', nargs='+', type=int, default=[7, 30, 90], help="periods in days")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per estimate, best time is kept")
+    args = parser.parse_args()
+
+    print(f"{'fréquence':<10}{'jours':>6}{'sessions':>12}{'esquisses (s)':>15}{'estimation (ms)':>17}"
+          f"{'exact (s)':>11}  erreur relative (dans l'IC 95 %)")
+    for freq in args.freqs:
+        frame = analytics_frame(freq, DAYS)
+        sketches = AudienceSketches(DAYS)
+        start = time.perf_counter()
+        summary = sketches.update(frame)
+        sketch_time = time.perf_counter() - start
+        end = summary.last.normalize() + pd.Timedelta(days=1)
+        for days in args.periods:
+            period = (end - pd.Timedelta(days=days), end)
+            estimate_time = float('inf')
+            for _ in range(args.repeat):
+                approximate = summary.estimate(*period)
+                estimate_time = min(estimate_time, approximate['seconds'])
+            exact = exact_audience(frame, *period, last=summary.last)
+            errors = []
+            for metric in METRICS:
+                value, low, high = approximate['values'][metric]
+                truth = exact['values'][metric][0]
+                inside = 'oui' if low <= truth <= high else 'non'
+                errors.append(f"{metric} {abs(value - truth) / truth:.2%} ({inside})")
+            print(f"{freq:<10}{days:>6}{exact['sessions']:>12,}{sketch_time:>15.2f}{estimate_time * 1e3:>17.2f}"
+                  f"{exact['seconds']:>11.2f}  {', '.join(errors)}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compare the row-loop and numpy engines of utils/data_generator.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_data_generator
+"""
+import argparse
+import time
+
+from utils.data_generator import (
+    generate_sales_data,
+    generate_user_data,
+    generate_marketing_data,
+)
+
+TEN_YEARS = 3650
+
+CASES = [
+    ("sales, 30 jours", generate_sales_data, {"days": 30}),
+    ("users, 30 jours", generate_user_data, {"days": 30}),
+    ("marketing, 30 jours x 8 canaux", generate_marketing_data, {"days": 30}),
+    ("sales, 10 ans", generate_sales_data, {"days": TEN_YEARS}),
+    ("users, 10 ans", generate_user_data, {"days": TEN_YEARS}),
+    ("marketing, 10 ans x 8 canaux", generate_marketing_data, {"days": TEN_YEARS}),
+    ("marketing, 10 ans x 50 canaux", generate_marketing_data,
+     {"days": TEN_YEARS, "channels": [f"Channel {i}" for i in range(50)]}),
+]
+
+
+def best_of(fn, kwargs, repeat):
+    """Return the best wall time in seconds and the row count of ``fn(**kwargs)``."""
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fn(**kwargs)
+        best = min(best, time.perf_counter() - start)
+        rows = len(df)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, best time is kept")
+    args = parser.parse_args()
+
+    print(f"{'cas':<34}{'lignes':>10}{'python (ms)':>14}{'numpy (ms)':>14}{'gain':>8}")
+    for label, fn, kwargs in CASES:
+        loop_time, rows = best_of(fn, {**kwargs, "engine": "python"}, args.repeat)
+        numpy_time, _ = best_of(fn, {**kwargs, "engine": "numpy", "rng": 0}, args.repeat)
+        print(f"{label:<34}{rows:>10,}{loop_time * 1e3:>14.1f}{numpy_time * 1e3:>14.1f}"
+              f"{loop_time / numpy_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
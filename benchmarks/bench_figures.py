@@ -0,0 +1,118 @@
+"""Compare chart build time and payload with and without the figure factory.
+
+Every page runs in two processes, one per value of
+``DASHBOARD_FIGURE_FACTORY``. After a first run (data loaded, chart
+skeletons made), each page is rerun ``--repeat`` times with the result cache
+cleared, so every chart is rebuilt, and the profiler on. For each chart the
+benchmark reports the median time to build the figure (its section without
+``st.plotly_chart``), the median ``st.plotly_chart`` time (serialization
+included) and the size of the figure's JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_figures
+    python -m benchmarks.bench_figures --repeat 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    'app': 'app.py',
+    'analytics': 'pages/1_📈_Analytics.py',
+    'geographic': 'pages/2_🗺️_Geographic.py',
+}
+
+# Sidebar choices under which every chart of the page is drawn
+VIEWS = {
+    'app': [{}],
+    'analytics': [{}],
+    'geographic': [{'Vue': "Mondiale"}, {'Vue': "Canada"}],
+}
+
+
+def bench_page(page, repeat):
+    """Return ``{chart: {'build_ms', 'send_ms', 'payload_kb'}}`` for ``page``."""
+    from streamlit.testing.v1 import AppTest
+    from utils import profiler
+    from utils.result_cache import get_result_cache
+
+    charts = {}
+    for view in VIEWS[page]:
+        at = AppTest.from_file(os.path.join(REPO_ROOT, PAGES[page]), default_timeout=600)
+        at.run()
+        for label, value in view.items():
+            next(radio for radio in at.radio if radio.label == label).set_value(value)
+        next(toggle for toggle in at.toggle if toggle.label == "⏱️ Profilage").set_value(True)
+        at.run()
+        runs = []
+        for _ in range(repeat):
+            get_result_cache().clear()
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            runs.append(profiler._history[page][-1])
+        for chart in runs[-1]['payload_bytes']:
+            sends = [run['sections_s'][f'{chart}/send'] for run in runs]
+            builds = [run['sections_s'][chart] - send for run, send in zip(runs, sends)]
+            charts[chart] = {
+                'build_ms': float(np.median(builds)) * 1e3,
+                'send_ms': float(np.median(sends)) * 1e3,
+                'payload_kb': runs[-1]['payload_bytes'][chart] / 1024,
+            }
+    return charts
+
+
+def worker(repeat):
+    sys.path.insert(0, REPO_ROOT)
+    print(json.dumps({page: bench_page(page, repeat) for page in PAGES}))
+
+
+def run_mode(factory, repeat):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {**os.environ, 'DASHBOARD_FIGURE_FACTORY': factory, 'DASHBOARD_CACHE_DIR': cache_dir}
+        env.pop('DASHBOARD_PROFILE_LOG', None)
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_figures', '--worker', '--repeat', str(repeat)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"DASHBOARD_FIGURE_FACTORY={factory} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="reruns per page, medians are kept")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.repeat)
+        return
+
+    before = run_mode('0', args.repeat)
+    after = run_mode('1', args.repeat)
+
+    print(f"{'page':<12}{'graphique':<18}{'construction (ms)':>20}{'envoi (ms)':>16}{'payload (Ko)':>18}")
+    totals = np.zeros(6)
+    for page, charts in before.items():
+        for chart, old in charts.items():
+            new = after[page][chart]
+            row = [old['build_ms'], new['build_ms'], old['send_ms'], new['send_ms'], old['payload_kb'], new['payload_kb']]
+            totals += row
+            print(f"{page:<12}{chart:<18}{row[0]:>9.1f} → {row[1]:>6.1f}{row[2]:>8.1f} → {row[3]:>5.1f}"
+                  f"{row[4]:>9.1f} → {row[5]:>6.1f}")
+    print(f"{'total':<30}{totals[0]:>9.1f} → {totals[1]:>6.1f}{totals[2]:>8.1f} → {totals[3]:>5.1f}"
+          f"{totals[4]:>9.1f} → {totals[5]:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Scaling of the partitioned marketing aggregation (utils/marketing.py) from 1 to N processes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_marketing_parallel                      # 10 years x 200 channels
+    python -m benchmarks.bench_marketing_parallel --years 20 --channels 500 --workers 1 2 4 8
+
+Each configuration generates and aggregates the whole range (spend, cpc,
+ctr and conversion_rate per day and channel); results are checked against
+the single-process run.
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from utils.marketing import PARTITIONS, channel_stats
+
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def best_of(kwargs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stats = channel_stats(**kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers())
+    parser.add_argument("--by", nargs="+", choices=PARTITIONS, default=list(PARTITIONS))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per configuration, best time is kept")
+    args = parser.parse_args()
+
+    end = pd.Timestamp.now().normalize()
+    start = end - pd.DateOffset(years=args.years)
+    channels = [f"Channel {i}" for i in range(args.channels)]
+    print(f"{args.years} ans x {args.channels} canaux, {os.cpu_count()} cœurs\n")
+
+    print(f"{'partition':<12}{'processus':>10}{'temps (s)':>12}{'accélération':>14}{'efficacité':>12}")
+    for by in args.by:
+        reference, baseline = None, None
+        for workers in args.workers:
+            elapsed, stats = best_of(
+                {"start": start, "end": end, "channels": channels, "workers": workers, "by": by}, args.repeat
+            )
+            if reference is None:
+                reference, baseline = stats, elapsed
+            else:
+                pd.testing.assert_frame_equal(stats, reference)
+            speedup = baseline / elapsed
+            print(f"{by:<12}{workers:>10}{elapsed:>12.2f}{speedup:>13.1f}x{speedup / workers:>12.0%}")
+    print(f"\n{len(reference):,} lignes (jour x canal), identiques quel que soit le découpage.")
+
+
+if __name__ == "__main__":
+    main()
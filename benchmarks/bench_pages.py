@@ -0,0 +1,260 @@
+"""Headless page benchmark: run every page without a browser and compare to a baseline.
+
+Each data size runs in its own process (fresh caches, dedicated disk cache
+directory). Every page is run once cold, then rerun for each sidebar option
+of its scenario. For each page the harness reports the cold run time, the
+median and worst rerun time, the peak Python memory of a cold run and the
+JSON payload of its charts (measured through utils.profiler).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pages                    # all sizes, compare to the baseline
+    python -m benchmarks.bench_pages --sizes small      # a single size
+    python -m benchmarks.bench_pages --save-baseline    # store the results as the new baseline
+
+The baseline is machine specific: generate it on the CI runner rather than
+committing one from a laptop.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'pages-latest.json')
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'pages-baseline.json')
+
+# days x granularity x number of countries and locations, passed to the pages through utils.config
+SIZES = {
+    'small': {
+        'DASHBOARD_SAMPLE_DAYS': '30',
+        'DASHBOARD_ANALYTICS_FREQ': 'h',
+        'DASHBOARD_GEO_COUNTRIES': '10',
+        'DASHBOARD_GEO_POINTS': '100000',
+    },
+    'medium': {
+        'DASHBOARD_SAMPLE_DAYS': '365',
+        'DASHBOARD_ANALYTICS_FREQ': '15min',
+        'DASHBOARD_GEO_COUNTRIES': '25',
+        'DASHBOARD_GEO_POINTS': '1000000',
+    },
+    'large': {
+        'DASHBOARD_SAMPLE_DAYS': '3650',
+        'DASHBOARD_ANALYTICS_FREQ': 'min',
+        'DASHBOARD_GEO_COUNTRIES': '40',
+        'DASHBOARD_GEO_POINTS': '5000000',
+    },
+}
+
+PAGES = {
+    'app': 'app.py',
+    'analytics': 'pages/1_📈_Analytics.py',
+    'geographic': 'pages/2_🗺️_Geographic.py',
+}
+
+# Relative increase over the baseline reported as a regression
+TOLERANCES = {
+    'cold_s': 0.25,
+    'rerun_p50_s': 0.25,
+    'peak_mem_mb': 0.15,
+    'payload_kb': 0.05,
+}
+
+
+def _widget(at, kind, label):
+    for widget in getattr(at, kind):
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No {kind} labelled {label!r}")
+
+
+def _scenario(page):
+    """Return the ``(step name, action)`` pairs walked after the cold run of ``page``."""
+    if page == 'app':
+        steps = [
+            (f'metric={value}', lambda at, value=value: _widget(at, 'selectbox', "Type de métrique").select(value))
+            for value in ["Utilisateurs", "Revenus", "Conversions"]
+        ]
+        steps += [
+            (f'sort={value}', lambda at, value=value: _widget(at, 'selectbox', "Trier par").select(value))
+            for value in ["ventes", "utilisateurs", "revenus", "date"]
+        ]
+        steps.append(('min_sales=120', lambda at: _widget(at, 'number_input', "Ventes minimum").set_value(120)))
+        return steps
+    if page == 'analytics':
+        return [
+            (f'period={value}', lambda at, value=value: _widget(at, 'selectbox', "Période").select(value))
+            for value in ["30 derniers jours", "90 derniers jours", "7 derniers jours"]
+        ]
+    if page == 'geographic':
+        return [
+            (f'{view}/{metric}', lambda at, view=view, metric=metric: (
+                _widget(at, 'radio', "Vue").set_value(view),
+                _widget(at, 'selectbox', "Métrique à visualiser").select(metric),
+            ))
+            for view in ["Mondiale", "Canada"]
+            for metric in ["visitors", "revenue", "conversion_rate"]
+        ] + [
+            (f'zone={zone}', lambda at, zone=zone: _widget(at, 'selectbox', "Zone de la carte détaillée").select(zone))
+            for zone in ["Canada", "France", "Monde"]
+        ]
+    raise ValueError(page)
+
+
+def _run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def bench_page(page):
+    """Run the scenario of ``page`` in this process and return its measurements."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from utils import disk_cache, profiler
+
+    at = AppTest.from_file(os.path.join(REPO_ROOT, PAGES[page]), default_timeout=600)
+    cold = _run(at)
+    reruns = {}
+    for name, action in _scenario(page):
+        action(at)
+        reruns[name] = _run(at)
+
+    # One more cold run (caches cleared) with the profiler on, under
+    # tracemalloc, for the peak memory and the chart payloads
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    shutil.rmtree(disk_cache.CACHE_DIR, ignore_errors=True)
+    _widget(at, 'toggle', "⏱️ Profilage").set_value(True)
+    tracemalloc.start()
+    _run(at)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    charts = dict(profiler._history[page][-1]['payload_bytes'])
+
+    return {
+        'cold_s': cold,
+        'rerun_p50_s': float(np.median(list(reruns.values()))),
+        'rerun_max_s': max(reruns.values()),
+        'reruns_s': reruns,
+        'peak_mem_mb': peak / 2**20,
+        'payload_kb': sum(charts.values()) / 1024,
+        'charts_bytes': charts,
+    }
+
+
+def worker(pages):
+    """Benchmark ``pages`` at the size set in the environment and print JSON."""
+    sys.path.insert(0, REPO_ROOT)
+    # Import the heavy dependencies up front so the cold run measures the page itself
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    import streamlit  # noqa: F401
+
+    results = {page: bench_page(page) for page in pages}
+    results['_process'] = {'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    print(json.dumps(results))
+
+
+def run_size(size, pages):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {**os.environ, **SIZES[size], 'DASHBOARD_CACHE_DIR': cache_dir}
+        env.pop('DASHBOARD_PROFILE', None)
+        env.pop('DASHBOARD_PROFILE_LOG', None)
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_pages', '--worker', *pages],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"size {size} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline):
+    """Return the list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for size, pages in results.items():
+        for page, metrics in pages.items():
+            reference = baseline.get(size, {}).get(page)
+            if page.startswith('_') or reference is None:
+                continue
+            for metric, tolerance in TOLERANCES.items():
+                if metrics[metric] > reference[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{size}/{page} {metric}: {reference[metric]:.3f} -> {metrics[metric]:.3f} "
+                        f"(+{metrics[metric] / reference[metric] - 1:.0%})"
+                    )
+    return regressions
+
+
+def print_table(results):
+    print(f"{'taille':<8}{'page':<12}{'froid (ms)':>12}{'rerun p50':>12}{'rerun max':>12}"
+          f"{'mém. (Mo)':>12}{'payload (Ko)':>14}")
+    for size, pages in results.items():
+        for page, m in pages.items():
+            if page.startswith('_'):
+                continue
+            print(f"{size:<8}{page:<12}{m['cold_s'] * 1e3:>12.0f}{m['rerun_p50_s'] * 1e3:>12.0f}"
+                  f"{m['rerun_max_s'] * 1e3:>12.0f}{m['peak_mem_mb']:>12.1f}{m['payload_kb']:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the dashboard pages.")
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=list(SIZES))
+    parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), default=list(PAGES))
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 on regression")
+    parser.add_argument('--worker', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    results = {}
+    for size in args.sizes:
+        print(f"Taille {size}...", file=sys.stderr)
+        results[size] = run_size(size, args.pages)
+
+    print_table(results)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nRésultats : {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Baseline enregistrée : {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("Pas de baseline : relancez avec --save-baseline pour en créer une.")
+        return
+    with open(args.baseline, encoding='utf-8') as handle:
+        regressions = compare(results, json.load(handle))
+    if regressions:
+        print("\nRégressions :")
+        for line in regressions:
+            print(f"  {line}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print("\nAucune régression par rapport à la baseline.")
+
+
+if __name__ == '__main__':
+    main()
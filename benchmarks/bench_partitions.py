@@ -0,0 +1,84 @@
+"""Measure period reads from the time partitions of utils/partitions.py.
+
+The benchmark fills the history of the analytics dataset (``HISTORY_DAYS``)
+twice, in a temporary disk cache: once with the raw day partitions kept, once
+compacted into monthly hourly rollups outside the window, as the dashboard
+does. It reports the size of each on disk, then, for each period, the hourly
+partial aggregates read with pruning (only the partitions the period
+overlaps) and by a full scan of the partitions, with the number of
+partitions each opens.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_partitions
+    python -m benchmarks.bench_partitions --freq 15min --periods 7 30 365
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from utils import disk_cache
+from utils.config import ANALYTICS_DAYS, HISTORY_DAYS
+from utils.data_sources import SCHEMAS
+from utils.incremental import IncrementalStore
+from utils.registry import time_slice
+
+
+def build(freq, history_days, compacted, cache_dir):
+    disk_cache.CACHE_DIR = os.path.join(cache_dir, 'compacted' if compacted else 'raw')
+    metrics = SCHEMAS['analytics'][1]
+    store = IncrementalStore(
+        'analytics', 2 * ANALYTICS_DAYS, freq=freq, persist=True, history_days=history_days,
+        rollup_metrics=metrics if compacted else None, metrics=metrics
+    )
+    start = time.perf_counter()
+    store.refresh()
+    return store, time.perf_counter() - start
+
+
+def timed(read, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = read()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--freq', default='h', help="bucket frequency of the analytics dataset")
+    parser.add_argument('--history', type=int, default=HISTORY_DAYS, help="days of history")
+    parser.add_argument('--periods', nargs='+', type=int, default=[7, 30, 90, 365], help="periods in days")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per read, best time is kept")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for compacted in (False, True):
+            store, fill = build(args.freq, args.history, compacted, cache_dir)
+            history = store.history
+            entries = history.entries()
+            size = sum(entry[3] for entry in entries) / 2**20
+            label = "compacté" if compacted else "brut"
+            print(f"\n{label} : {len(entries)} partitions, {size:.1f} Mo sur disque, remplissage {fill:.1f} s")
+            print(f"{'jours':>6}{'heures':>8}{'lues':>7}{'écartées':>10}{'élagage (ms)':>14}"
+                  f"{'scan complet (ms)':>19}{'accélération':>14}")
+            end = store.watermark
+            for days in args.periods:
+                start = end - pd.Timedelta(days=days)
+                history.reads = history.skipped = 0
+                pruned, pruned_time = timed(lambda: history.partials(start, end), args.repeat)
+                reads, skipped = history.reads // args.repeat, history.skipped // args.repeat
+                full, full_time = timed(
+                    lambda: time_slice(history.partials(), 'bucket', start.ceil('h'), end), args.repeat
+                )
+                assert len(pruned) == len(full)
+                print(f"{days:>6}{len(pruned):>8,}{reads:>7}{skipped:>10}{pruned_time * 1e3:>14.1f}"
+                      f"{full_time * 1e3:>19.1f}{full_time / pruned_time:>13.1f}x", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Throughput of the batch report export (utils/reports.py) from 1 to N processes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reports                           # 200 tenants, every format
+    python -m benchmarks.bench_reports --tenants 1000 --workers 1 4 8 --formats parquet
+
+Each process count runs twice in its own disk cache: cold (every tenant's
+aggregates are generated) then warm (they are read from the cache, as in a
+second export of the same night). Reports go to a temporary directory.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.bench_marketing_parallel import default_workers
+from utils.reports import FORMATS, run_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers())
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{args.tenants} locataires, {args.days} jours, formats {', '.join(args.formats)}, "
+          f"{os.cpu_count()} cœurs\n")
+    print(f"{'processus':>10}{'cache':>7}{'temps (s)':>11}{'rapports/s':>12}{'Mo écrits':>11}  étapes (ms moyens)")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            for cache in ("froid", "chaud"):
+                summary = run_reports(
+                    os.path.join(directory, "out"), range(args.tenants), days=args.days, formats=args.formats,
+                    workers=workers, cache_dir=os.path.join(directory, "cache")
+                )
+                stages = ", ".join(
+                    f"{stage} {1e3 * sum(seconds) / len(seconds):.1f}" for stage, seconds in summary["stages"].items()
+                )
+                print(f"{workers:>10}{cache:>7}{summary['seconds']:>11.2f}{summary['per_second']:>12.1f}"
+                      f"{summary['bytes'] / 2**20:>11.1f}  {stages}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
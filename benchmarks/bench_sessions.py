@@ -0,0 +1,139 @@
+"""Measure the memory of a server as concurrent sessions are added.
+
+The benchmark starts one Streamlit server, then opens sessions over its
+websocket (``/_stcore/stream``, as browsers do) in steps, keeping every
+session open: each asks for a page, the pages taken in turn, and waits for
+the end of its run. With ``--filters``, each session then sets the page's
+main filter (``FILTERS``) to the next of its options and runs it again, so
+that sessions do not all look at the same data. After each step the
+benchmark reads the resident memory of the server (``VmRSS``) and reports
+the growth per session added. Sessions keep their state (widgets,
+session-scoped figures) until the end, so the growth is what a crowd of
+viewers leaves behind, not a peak during the runs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sessions
+    python -m benchmarks.bench_sessions --filters --steps 1 10 50 100 --pages analytics
+"""
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_startup import PAGES, REPO_ROOT, TIMEOUT_S, free_port, wait_healthy
+
+# Page -> selectbox set by the sessions, each to one of its options in turn
+FILTERS = {
+    'app': "Trier par",
+    'analytics': "Période",
+    'geographic': "Zone de la carte détaillée",
+}
+
+# Time for the server to settle after a step (background refresh, freed buffers)
+SETTLE_S = 3.0
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"No VmRSS for process {pid}")
+
+
+def _run(ws, page_name, widget=None, value=None):
+    # Run the page, with one widget set, and return the selectboxes it drew: label -> (id, options)
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    request = BackMsg()
+    request.rerun_script.query_string = ''
+    request.rerun_script.page_name = page_name
+    if widget is not None:
+        request.rerun_script.widget_states.widgets.add(id=widget, string_value=value)
+    ws.send(request.SerializeToString())
+    selectboxes = {}
+    while True:
+        message = ForwardMsg()
+        message.ParseFromString(ws.recv(timeout=TIMEOUT_S))
+        kind = message.WhichOneof('type')
+        if kind == 'delta' and message.delta.new_element.WhichOneof('type') == 'selectbox':
+            selectbox = message.delta.new_element.selectbox
+            selectboxes[selectbox.label] = (selectbox.id, list(selectbox.options))
+        elif kind == 'script_finished':
+            if message.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                raise RuntimeError(f"Run of {page_name or 'app'} ended with status {message.script_finished}")
+            return selectboxes
+
+
+def open_session(sessions, port, page, variant=0):
+    """Open a session kept in the ``sessions`` stack and run ``page`` in it.
+
+    With ``variant``, the page runs again with option ``variant`` of its
+    ``FILTERS`` selectbox, as a viewer who changed the filter.
+    """
+    from websockets.sync.client import connect
+
+    ws = sessions.enter_context(connect(
+        f'ws://localhost:{port}/_stcore/stream', subprotocols=['streamlit'], max_size=None, open_timeout=TIMEOUT_S
+    ))
+    selectboxes = _run(ws, PAGES[page])
+    if variant:
+        widget, options = selectboxes[FILTERS[page]]
+        _run(ws, PAGES[page], widget, options[variant % len(options)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', nargs='+', type=int, default=[1, 5, 10, 25, 50, 100],
+                        help="numbers of open sessions at which memory is read")
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    parser.add_argument('--filters', action='store_true', help="sessions vary the main filter of their page")
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {**os.environ, 'DASHBOARD_CACHE_DIR': cache_dir}
+        env.pop('DASHBOARD_PROFILE_LOG', None)
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', 'app.py', '--server.port', str(port),
+             '--server.headless', 'true', '--server.fileWatcherType', 'none'],
+            cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        sessions = contextlib.ExitStack()
+        opened = 0
+        try:
+            wait_healthy(port, process)
+            # Every page once, so that the data and the shared results are loaded
+            with contextlib.ExitStack() as warmup:
+                for page in args.pages:
+                    open_session(warmup, port, page)
+            time.sleep(SETTLE_S)
+            base = rss_mb(process.pid)
+            print(f"serveur chaud, aucune session : {base:.1f} Mo")
+            print(f"{'sessions':>9}{'RSS (Mo)':>11}{'depuis 0 (Mo)':>15}{'par session (Ko)':>18}{'ouverture (s)':>15}")
+            previous_count, previous_rss = 0, base
+            for count in sorted(args.steps):
+                start = time.perf_counter()
+                while opened < count:
+                    page = args.pages[opened % len(args.pages)]
+                    open_session(sessions, port, page, opened // len(args.pages) + 1 if args.filters else 0)
+                    opened += 1
+                opening = (time.perf_counter() - start) / max(count - previous_count, 1)
+                time.sleep(SETTLE_S)
+                rss = rss_mb(process.pid)
+                per_session = (rss - previous_rss) * 1024 / max(count - previous_count, 1)
+                print(f"{count:>9}{rss:>11.1f}{rss - base:>15.1f}{per_session:>18.0f}{opening:>15.2f}", flush=True)
+                previous_count, previous_rss = count, rss
+        finally:
+            sessions.close()
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Measure time to first render of a new server, started plainly or through the launcher.
+
+Each measurement starts a new Streamlit server, as a new instance would,
+polls ``/_stcore/health`` until it answers, then opens a session over the
+server's websocket (``/_stcore/stream``, as the browser does), asks for one
+page and waits for the end of its first run. Scenarios:
+
+- ``streamlit run``, empty cache directory: a host without any snapshot;
+- ``streamlit run``, cache directory holding the snapshot of a previous
+  process (e.g. a ``DASHBOARD_CACHE_DIR`` shared under ``/home``), with and
+  without the file watcher;
+- ``python -m utils.startup``, same snapshot, with each ``--render`` choice:
+  the warm-up runs before the server answers its health check.
+
+For each page the benchmark reports the time from launch to a healthy
+server, from launch to the end of the first render, and the render itself
+(from the session request to its end), medians over ``--repeat`` launches.
+Sessions are opened with the ``websockets`` client that Streamlit installs
+for its server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 3 --pages app geographic
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Page -> page name asked by the session ('' for the main script)
+PAGES = {
+    'app': '',
+    'analytics': 'Analytics',
+    'geographic': 'Geographic',
+}
+
+# (label, command before the script, options after it, snapshot in the cache directory)
+SCENARIOS = [
+    ("streamlit run, sans instantané", ['-m', 'streamlit', 'run'], [], False),
+    ("streamlit run, instantané", ['-m', 'streamlit', 'run'], [], True),
+    ("streamlit run, sans surveillance", ['-m', 'streamlit', 'run'], ['--server.fileWatcherType', 'none'], True),
+    ("utils.startup --render none", ['-m', 'utils.startup', '--render', 'none'], [], True),
+    ("utils.startup", ['-m', 'utils.startup'], [], True),
+    ("utils.startup --render all", ['-m', 'utils.startup', '--render', 'all'], [], True),
+]
+
+TIMEOUT_S = 600
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(port, process):
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.02)
+
+
+def first_render(port, page_name):
+    """Ask for ``page_name`` in a new session and wait for the end of its run."""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from websockets.sync.client import connect
+
+    with connect(f'ws://localhost:{port}/_stcore/stream', subprotocols=['streamlit'], max_size=None,
+                 open_timeout=TIMEOUT_S) as ws:
+        request = BackMsg()
+        request.rerun_script.query_string = ''
+        request.rerun_script.page_name = page_name
+        ws.send(request.SerializeToString())
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(ws.recv(timeout=TIMEOUT_S))
+            if message.WhichOneof('type') == 'script_finished':
+                if message.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    raise RuntimeError(f"Run of {page_name or 'app'} ended with status {message.script_finished}")
+                return
+
+
+def launch(command, options, page_name, cache_dir):
+    """Return ``(healthy_s, first_render_s, render_s)`` for one new server."""
+    port = free_port()
+    env = {**os.environ, 'DASHBOARD_CACHE_DIR': cache_dir}
+    env.pop('DASHBOARD_PROFILE_LOG', None)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *command, 'app.py', *options, '--server.port', str(port), '--server.headless', 'true'],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(port, process)
+        healthy = time.perf_counter() - start
+        first_render(port, page_name)
+        done = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return healthy, done, done - healthy
+
+
+def prepare_snapshot(cache_dir):
+    # A previous process leaves the data snapshot in the cache directory
+    subprocess.run(
+        [sys.executable, '-m', 'utils.startup', '--prewarm-only', '--render', 'none', 'app.py'],
+        cwd=REPO_ROOT, env={**os.environ, 'DASHBOARD_CACHE_DIR': cache_dir},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=1, help="launches per page and scenario, medians are kept")
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        prepare_snapshot(snapshot_dir)
+        print(f"{'scénario':<34}{'page':<12}{'serveur prêt (s)':>18}{'premier rendu (s)':>19}{'dont rendu (s)':>16}")
+        for label, command, options, with_snapshot in SCENARIOS:
+            for page in args.pages:
+                runs = []
+                for _ in range(args.repeat):
+                    if with_snapshot:
+                        runs.append(launch(command, options, PAGES[page], snapshot_dir))
+                    else:
+                        with tempfile.TemporaryDirectory() as empty_dir:
+                            runs.append(launch(command, options, PAGES[page], empty_dir))
+                healthy, done, render = np.median(runs, axis=0)
+                print(f"{label:<34}{page:<12}{healthy:>18.2f}{done:>19.2f}{render:>16.2f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,191 +1,388 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import random
+
+from utils.audience import exact_audience, get_audience_sketches
+from utils.config import ANALYTICS_DAYS, APPROXIMATE, SEED
+from utils.data_sources import SCHEMAS, current_version, get_source, shared_dataset
+from utils.downsampling import FULL_WIDTH_PX, HALF_WIDTH_PX, downsample
+from utils.figures import make_figure
+from utils.kpis import ANALYTICS_KPIS, KpiEngine, format_change, format_difference
+from utils.profiler import render_sidebar_summary, start_fragment_run, start_run
+from utils.registry import time_slice
+from utils.result_cache import background_result, cached_result
+from utils.startup import lazy_import
+
+# Imported when a chart skeleton is first built (utils.startup)
+px = lazy_import('plotly.express')
 
 st.set_page_config(
     page_title="Analytics",
     page_icon="📈",
     layout="wide"
 )
+run = start_run('analytics')
 
 st.title("📈 Analytics Avancées")
 st.markdown("---")
 
-# Generate more detailed analytics data
-@st.cache_data
-def generate_analytics_data():
-    dates = pd.date_range(start=datetime.now() - timedelta(days=90), end=datetime.now(), freq='H')
-    data = []
-
-    for date in dates:
-        hour = date.hour
-        # Simulate different patterns based on hour of day
-        base_traffic = 100 + (50 * np.sin(hour * np.pi / 12))  # Daily pattern
-        traffic = max(10, int(base_traffic + random.gauss(0, 20)))
-
-        data.append({
-            'datetime': date,
-            'date': date.date(),
-            'hour': hour,
-            'traffic': traffic,
-            'bounce_rate': max(0.1, min(0.9, 0.4 + random.gauss(0, 0.1))),
-            'page_views': traffic * random.randint(2, 5),
-            'session_duration': max(30, 180 + random.gauss(0, 60))
-        })
+# Hourly data (ANALYTICS_FREQ). Every aggregate below is computed by the data
+# source: from the rollup of its incremental store for the synthetic data, in
+# the database for a SQL source. Periods up to 90 days (ANALYTICS_DAYS) are
+# read from the window the source keeps in memory; the 365-day period from the
+# time partitions of its history (HISTORY_DAYS), only those it overlaps
+source = get_source()
 
-    return pd.DataFrame(data)
-
-df_analytics = generate_analytics_data()
-
-# Sidebar filters
-st.sidebar.header("Filtres Analytics")
-period = st.sidebar.selectbox(
-    "Période",
-    ["7 derniers jours", "30 derniers jours", "90 derniers jours"]
-)
+with run.section('data'):
+    data_version = current_version('analytics')
+    # Rolling statistics of the hourly traffic, extended hour by hour by the source
+    rolling = cached_result('analytics/rolling', data_version, lambda: source.rolling('analytics'))
+    # Days the source holds: a SQL table may keep less than the longest period
+    first_time = cached_result('analytics/first_time', data_version, lambda: source.first_time('analytics'))
+    held_days = 0 if first_time is None else -(-(pd.Timestamp.now() - first_time) // pd.Timedelta(days=1))
 
 period_map = {
     "7 derniers jours": 7,
     "30 derniers jours": 30,
-    "90 derniers jours": 90
+    "90 derniers jours": 90,
+    "365 derniers jours": 365
 }
+# The shortest period is always offered
+periods = [name for name, days in period_map.items() if days <= held_days] or list(period_map)[:1]
+
+# Sidebar filters
+st.sidebar.header("Filtres Analytics")
+period = st.sidebar.selectbox("Période", periods)
+if len(periods) < len(period_map):
+    st.sidebar.caption(
+        f"Historique de la source : {held_days} jours, les périodes plus longues ne sont pas proposées."
+    )
 
-filtered_df = df_analytics[
-    df_analytics['datetime'] >= (datetime.now() - timedelta(days=period_map[period]))
-]
+since = datetime.now() - timedelta(days=period_map[period])
+with run.section('metrics'):
+    # Whole hours up to the end of the current one, against the same number of
+    # hours just before: prefix sums over the hourly partials of the whole
+    # history, built once per data version, then two binary searches per period
+    kpi_end = pd.Timestamp.now().floor('h') + pd.Timedelta(hours=1)
+    kpis = cached_result(
+        'analytics/kpis', data_version,
+        lambda: KpiEngine.from_partials(source.partials('analytics', first_time), SCHEMAS['analytics'][1])
+    )
+    kpi = kpis.compare(kpi_end - pd.Timedelta(days=period_map[period]), kpi_end, ANALYTICS_KPIS)
 
 # Key metrics
 col1, col2, col3, col4 = st.columns(4)
 
-with col1:
-    total_traffic = filtered_df['traffic'].sum()
+with col1, run.section('metrics'):
+    total_traffic = kpi['traffic']['value']
     st.metric(
         "Trafic Total",
-        f"{total_traffic:,}",
-        delta=f"+{random.randint(5, 25)}%"
+        f"{total_traffic:,.0f}",
+        delta=format_change(kpi['traffic'])
     )
 
-with col2:
-    avg_bounce = filtered_df['bounce_rate'].mean()
+with col2, run.section('metrics'):
+    avg_bounce = kpi['bounce_rate']['value'] or 0
     st.metric(
         "Taux de Rebond",
         f"{avg_bounce:.1%}",
-        delta=f"{random.uniform(-0.05, 0.05):+.1%}"
+        delta=format_difference(kpi['bounce_rate'], '{:+.1%}'),
+        delta_color="inverse"
     )
 
-with col3:
-    total_pageviews = filtered_df['page_views'].sum()
+with col3, run.section('metrics'):
+    total_pageviews = kpi['page_views']['value']
     st.metric(
         "Pages Vues",
-        f"{total_pageviews:,}",
-        delta=f"+{random.randint(10, 30)}%"
+        f"{total_pageviews:,.0f}",
+        delta=format_change(kpi['page_views'])
     )
 
-with col4:
-    avg_session = filtered_df['session_duration'].mean()
+with col4, run.section('metrics'):
+    avg_session = kpi['session_duration']['value'] or 0
     st.metric(
         "Durée Session Moy.",
         f"{avg_session:.0f}s",
-        delta=f"+{random.randint(5, 15)}s"
+        delta=format_difference(kpi['session_duration'], '{:+.0f}s')
     )
 
+# Audience: unique visitors, session duration percentiles and pages per
+# session need the sessions themselves, not sums (utils.audience). In
+# approximate mode they are first estimated from per-day sketches, with their
+# 95 % interval, while the exact values are computed in the background; the
+# row polls for them every REFINE_POLL_S seconds
+REFINE_POLL_S = 1
+
+approximate = st.sidebar.toggle(
+    "≈ Mode approché",
+    value=APPROXIMATE,
+    help="Audience estimée en quelques millisecondes depuis des esquisses par jour, puis calculée exactement en arrière-plan"
+)
+
+# The sessions are kept for the last ANALYTICS_DAYS only: longer periods show
+# the audience of those days
+audience_days = min(period_map[period], ANALYTICS_DAYS)
+audience_end = kpi_end.normalize() + pd.Timedelta(days=1)
+audience_start = audience_end - pd.Timedelta(days=audience_days)
+audience_deps = (data_version, period)
+
+with run.section('audience'):
+    # Rows of the current version, shared by every session: periods are views
+    analytics = shared_dataset('analytics')
+    audience_sketches = get_audience_sketches()
+    audience_summary = cached_result(
+        'analytics/audience_sketches', data_version,
+        lambda: audience_sketches.update(analytics.period(audience_sketches.since))
+    )
+
+    def build_audience():
+        rows = analytics.period(audience_start, audience_end)
+        return exact_audience(rows, audience_start, audience_end, seed=SEED, last=audience_summary.last)
+
+    if approximate:
+        audience = background_result('analytics/audience', audience_deps, build_audience)
+    else:
+        audience = cached_result('analytics/audience', audience_deps, build_audience)
+
+def format_audience(values, template):
+    value, low, high = values
+    if value is None:
+        return "–", None
+    if low == high:
+        return template.format(value), None
+    return "≈ " + template.format(value), f"IC 95 % : {template.format(low)} – {template.format(high)}"
+
+@st.fragment(run_every=REFINE_POLL_S if audience is None else None)
+def render_audience():
+    audience_run = start_fragment_run('analytics', 'audience')
+    with audience_run.section('metrics'):
+        result = audience
+        if result is None:
+            if background_result('analytics/audience', audience_deps, build_audience) is not None:
+                # Exact values are in: redraw the page with them, without polling
+                st.rerun()
+            result = cached_result(
+                'analytics/audience_estimate', audience_deps,
+                lambda: audience_summary.estimate(audience_start, audience_end)
+            )
+
+        values = result['values']
+        columns = st.columns(4)
+        for column, (label, metric, template) in zip(columns, [
+            ("Visiteurs Uniques", 'visitors', "{:,.0f}"),
+            ("Durée Session Médiane", 'duration_p50', "{:.0f}s"),
+            ("Durée Session p90", 'duration_p90', "{:.0f}s"),
+            ("Pages par Session", 'pages', "{:.2f}"),
+        ]):
+            value, interval = format_audience(values[metric], template)
+            with column:
+                st.metric(label, value, help=interval)
+
+        if result['exact']:
+            st.caption(
+                f"Valeurs exactes sur {result['sessions']:,} sessions ({result['seconds']:.2f} s de calcul)."
+            )
+        else:
+            st.caption(
+                f"≈ Estimations en {result['seconds'] * 1e3:.1f} ms depuis les esquisses de "
+                f"{audience_days} jours ({result['sessions']:,} sessions), intervalle de confiance "
+                "à 95 % dans l'infobulle. Calcul exact en cours…"
+            )
+    audience_run.finish()
+
+st.subheader("👥 Audience")
+if audience_days < period_map[period]:
+    st.caption(f"Sessions conservées sur les {ANALYTICS_DAYS} derniers jours : l'audience porte sur cette période.")
+with run.section('audience'):
+    render_audience()
+
 # Traffic patterns
 st.subheader("🌊 Patterns de Trafic")
 
-col1, col2 = st.columns(2)
+# Every chart depends on the period and the data only: other reruns (e.g. the
+# profiler toggle) and other sessions reuse the figures of the shared result
+# cache, and a rebuild only attaches new arrays to the chart's skeleton
+figure_deps = (data_version, period)
 
-with col1:
+def build_fig_hourly():
     # Hourly traffic pattern
-    hourly_traffic = filtered_df.groupby('hour')['traffic'].mean().reset_index()
-    fig_hourly = px.line(
-        hourly_traffic,
-        x='hour',
-        y='traffic',
-        title="Trafic Moyen par Heure",
-        markers=True
+    hourly_traffic = source.by_hour('analytics', since, 'traffic', how='mean')
+
+    def build():
+        fig = px.line(
+            hourly_traffic,
+            x='hour',
+            y='traffic',
+            title="Trafic Moyen par Heure",
+            markers=True
+        )
+        fig.update_layout(
+            xaxis_title="Heure de la journée",
+            yaxis_title="Trafic moyen",
+            height=400
+        )
+        return fig
+
+    return make_figure('analytics/fig_hourly', build, [{'x': hourly_traffic['hour'], 'y': hourly_traffic['traffic']}])
+
+def build_fig_daily():
+    # Daily traffic
+    daily_traffic = source.by_date('analytics', since, 'traffic', how='sum').tail(14)
+
+    def build():
+        fig = px.bar(
+            daily_traffic,
+            x='date',
+            y='traffic',
+            title="Trafic Quotidien (14 derniers jours)"
+        )
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('analytics/fig_daily', build, [{'x': daily_traffic['date'], 'y': daily_traffic['traffic']}])
+
+def build_fig_heatmap():
+    # Create heatmap data (columns ordered from Monday)
+    heatmap_data = source.heatmap('analytics', since, 'traffic', how='mean')
+
+    def build():
+        fig = px.imshow(
+            heatmap_data,
+            title="Trafic par Heure et Jour de la Semaine",
+            aspect="auto",
+            color_continuous_scale="Blues"
+        )
+        fig.update_layout(
+            xaxis_title="Jour de la Semaine",
+            yaxis_title="Heure de la Journée",
+            height=500
+        )
+        return fig
+
+    return make_figure('analytics/fig_heatmap', build, [
+        {'z': heatmap_data.to_numpy(), 'x': list(heatmap_data.columns), 'y': heatmap_data.index.to_numpy()}
+    ])
+
+def build_fig_trends():
+    # Hourly traffic averaged over 7, 28 and 90 days, with the 10-90% band of the last 28 days
+    trends = downsample(
+        time_slice(rolling, 'datetime', since), 'datetime', 'traffic_mean_7d', FULL_WIDTH_PX
     )
-    fig_hourly.update_layout(
-        xaxis_title="Heure de la journée",
-        yaxis_title="Trafic moyen",
-        height=400
+    means = [
+        ('traffic_mean_7d', 'Moyenne 7j', '#1f77b4'),
+        ('traffic_mean_28d', 'Moyenne 28j', '#ff7f0e'),
+        ('traffic_mean_90d', 'Moyenne 90j', '#2ca02c'),
+    ]
+
+    def build():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=trends['datetime'], y=trends['traffic_q90_28d'], mode='lines', line=dict(width=0),
+            showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=trends['datetime'], y=trends['traffic_q10_28d'], mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor='rgba(31, 119, 180, 0.15)', name='Déciles 10-90 % (28j)'
+        ))
+        for column, name, color in means:
+            fig.add_trace(go.Scatter(
+                x=trends['datetime'], y=trends[column], mode='lines', name=name, line=dict(color=color)
+            ))
+        fig.update_layout(
+            title="Trafic horaire : moyennes mobiles",
+            xaxis_title="Date",
+            yaxis_title="Trafic par heure",
+            height=400
+        )
+        return fig
+
+    columns = ['traffic_q90_28d', 'traffic_q10_28d'] + [column for column, _, _ in means]
+    return make_figure('analytics/fig_trends', build, [
+        {'x': trends['datetime'], 'y': trends[column]} for column in columns
+    ])
+
+def build_fig_bounce():
+    # Bounce rate over time
+    daily_bounce = downsample(
+        source.by_date('analytics', since, 'bounce_rate', how='mean'), 'date', 'bounce_rate', HALF_WIDTH_PX,
+        method='minmax'
     )
-    st.plotly_chart(fig_hourly, use_container_width=True)
 
-with col2:
-    # Daily traffic
-    daily_traffic = filtered_df.groupby('date')['traffic'].sum().reset_index()
-    fig_daily = px.bar(
-        daily_traffic.tail(14),
-        x='date',
-        y='traffic',
-        title="Trafic Quotidien (14 derniers jours)"
+    def build():
+        fig = px.line(
+            daily_bounce,
+            x='date',
+            y='bounce_rate',
+            title="Évolution du Taux de Rebond",
+            color_discrete_sequence=['#e74c3c']
+        )
+        fig.update_yaxes(tickformat='.1%')
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('analytics/fig_bounce', build, [{'x': daily_bounce['date'], 'y': daily_bounce['bounce_rate']}])
+
+def build_fig_session():
+    # Session duration
+    daily_session = downsample(
+        source.by_date('analytics', since, 'session_duration', how='mean'), 'date', 'session_duration', HALF_WIDTH_PX
     )
-    fig_daily.update_layout(height=400)
-    st.plotly_chart(fig_daily, use_container_width=True)
+
+    def build():
+        fig = px.area(
+            daily_session,
+            x='date',
+            y='session_duration',
+            title="Durée Moyenne des Sessions",
+            color_discrete_sequence=['#2ecc71']
+        )
+        fig.update_layout(
+            yaxis_title="Durée (secondes)",
+            height=400
+        )
+        return fig
+
+    return make_figure('analytics/fig_session', build, [
+        {'x': daily_session['date'], 'y': daily_session['session_duration']}
+    ])
+
+col1, col2 = st.columns(2)
+
+with col1, run.section('fig_hourly'):
+    fig_hourly = cached_result('analytics/fig_hourly', figure_deps, build_fig_hourly)
+    run.plotly_chart('fig_hourly', fig_hourly, use_container_width=True)
+
+with col2, run.section('fig_daily'):
+    fig_daily = cached_result('analytics/fig_daily', figure_deps, build_fig_daily)
+    run.plotly_chart('fig_daily', fig_daily, use_container_width=True)
 
 # Heatmap
 st.subheader("🔥 Heatmap du Trafic")
 
-# Create heatmap data
-heatmap_data = filtered_df.pivot_table(
-    values='traffic',
-    index=filtered_df['datetime'].dt.hour,
-    columns=filtered_df['datetime'].dt.day_name(),
-    aggfunc='mean'
-)
+with run.section('fig_heatmap'):
+    fig_heatmap = cached_result('analytics/fig_heatmap', figure_deps, build_fig_heatmap)
+    run.plotly_chart('fig_heatmap', fig_heatmap, use_container_width=True)
 
-# Reorder columns to start with Monday
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-heatmap_data = heatmap_data.reindex(columns=[col for col in day_order if col in heatmap_data.columns])
+# Rolling trends
+st.subheader("📉 Tendances du Trafic")
 
-fig_heatmap = px.imshow(
-    heatmap_data,
-    title="Trafic par Heure et Jour de la Semaine",
-    aspect="auto",
-    color_continuous_scale="Blues"
-)
-fig_heatmap.update_layout(
-    xaxis_title="Jour de la Semaine",
-    yaxis_title="Heure de la Journée",
-    height=500
-)
-st.plotly_chart(fig_heatmap, use_container_width=True)
+with run.section('fig_trends'):
+    fig_trends = cached_result('analytics/fig_trends', figure_deps, build_fig_trends)
+    run.plotly_chart('fig_trends', fig_trends, use_container_width=True)
 
 # Performance metrics
 st.subheader("⚡ Métriques de Performance")
 
 col1, col2 = st.columns(2)
 
-with col1:
-    # Bounce rate over time
-    daily_bounce = filtered_df.groupby('date')['bounce_rate'].mean().reset_index()
-    fig_bounce = px.line(
-        daily_bounce,
-        x='date',
-        y='bounce_rate',
-        title="Évolution du Taux de Rebond",
-        color_discrete_sequence=['#e74c3c']
-    )
-    fig_bounce.update_yaxis(tickformat='.1%')
-    fig_bounce.update_layout(height=400)
-    st.plotly_chart(fig_bounce, use_container_width=True)
+with col1, run.section('fig_bounce'):
+    fig_bounce = cached_result('analytics/fig_bounce', figure_deps, build_fig_bounce)
+    run.plotly_chart('fig_bounce', fig_bounce, use_container_width=True)
 
-with col2:
-    # Session duration
-    daily_session = filtered_df.groupby('date')['session_duration'].mean().reset_index()
-    fig_session = px.area(
-        daily_session,
-        x='date',
-        y='session_duration',
-        title="Durée Moyenne des Sessions",
-        color_discrete_sequence=['#2ecc71']
-    )
-    fig_session.update_layout(
-        yaxis_title="Durée (secondes)",
-        height=400
-    )
-    st.plotly_chart(fig_session, use_container_width=True)
\ No newline at end of file
+with col2, run.section('fig_session'):
+    fig_session = cached_result('analytics/fig_session', figure_deps, build_fig_session)
+    run.plotly_chart('fig_session', fig_session, use_container_width=True)
+
+run.finish()
+render_sidebar_summary(run)
@@ -1,71 +1,53 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
-import random
+
+from utils.data_generator import COUNTRIES
+from utils.data_sources import SCHEMAS, current_version, get_source
+from utils.downsampling import FULL_WIDTH_PX
+from utils.figures import make_figure
+from utils.profiler import render_sidebar_summary, start_run
+from utils.regions import TOP_COLUMNS, country_regions, province_regions, with_conversion_rate
+from utils.registry import SharedDataset
+from utils.result_cache import cached_result
+from utils.spatial import SpatialGrid, WORLD, cell_size
+from utils.startup import lazy_import
+
+# Imported when a chart skeleton is first built (utils.startup)
+px = lazy_import('plotly.express')
 
 st.set_page_config(
     page_title="Geographic Analysis",
     page_icon="🗺️",
     layout="wide"
 )
+run = start_run('geographic')
 
 st.title("🗺️ Analyse Géographique")
 st.markdown("---")
 
-# Generate geographic data
-@st.cache_data
-def generate_geo_data():
-    countries = [
-        {"country": "Canada", "code": "CAN", "lat": 56.1304, "lon": -106.3468},
-        {"country": "United States", "code": "USA", "lat": 37.0902, "lon": -95.7129},
-        {"country": "France", "code": "FRA", "lat": 46.2276, "lon": 2.2137},
-        {"country": "Germany", "code": "DEU", "lat": 51.1657, "lon": 10.4515},
-        {"country": "United Kingdom", "code": "GBR", "lat": 55.3781, "lon": -3.4360},
-        {"country": "Japan", "code": "JPN", "lat": 36.2048, "lon": 138.2529},
-        {"country": "Australia", "code": "AUS", "lat": -25.2744, "lon": 133.7751},
-        {"country": "Brazil", "code": "BRA", "lat": -14.2350, "lon": -51.9253},
-        {"country": "India", "code": "IND", "lat": 20.5937, "lon": 78.9629},
-        {"country": "China", "code": "CHN", "lat": 35.8617, "lon": 104.1954}
-    ]
-
-    data = []
-    for country in countries:
-        visitors = random.randint(100, 5000)
-        revenue = visitors * random.uniform(10, 100)
-        conversion_rate = random.uniform(1, 8)
-
-        data.append({
-            **country,
-            "visitors": visitors,
-            "revenue": round(revenue, 2),
-            "conversion_rate": round(conversion_rate, 2),
-            "avg_session_duration": random.randint(120, 600)
-        })
-
-    return pd.DataFrame(data)
-
-df_geo = generate_geo_data()
-
-# Canadian provinces data
-@st.cache_data
-def generate_canada_data():
-    provinces = [
-        {"province": "Ontario", "code": "ON", "visitors": random.randint(1000, 3000)},
-        {"province": "Quebec", "code": "QC", "visitors": random.randint(800, 2500)},
-        {"province": "British Columbia", "code": "BC", "visitors": random.randint(600, 2000)},
-        {"province": "Alberta", "code": "AB", "visitors": random.randint(500, 1800)},
-        {"province": "Manitoba", "code": "MB", "visitors": random.randint(200, 800)},
-        {"province": "Saskatchewan", "code": "SK", "visitors": random.randint(150, 600)},
-        {"province": "Nova Scotia", "code": "NS", "visitors": random.randint(200, 700)},
-        {"province": "New Brunswick", "code": "NB", "visitors": random.randint(150, 500)},
-        {"province": "Newfoundland and Labrador", "code": "NL", "visitors": random.randint(100, 400)},
-        {"province": "Prince Edward Island", "code": "PE", "visitors": random.randint(50, 200)}
-    ]
-    return pd.DataFrame(provinces)
-
-df_canada = generate_canada_data()
+# Visitor locations (lat/lon) from the shared data source (utils.data_sources),
+# aggregated once per data version into a multi-level spatial grid
+# (utils.spatial). The map reads the grid level that suits the view, and the
+# country and province figures are rolled up from the grid's cells instead
+# of re-scanning the locations.
+source = get_source()
+
+MAP_HEIGHT_PX = 500
+
+def build_regions():
+    # Country and province tables of the batch reports (utils.reports). Shared
+    # by every session: sorts and top-N take rows by index, without copying them
+    return SharedDataset(country_regions(grid)), SharedDataset(province_regions(grid))
+
+with run.section('data'):
+    data_version = current_version('geo_points')
+    grid = cached_result(
+        'geographic/grid', data_version,
+        lambda: SpatialGrid.from_partials(source.grid_partials('geo_points'), SCHEMAS['geo_points'][1])
+    )
+    geo_regions, canada_regions = cached_result('geographic/regions', data_version, build_regions)
+    df_geo, df_canada = geo_regions.frame, canada_regions.frame
 
 # Sidebar
 st.sidebar.header("Filtres Géographiques")
@@ -79,67 +61,229 @@ view_type = st.sidebar.radio(
     ["Mondiale", "Canada"]
 )
 
+zones = {"Monde": None, **{
+    country['country']: country['code'] for country in COUNTRIES if country['code'] in set(df_geo['code'])
+}}
+zone = st.sidebar.selectbox("Zone de la carte détaillée", list(zones))
+
 # Key metrics
-total_visitors = df_geo['visitors'].sum()
-total_revenue = df_geo['revenue'].sum()
-avg_conversion = df_geo['conversion_rate'].mean()
-
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Visiteurs Totaux", f"{total_visitors:,}")
-with col2:
-    st.metric("Revenus Totaux", f"${total_revenue:,.2f}")
-with col3:
-    st.metric("Conversion Moyenne", f"{avg_conversion:.1f}%")
+with run.section('metrics'):
+    total_visitors = df_geo['visitors'].sum()
+    total_revenue = df_geo['revenue'].sum()
+    avg_conversion = 100 * df_geo['conversions'].sum() / total_visitors
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Visiteurs Totaux", f"{total_visitors:,}")
+    with col2:
+        st.metric("Revenus Totaux", f"${total_revenue:,.2f}")
+    with col3:
+        st.metric("Conversion Moyenne", f"{avg_conversion:.1f}%")
 
 st.markdown("---")
 
-if view_type == "Mondiale":
-    # World map
-    st.subheader("🌍 Distribution Mondiale")
+# Figures are rebuilt only when the snapshots (or the chosen metric, for the
+# map) change; other reruns and other sessions reuse the shared result cache,
+# and a rebuild only attaches new arrays to the chart's skeleton (utils.figures)
 
-    metric_labels = {
-        "visitors": "Visiteurs",
-        "revenue": "Revenus ($)",
-        "conversion_rate": "Taux de Conversion (%)"
-    }
-
-    fig_world = px.choropleth(
-        df_geo,
-        locations="code",
-        color=metric_choice,
-        hover_name="country",
-        hover_data={
-            "visitors": ":,",
-            "revenue": ":$,.2f",
-            "conversion_rate": ":.1f%"
-        },
-        color_continuous_scale="Blues",
-        title=f"Distribution par {metric_labels[metric_choice]}"
-    )
+metric_labels = {
+    "visitors": "Visiteurs",
+    "revenue": "Revenus ($)",
+    "conversion_rate": "Taux de Conversion (%)"
+}
 
-    fig_world.update_layout(
-        height=500,
-        geo=dict(
-            showframe=False,
-            showcoastlines=True,
-            projection_type='equirectangular'
+def build_fig_world():
+    def build():
+        fig = px.choropleth(
+            df_geo,
+            locations="code",
+            color=metric_choice,
+            hover_name="country",
+            hover_data={
+                "visitors": ":,",
+                "revenue": ":$,.2f",
+                "conversion_rate": ":.1f%"
+            },
+            color_continuous_scale="Blues",
+            title=f"Distribution par {metric_labels[metric_choice]}"
         )
-    )
 
-    st.plotly_chart(fig_world, use_container_width=True)
+        fig.update_layout(
+            height=500,
+            geo=dict(
+                showframe=False,
+                showcoastlines=True,
+                projection_type='equirectangular'
+            )
+        )
+        return fig
+
+    # One skeleton per metric: the title, color bar and hover template depend on it
+    return make_figure(f'geographic/fig_world/{metric_choice}', build, [{
+        'locations': df_geo['code'],
+        'z': df_geo[metric_choice],
+        'hovertext': df_geo['country'],
+        'customdata': np.column_stack([df_geo[column].to_numpy(np.float64) for column in metric_labels]),
+    }])
+
+def build_fig_canada_bar():
+    # Bar chart of Canadian provinces
+    provinces = canada_regions.sorted('visitors')
+
+    def build():
+        fig = px.bar(
+            provinces,
+            x='visitors',
+            y='province',
+            orientation='h',
+            title="Visiteurs par Province",
+            color='visitors',
+            color_continuous_scale='Blues'
+        )
+        fig.update_layout(height=500)
+        return fig
+
+    return make_figure('geographic/fig_canada_bar', build, [{
+        'x': provinces['visitors'], 'y': provinces['province'], 'marker.color': provinces['visitors']
+    }])
+
+def build_fig_canada_pie():
+    def build():
+        fig = px.pie(
+            df_canada,
+            values='visitors',
+            names='province',
+            title="Répartition des Visiteurs Canadiens"
+        )
+        fig.update_layout(height=500)
+        return fig
+
+    return make_figure('geographic/fig_canada_pie', build, [
+        {'values': df_canada['visitors'], 'labels': df_canada['province']}
+    ])
+
+def build_fig_scatter():
+    # Scatter plot: visitors vs revenue
+    def build():
+        fig = px.scatter(
+            df_geo,
+            x='visitors',
+            y='revenue',
+            size='conversion_rate',
+            color='conversion_rate',
+            hover_name='country',
+            title="Visiteurs vs Revenus (taille = taux de conversion)",
+            color_continuous_scale='Viridis'
+        )
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('geographic/fig_scatter', build, [{
+        'x': df_geo['visitors'],
+        'y': df_geo['revenue'],
+        'hovertext': df_geo['country'],
+        'marker.size': df_geo['conversion_rate'],
+        'marker.color': df_geo['conversion_rate'],
+        # Plotly Express scales the largest marker to size_max=20
+        'marker.sizeref': float(df_geo['conversion_rate'].max()) / 20 ** 2,
+    }])
+
+def build_fig_conversion():
+    # Conversion rate comparison
+    countries = geo_regions.sorted('conversion_rate', ascending=False)
+
+    def build():
+        fig = px.bar(
+            countries,
+            x='country',
+            y='conversion_rate',
+            title="Taux de Conversion par Pays",
+            color='conversion_rate',
+            color_continuous_scale='RdYlBu_r'
+        )
+        fig.update_xaxes(tickangle=45)
+        fig.update_layout(height=400)
+        return fig
+
+    return make_figure('geographic/fig_conversion', build, [{
+        'x': countries['country'], 'y': countries['conversion_rate'], 'marker.color': countries['conversion_rate']
+    }])
+
+def build_fig_map():
+    # Non-empty cells of the zone, at the finest level still a few pixels wide
+    bounds = WORLD if zones[zone] is None else grid.extent(country_code=zones[zone])
+    level = grid.level_for(bounds, FULL_WIDTH_PX, MAP_HEIGHT_PX)
+    cells = with_conversion_rate(grid.cells(level, bounds))
+    # Square markers as wide as a cell, so that the cells tile the map
+    degrees_per_px = max((bounds[2] - bounds[0]) / FULL_WIDTH_PX, (bounds[3] - bounds[1]) / MAP_HEIGHT_PX)
+    cell_px = cell_size(level) / degrees_per_px
+    hover = ['visitors', 'revenue', 'conversion_rate', 'points']
+    title = f"{metric_labels[metric_choice]} par cellule : {zone}"
+
+    def build():
+        fig = go.Figure(go.Scattergeo(
+            lon=cells['lon'],
+            lat=cells['lat'],
+            mode='markers',
+            marker=dict(
+                symbol='square',
+                size=cell_px,
+                color=cells[metric_choice],
+                colorscale='Blues',
+                colorbar=dict(title=metric_labels[metric_choice])
+            ),
+            customdata=np.column_stack([cells[column].to_numpy(np.float64) for column in hover]),
+            hovertemplate=(
+                "Visiteurs : %{customdata[0]:,}<br>Revenus : $%{customdata[1]:,.2f}<br>"
+                "Conversion : %{customdata[2]:.1f}%<br>Localisations : %{customdata[3]:,}<extra></extra>"
+            )
+        ))
+        fig.update_layout(
+            title=title,
+            height=MAP_HEIGHT_PX,
+            geo=dict(
+                showframe=False,
+                showcoastlines=True,
+                showcountries=True,
+                projection_type='equirectangular',
+                lonaxis_range=[bounds[0], bounds[2]],
+                lataxis_range=[bounds[1], bounds[3]]
+            )
+        )
+        return fig
+
+    fig = make_figure(f'geographic/fig_map/{metric_choice}', build, [{
+        'lon': cells['lon'],
+        'lat': cells['lat'],
+        'marker.color': cells[metric_choice],
+        'marker.size': cell_px,
+        'customdata': np.column_stack([cells[column].to_numpy(np.float64) for column in hover]),
+    }], layout={
+        'title.text': title,
+        'geo.lonaxis.range': [bounds[0], bounds[2]],
+        'geo.lataxis.range': [bounds[1], bounds[3]],
+    })
+    return fig, level, len(cells), int(cells['points'].sum())
+
+if view_type == "Mondiale":
+    # World map
+    st.subheader("🌍 Distribution Mondiale")
+
+    with run.section('fig_world'):
+        fig_world = cached_result('geographic/fig_world', (data_version, metric_choice), build_fig_world)
+        run.plotly_chart('fig_world', fig_world, use_container_width=True)
 
     # Top countries table
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, run.section('top_countries'):
         st.subheader("🏆 Top Pays par Visiteurs")
-        top_visitors = df_geo.nlargest(5, 'visitors')[['country', 'visitors', 'revenue']]
+        top_visitors = geo_regions.top(5, 'visitors', TOP_COLUMNS['visitors'])
         st.dataframe(top_visitors, use_container_width=True, hide_index=True)
 
-    with col2:
+    with col2, run.section('top_countries'):
         st.subheader("💰 Top Pays par Revenus")
-        top_revenue = df_geo.nlargest(5, 'revenue')[['country', 'revenue', 'conversion_rate']]
+        top_revenue = geo_regions.top(5, 'revenue', TOP_COLUMNS['revenue'])
         st.dataframe(top_revenue, use_container_width=True, hide_index=True)
 
 else:
@@ -148,61 +292,39 @@ else:
 
     col1, col2 = st.columns(2)
 
-    with col1:
-        # Bar chart of Canadian provinces
-        fig_canada_bar = px.bar(
-            df_canada.sort_values('visitors', ascending=True),
-            x='visitors',
-            y='province',
-            orientation='h',
-            title="Visiteurs par Province",
-            color='visitors',
-            color_continuous_scale='Blues'
-        )
-        fig_canada_bar.update_layout(height=500)
-        st.plotly_chart(fig_canada_bar, use_container_width=True)
+    with col1, run.section('fig_canada_bar'):
+        fig_canada_bar = cached_result('geographic/fig_canada_bar', data_version, build_fig_canada_bar)
+        run.plotly_chart('fig_canada_bar', fig_canada_bar, use_container_width=True)
 
-    with col2:
-        # Pie chart
-        fig_canada_pie = px.pie(
-            df_canada,
-            values='visitors',
-            names='province',
-            title="Répartition des Visiteurs Canadiens"
-        )
-        fig_canada_pie.update_layout(height=500)
-        st.plotly_chart(fig_canada_pie, use_container_width=True)
+    with col2, run.section('fig_canada_pie'):
+        fig_canada_pie = cached_result('geographic/fig_canada_pie', data_version, build_fig_canada_pie)
+        run.plotly_chart('fig_canada_pie', fig_canada_pie, use_container_width=True)
+
+# Detailed map: the grid cells of the chosen zone
+st.subheader("🔍 Carte Détaillée")
+
+with run.section('fig_map'):
+    fig_map, map_level, map_cells, map_points = cached_result(
+        'geographic/fig_map', (data_version, zone, metric_choice), build_fig_map
+    )
+    run.plotly_chart('fig_map', fig_map, use_container_width=True)
+    st.caption(
+        f"Niveau {map_level} de la grille : cellules de {cell_size(map_level):.3g}° de côté, "
+        f"{map_cells:,} cellules non vides ({map_points:,} localisations agrégées)."
+    )
 
 # Geographic performance
 st.subheader("📊 Performance par Région")
 
 col1, col2 = st.columns(2)
 
-with col1:
-    # Scatter plot: visitors vs revenue
-    fig_scatter = px.scatter(
-        df_geo,
-        x='visitors',
-        y='revenue',
-        size='conversion_rate',
-        color='conversion_rate',
-        hover_name='country',
-        title="Visiteurs vs Revenus (taille = taux de conversion)",
-        color_continuous_scale='Viridis'
-    )
-    fig_scatter.update_layout(height=400)
-    st.plotly_chart(fig_scatter, use_container_width=True)
+with col1, run.section('fig_scatter'):
+    fig_scatter = cached_result('geographic/fig_scatter', data_version, build_fig_scatter)
+    run.plotly_chart('fig_scatter', fig_scatter, use_container_width=True)
 
-with col2:
-    # Conversion rate comparison
-    fig_conversion = px.bar(
-        df_geo.sort_values('conversion_rate', ascending=False),
-        x='country',
-        y='conversion_rate',
-        title="Taux de Conversion par Pays",
-        color='conversion_rate',
-        color_continuous_scale='RdYlBu_r'
-    )
-    fig_conversion.update_xaxis(tickangle=45)
-    fig_conversion.update_layout(height=400)
-    st.plotly_chart(fig_conversion, use_container_width=True)
\ No newline at end of file
+with col2, run.section('fig_conversion'):
+    fig_conversion = cached_result('geographic/fig_conversion', data_version, build_fig_conversion)
+    run.plotly_chart('fig_conversion', fig_conversion, use_container_width=True)
+
+run.finish()
+render_sidebar_summary(run)
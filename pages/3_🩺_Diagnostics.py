@@ -0,0 +1,206 @@
+import streamlit as st
+import pandas as pd
+
+from utils.data_sources import PAGE_DATASETS, get_refresher, get_registry, get_source, shared_dataset
+from utils.profiler import render_sidebar_summary, start_run
+from utils.result_cache import get_result_cache
+from utils.schemas import memory_report
+from utils.startup import timeline
+
+st.set_page_config(
+    page_title="Diagnostics",
+    page_icon="🩺",
+    layout="wide"
+)
+run = start_run('diagnostics')
+
+st.title("🩺 Diagnostics")
+st.markdown("---")
+
+# Shared result cache: one per process, filled by every page and session
+result_cache = get_result_cache()
+
+st.sidebar.header("Cache de résultats")
+if st.sidebar.button("🗑️ Vider le cache"):
+    result_cache.clear()
+
+with run.section('metrics'):
+    stats = result_cache.stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Entrées", f"{stats['entries']:,}")
+    with col2:
+        st.metric(
+            "Taille",
+            f"{stats['bytes'] / 2**20:.1f} Mo",
+            help=f"Budget : {stats['max_bytes'] / 2**20:.0f} Mo"
+        )
+        st.progress(min(stats['bytes'] / stats['max_bytes'], 1.0))
+    with col3:
+        hit_rate = "–" if stats['hit_rate'] is None else f"{stats['hit_rate']:.1%}"
+        st.metric("Taux de succès", hit_rate, help=f"{stats['hits']:,} succès / {stats['misses']:,} échecs")
+    with col4:
+        st.metric(
+            "Évictions",
+            f"{stats['evictions']:,}",
+            help=f"{stats['expirations']:,} entrées expirées, resservies pendant leur recalcul"
+        )
+
+st.subheader("📦 Entrées du cache")
+st.caption("De la moins récemment utilisée (prochaine évincée) à la plus récente.")
+
+with run.section('table'):
+    entries = pd.DataFrame(result_cache.entries(), columns=['key', 'bytes', 'age_s', 'ttl_s', 'hits'])
+    entries['name'] = entries['key'].map(lambda key: key[0])
+    entries['deps'] = entries['key'].map(lambda key: repr(key[1]))
+    entries['kb'] = entries['bytes'] / 1024
+
+    st.dataframe(
+        entries[['name', 'deps', 'kb', 'age_s', 'ttl_s', 'hits']],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "name": st.column_config.TextColumn("Résultat"),
+            "deps": st.column_config.TextColumn("Entrées"),
+            "kb": st.column_config.NumberColumn("Taille (Ko)", format="%.1f"),
+            "age_s": st.column_config.NumberColumn("Âge (s)", format="%.0f"),
+            "ttl_s": st.column_config.NumberColumn("Expire dans (s)", format="%.0f"),
+            "hits": st.column_config.NumberColumn("Succès", format="%d"),
+        }
+    )
+
+# Background refresh of the datasets: pages read the last version built here
+st.subheader("🔄 Rafraîchissement en arrière-plan")
+refresher = get_refresher()
+st.caption(f"Toutes les {refresher.interval} s (DASHBOARD_REFRESH_INTERVAL).")
+if st.button("Rafraîchir maintenant"):
+    refresher.refresh_now()
+
+with run.section('refresher'):
+    jobs = pd.DataFrame(
+        refresher.status(), columns=['key', 'value', 'updated', 'duration_s', 'next_in_s', 'running', 'error']
+    )
+    jobs['updated'] = pd.to_datetime(jobs['updated'], unit='s', utc=True).dt.tz_convert(None)
+    jobs['value'] = jobs['value'].astype(str)
+    st.dataframe(
+        jobs,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "key": st.column_config.TextColumn("Jeu de données"),
+            "value": st.column_config.TextColumn("Version"),
+            "updated": st.column_config.DatetimeColumn("Dernier rafraîchissement (UTC)", format="HH:mm:ss"),
+            "duration_s": st.column_config.NumberColumn("Durée (s)", format="%.3f"),
+            "next_in_s": st.column_config.NumberColumn("Prochain dans (s)", format="%.0f"),
+            "running": st.column_config.CheckboxColumn("En cours"),
+            "error": st.column_config.TextColumn("Dernière erreur"),
+        }
+    )
+
+# Memory of the frames of the shared datasets, with the compact dtypes of
+# utils.schemas versus the pandas defaults
+st.subheader("🧮 Mémoire des jeux de données")
+
+with run.section('memory'):
+    report = memory_report({
+        name: shared_dataset(name).frame for name in PAGE_DATASETS
+    })
+    st.dataframe(
+        report,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "dataset": st.column_config.TextColumn("Jeu de données"),
+            "rows": st.column_config.NumberColumn("Lignes", format="%d"),
+            "default_mb": st.column_config.NumberColumn("Types par défaut (Mo)", format="%.3f"),
+            "compact_mb": st.column_config.NumberColumn("Types compacts (Mo)", format="%.3f"),
+            "ratio": st.column_config.NumberColumn("Gain", format="%.1f×"),
+        }
+    )
+
+# Datasets of the process-wide registry (utils.registry): one copy of the
+# current version of each, which sessions read through views
+st.subheader("🧊 Jeux de données partagés")
+
+with run.section('registry'):
+    shared = pd.DataFrame(
+        get_registry().entries(), columns=['dataset', 'version', 'rows', 'bytes', 'orders', 'calls']
+    )
+    shared['version'] = shared['version'].astype(str)
+    shared['mb'] = shared['bytes'] / 2**20
+    st.dataframe(
+        shared[['dataset', 'version', 'rows', 'mb', 'orders', 'calls']],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "dataset": st.column_config.TextColumn("Jeu de données"),
+            "version": st.column_config.TextColumn("Version"),
+            "rows": st.column_config.NumberColumn("Lignes", format="%d"),
+            "mb": st.column_config.NumberColumn("Taille (Mo)", format="%.3f"),
+            "orders": st.column_config.NumberColumn("Ordres de tri", format="%d"),
+            "calls": st.column_config.NumberColumn("Lectures servies", format="%d"),
+        }
+    )
+    st.caption("Périodes, tris et top-N sont des vues de ces lignes : une session n'en copie aucune.")
+
+# Time partitions of the history of the synthetic time series (utils.partitions):
+# raw days or months, and the monthly hourly rollups they are compacted into
+stores = getattr(get_source(), 'stores', {})
+if stores:
+    st.subheader("🗂️ Partitions de l'historique")
+
+    with run.section('partitions'):
+        for name, store in stores.items():
+            history = store.history
+            if history is None:
+                continue
+            partitions = pd.DataFrame(history.entries(), columns=['key', 'level', 'rows', 'bytes', 'min', 'max'])
+            summary = partitions.groupby('level').agg(
+                partitions=('key', 'size'), rows=('rows', 'sum'), bytes=('bytes', 'sum'),
+                first=('min', 'min'), last=('max', 'max')
+            ).reset_index()
+            summary['mb'] = summary['bytes'] / 2**20
+            st.markdown(f"**{name}**")
+            st.dataframe(
+                summary[['level', 'partitions', 'rows', 'mb', 'first', 'last']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "level": st.column_config.TextColumn("Niveau"),
+                    "partitions": st.column_config.NumberColumn("Partitions", format="%d"),
+                    "rows": st.column_config.NumberColumn("Lignes", format="%d"),
+                    "mb": st.column_config.NumberColumn("Taille (Mo)", format="%.3f"),
+                    "first": st.column_config.TextColumn("Début"),
+                    "last": st.column_config.TextColumn("Fin"),
+                }
+            )
+            st.caption(
+                f"Lectures de ce processus : {history.reads:,} partitions ouvertes, "
+                f"{history.skipped:,} écartées sur leurs bornes sans être lues."
+            )
+
+# Startup of the process: warm-up phases (python -m utils.startup), imports
+# deferred to their first use, and the first render of each page
+st.subheader("🚀 Démarrage")
+
+with run.section('startup'):
+    phases = pd.DataFrame(timeline(), columns=['phase', 'start_s', 'duration_s', 'detail'])
+    if phases.empty:
+        st.caption("Aucune phase enregistrée.")
+    else:
+        st.dataframe(
+            phases,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "phase": st.column_config.TextColumn("Phase"),
+                "start_s": st.column_config.NumberColumn("Début (s)", format="%.2f"),
+                "duration_s": st.column_config.NumberColumn("Durée (s)", format="%.3f"),
+                "detail": st.column_config.TextColumn("Détail"),
+            }
+        )
+        st.caption("Début compté depuis le lancement du processus.")
+
+run.finish()
+render_sidebar_summary(run)
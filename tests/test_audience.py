@@ -0,0 +1,46 @@
+import pytest
+
+from utils.audience import METRICS, AudienceSketches, exact_audience
+from utils.streaming import generate_range
+
+SEED = 3
+
+
+@pytest.fixture(scope='module')
+def rows():
+    return generate_range('analytics', '2024-01-01', '2024-02-15', seed=SEED)
+
+
+@pytest.fixture(scope='module')
+def summary(rows):
+    return AudienceSketches(60, seed=SEED).update(rows)
+
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-01-01', '2024-02-15'),
+    ('2024-01-10', '2024-01-17'),
+    ('2024-02-01', '2024-02-02'),
+])
+def test_estimates_bracket_the_exact_audience(rows, summary, start, end):
+    exact = exact_audience(rows, start, end, seed=SEED)
+    estimated = summary.estimate(start, end)
+    assert estimated['sessions'] == exact['sessions']
+    for metric in METRICS:
+        value = exact['values'][metric][0]
+        estimate, low, high = estimated['values'][metric]
+        assert low <= value <= high, metric
+        assert estimate == pytest.approx(value, rel=0.05), metric
+
+
+def test_sketches_extended_by_day_match_sketches_built_at_once(rows, summary):
+    sketches = AudienceSketches(60, seed=SEED)
+    sketches.update(rows[rows['date'] < '2024-01-20'])
+    extended = sketches.update(rows[rows['date'] >= sketches.since])
+    for start, end in [('2024-01-01', '2024-02-15'), ('2024-01-15', '2024-01-25')]:
+        assert extended.estimate(start, end)['values'] == summary.estimate(start, end)['values']
+
+
+def test_period_without_data(summary):
+    estimated = summary.estimate('2023-01-01', '2023-02-01')
+    assert estimated['sessions'] == 0
+    assert all(value == (None, None, None) for value in estimated['values'].values())
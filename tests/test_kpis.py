@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.kpis import KpiEngine, format_change, format_difference
+
+METRICS = ['traffic', 'bounce_rate']
+HOW = {'traffic': 'sum', 'bounce_rate': 'mean'}
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(5)
+    n = 24 * 60
+    df = pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'traffic': rng.integers(0, 500, n).astype(float),
+        'bounce_rate': rng.uniform(20, 80, n),
+    })
+    df.loc[rng.choice(n, 100, replace=False), 'bounce_rate'] = np.nan
+    # Shuffled: the engine sorts the rows once
+    return df.sample(frac=1, random_state=1)
+
+
+def grouped(df, start, end):
+    # Both periods by a direct groupby on the period of each row
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    edges = [start - (end - start), start, end]
+    labels = pd.cut(df['datetime'], edges, right=False, labels=['previous', 'value'])
+    return df.groupby(labels, observed=False).agg({'traffic': 'sum', 'bounce_rate': 'mean'})
+
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-02-01', '2024-02-08'),
+    ('2024-01-20 05:00', '2024-02-05 17:00'),
+    ('2024-01-31', '2024-03-01'),
+])
+def test_compare_matches_a_groupby_over_both_periods(rows, start, end):
+    engine = KpiEngine.from_frame(rows, 'datetime', METRICS)
+    kpi = engine.compare(start, end, HOW)
+    expected = grouped(rows, start, end)
+    for metric in METRICS:
+        for column in ('value', 'previous'):
+            assert kpi[metric][column] == pytest.approx(expected.loc[column, metric], rel=1e-12)
+        change = (expected.loc['value', metric] - expected.loc['previous', metric]) / expected.loc['previous', metric]
+        assert kpi[metric]['change'] == pytest.approx(change, rel=1e-9)
+
+
+def test_partials_give_the_same_kpis_as_rows(rows):
+    parts = rows.assign(bucket=rows['datetime'])
+    for metric in METRICS:
+        parts[f'{metric}_sum'] = rows[metric].fillna(0.0)
+        parts[f'{metric}_count'] = rows[metric].notna().astype(int)
+    from_rows = KpiEngine.from_frame(rows, 'datetime', METRICS).compare('2024-02-10', '2024-02-20', HOW)
+    assert KpiEngine.from_partials(parts, METRICS).compare('2024-02-10', '2024-02-20', HOW) == from_rows
+
+
+def test_empty_and_partial_periods(rows):
+    engine = KpiEngine.from_frame(rows, 'datetime', METRICS)
+
+    # No bucket in either period: a zero sum, no mean, no change
+    kpi = engine.compare('2025-01-01', '2025-01-08', HOW)
+    assert kpi['traffic'] == {'value': 0.0, 'previous': 0.0, 'change': None}
+    assert kpi['bounce_rate'] == {'value': None, 'previous': None, 'change': None}
+
+    # The previous period starts before the first bucket: it would be partial
+    kpi = engine.compare('2024-01-05', '2024-01-15', HOW)
+    assert kpi['traffic']['previous'] is None and kpi['traffic']['change'] is None
+    assert kpi['traffic']['value'] == rows.loc[rows['datetime'].between('2024-01-05', '2024-01-14 23:00'), 'traffic'].sum()
+
+    empty = KpiEngine.from_frame(rows.iloc[:0], 'datetime', METRICS)
+    assert empty.first is None
+    assert empty.compare('2024-01-01', '2024-01-02', HOW)['bounce_rate']['value'] is None
+
+
+def test_unknown_aggregation_is_rejected(rows):
+    with pytest.raises(ValueError):
+        KpiEngine.from_frame(rows, 'datetime', METRICS).compare('2024-02-01', '2024-02-02', {'traffic': 'max'})
+
+
+def test_formatting_of_missing_values():
+    assert format_change({'value': 10.0, 'previous': None, 'change': None}) is None
+    assert format_change({'value': 10.0, 'previous': 8.0, 'change': 0.25}) == '+25.0%'
+    assert format_difference({'value': None, 'previous': 4.0, 'change': None}, '{:+.1f} pt') is None
+    assert format_difference({'value': 4.0, 'previous': None, 'change': None}, '{:+.1f} pt') is None
+    assert format_difference({'value': 4.5, 'previous': 5.0, 'change': -0.1}, '{:+.1f} pt') == '-0.5 pt'
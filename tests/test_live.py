@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.live import LiveFeed, LiveState, SyntheticEvents, patch_figure
+
+
+def daily(days=20):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        'date': pd.date_range('2024-03-01', periods=days, freq='D'),
+        'ventes': rng.integers(10, 50, days),
+        'utilisateurs': rng.integers(100, 500, days),
+        'revenus': rng.uniform(500, 2000, days).round(2),
+    })
+
+
+def figure(state):
+    days = state.frame()
+    return go.Figure([go.Scatter(x=days['date'], y=days['revenus']), go.Scatter(x=days['date'], y=days['tendance'])])
+
+
+def test_patched_figure_matches_a_rebuilt_one():
+    state = LiveState(daily(), 14)
+    fig = figure(state)
+    version, _ = state.snapshot()
+    # Events on the last day, then on two new days that push the first ones out
+    state.fold([{'time': pd.Timestamp('2024-03-20 10:00'), 'ventes': 1, 'utilisateurs': 2, 'revenus': 30.0}])
+    state.fold([{'time': pd.Timestamp('2024-03-22 09:00'), 'ventes': 2, 'utilisateurs': 1, 'revenus': 12.5}])
+
+    _, changes, first = state.changes(version)
+    patch_figure(fig, changes, ['revenus', 'tendance'], first)
+
+    expected = figure(state)
+    for patched, rebuilt in zip(fig.data, expected.data):
+        np.testing.assert_array_equal(np.asarray(patched.x, dtype='datetime64[ns]'),
+                                      np.asarray(rebuilt.x, dtype='datetime64[ns]'))
+        np.testing.assert_array_equal(np.asarray(patched.y, dtype=float), np.asarray(rebuilt.y, dtype=float))
+
+
+def test_rebase_starts_from_the_new_batch_data_only_once_per_version():
+    feed = LiveFeed(LiveState(daily(), 14), base='v1')
+    first = feed.state
+    assert feed.rebase('v1', lambda: LiveState(daily(), 14)) is first
+
+    refreshed = daily().assign(revenus=1.0)
+    state = feed.rebase('v2', lambda: LiveState(refreshed, 14))
+    assert state is feed.state and state is not first
+    assert state.snapshot()[1]['revenus'] == 14.0
+    assert feed.rebase('v2', lambda: LiveState(daily(), 14)) is state
+
+
+def test_producer_runs_while_the_feed_is_drained():
+    feed = LiveFeed(LiveState(daily(), 14))
+    events = SyntheticEvents(feed, rate=2000, idle=0.3)
+    assert not events.running
+
+    events.start()
+    deadline = time.monotonic() + 5
+    while not feed.stats()['received'] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert events.running and feed.stats()['received']
+
+    # No drain for longer than ``idle``: the thread ends, the next subscriber starts it again
+    deadline = time.monotonic() + 5
+    while events.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not events.running
+    feed.drain()
+    assert events.start().running
+    events.stop()
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.partitions import PartitionedStore
+
+METRICS = ['traffic', 'conversions']
+
+
+def hourly(start, periods, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.date_range(start, periods=periods, freq='h'),
+        'traffic': rng.integers(100, 1000, periods).astype(float),
+        'conversions': rng.integers(0, 50, periods).astype(float),
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PartitionedStore(str(tmp_path / 'analytics'), 'date', METRICS)
+    # Replaced files go with the commit that replaces them
+    store.retire_after = 0
+    return store
+
+
+def files(store):
+    return sorted(name for name in os.listdir(store.root) if name.endswith('.arrow'))
+
+
+def test_overlapping_write_replaces_only_its_range(store):
+    rows = hourly('2024-05-01', 24 * 3)
+    store.write(rows)
+    update = hourly('2024-05-01 20:00', 10, seed=1)
+    store.write(update)
+
+    expected = pd.concat([rows[rows['date'] < update['date'].iloc[0]], update,
+                          rows[rows['date'] > update['date'].iloc[-1]]], ignore_index=True)
+    pd.testing.assert_frame_equal(store.read(), expected)
+    # Only the two days the update touches are rewritten
+    assert files(store) == ['day=2024-05-01.2.arrow', 'day=2024-05-02.2.arrow', 'day=2024-05-03.1.arrow']
+
+
+def test_partials_unchanged_by_compact(store):
+    store.write(hourly('2024-04-20', 24 * 20))
+    before = store.partials()
+    bounded = store.partials('2024-04-28 05:30', '2024-05-04')
+
+    assert store.compact('2024-05-05') == 15
+    levels = {level for _, level, *_ in store.entries()}
+    assert levels == {'raw', 'rollup'}
+    pd.testing.assert_frame_equal(store.partials(), before)
+    pd.testing.assert_frame_equal(store.partials('2024-04-28 05:30', '2024-05-04'), bounded)
+
+
+def test_reads_skip_partitions_outside_the_period(store):
+    store.write(hourly('2024-05-01', 24 * 10))
+    store.reads = store.skipped = 0
+
+    rows = store.read('2024-05-04 12:00', '2024-05-06')
+    assert (store.reads, store.skipped) == (2, 8)
+    assert rows['date'].min() == pd.Timestamp('2024-05-04 12:00')
+    assert rows['date'].max() == pd.Timestamp('2024-05-05 23:00')
+
+    store.reads = store.skipped = 0
+    store.partials('2024-05-10', '2024-05-20')
+    assert (store.reads, store.skipped) == (1, 9)
+
+
+def test_drop_before_removes_only_expired_files(store):
+    store.write(hourly('2024-05-01', 24 * 5))
+    kept = [name for name in files(store) if name >= 'day=2024-05-03']
+
+    assert store.drop_before('2024-05-03') == 2
+    assert files(store) == kept
+    assert [key for key, *_ in store.entries()] == ['day=2024-05-03', 'day=2024-05-04', 'day=2024-05-05']
+    assert store.read()['date'].min() == pd.Timestamp('2024-05-03')
+    assert store.drop_before('2024-05-03') == 0
+
+
+def compacting_on_first_listing(reader, writer, before):
+    # The reader lists the partitions of the current manifest, then another
+    # store compacts them before it opens any
+    listing = reader.partitions
+
+    def partitions(*args, **kwargs):
+        selected = listing(*args, **kwargs)
+        if not writer.compacted:
+            writer.compacted = writer.compact(before)
+        return selected
+
+    reader.partitions = partitions
+    writer.compacted = 0
+
+
+def test_reader_of_the_previous_manifest_reads_retired_files(tmp_path):
+    root = str(tmp_path / 'analytics')
+    reader = PartitionedStore(root, 'date', METRICS)
+    reader.write(hourly('2024-05-01', 24 * 6))
+    expected = reader.read()
+    writer = PartitionedStore(root, 'date', METRICS)
+    compacting_on_first_listing(reader, writer, '2024-05-04')
+
+    # Listed from the previous manifest: raw days the new one rolled up
+    pd.testing.assert_frame_equal(reader.read(), expected)
+    assert writer.compacted == 3
+    assert [level for _, level, *_ in writer.entries()] == ['rollup', 'raw', 'raw', 'raw']
+    # Removed by the first change after their grace period
+    writer.retire_after = 0
+    writer.update_metadata({'watermark': '2024-05-07'})
+    assert files(writer) == sorted(entry['file'] for _, entry in writer.partitions())
+
+
+def test_read_starts_over_when_a_listed_file_is_removed(tmp_path):
+    root = str(tmp_path / 'analytics')
+    reader = PartitionedStore(root, 'date', METRICS)
+    reader.write(hourly('2024-05-01', 24 * 6))
+    expected = reader.partials()
+    writer = PartitionedStore(root, 'date', METRICS)
+    writer.retire_after = 0
+    compacting_on_first_listing(reader, writer, '2024-05-04')
+
+    pd.testing.assert_frame_equal(reader.partials(), expected)
+    assert writer.compacted == 3
+
+
+def test_missing_partition_raises_instead_of_a_partial_period(store):
+    store.write(hourly('2024-05-01', 24 * 3))
+    os.unlink(os.path.join(store.root, files(store)[1]))
+
+    with pytest.raises(FileNotFoundError):
+        store.read()
+    with pytest.raises(FileNotFoundError):
+        store.partials('2024-05-01', '2024-05-04')
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from utils.refresher import Refresher, SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_single_flight_shares_one_load_between_concurrent_callers():
+    flight = SingleFlight()
+    loads = []
+    callers = 12
+    barrier = threading.Barrier(callers)
+
+    def load():
+        loads.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(flight.do('key', load))
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len(results) == callers and all(result is results[0] for result in results)
+    assert not flight.in_flight('key')
+    # Nothing is kept once the flight has landed
+    flight.do('key', load)
+    assert len(loads) == 2
+
+
+def test_single_flight_error_reaches_every_waiter():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def load():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError('source down')
+
+    def call():
+        try:
+            flight.do('key', load)
+        except RuntimeError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=call) for _ in range(4)]
+    for waiter in waiters:
+        waiter.start()
+    for thread in [leader] + waiters:
+        thread.join()
+    assert len(errors) == 5
+
+
+def test_refresher_serves_the_last_value_while_it_refreshes():
+    values = iter(range(100))
+    release = threading.Event()
+
+    def job():
+        value = next(values)
+        if value:
+            release.wait(5)
+        return value
+
+    refresher = Refresher(interval=60).start()
+    refresher.watch('sample', job)
+    assert refresher.get('sample') == 0
+    refresher.refresh_now('sample')
+    assert wait_for(lambda: refresher.status()[0]['running'])
+    assert refresher.get('sample') == 0
+    release.set()
+    assert wait_for(lambda: refresher.get('sample') == 1)
+    refresher.stop()
@@ -0,0 +1,42 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.registry import SharedDataset
+
+
+def dataset(days=100):
+    return SharedDataset(pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=days, freq='D'),
+        'ventes': np.arange(days, dtype=np.int64),
+    }), 'date')
+
+
+def test_periods_share_the_rows_and_writes_stay_in_the_session():
+    shared = dataset()
+    period = shared.period('2024-02-01', '2024-03-01')
+    tail = shared.tail(10)
+
+    assert list(period['ventes']) == list(range(31, 60))
+    assert np.shares_memory(period['ventes'].to_numpy(), shared.frame['ventes'].to_numpy())
+    assert np.shares_memory(tail['ventes'].to_numpy(), shared.frame['ventes'].to_numpy())
+
+    period.loc[0, 'ventes'] = -1
+    assert shared.frame.loc[31, 'ventes'] == 31
+
+
+def test_reads_served_are_counted_across_threads():
+    shared = dataset()
+
+    def read():
+        for _ in range(500):
+            shared.tail(5)
+            shared.top(3, 'ventes')
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.calls == 8 * 500 * 2
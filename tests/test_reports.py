@@ -0,0 +1,27 @@
+import pandas as pd
+
+from utils import reports
+
+
+def test_failed_tenant_is_indexed_and_the_batch_goes_on(tmp_path, monkeypatch):
+    grid = reports.tenant_grid
+
+    def tenant_grid(tenant, *args):
+        if tenant == 1:
+            raise RuntimeError('no locations')
+        return grid(tenant, *args)
+
+    monkeypatch.setattr(reports, 'tenant_grid', tenant_grid)
+    output_dir = tmp_path / 'out'
+    summary = reports.run_reports(str(output_dir), range(3), days=7, formats=['csv'], workers=1, points=500,
+                                  cache_dir=str(tmp_path / 'cache'))
+
+    assert (summary['reports'], summary['failures']) == (3, 1)
+    index = pd.read_csv(output_dir / 'index.csv', keep_default_na=False)
+    assert list(index.columns) == ['tenant', 'bytes', 'aggregates', 'tables', 'csv', 'error']
+    assert list(index['tenant']) == [0, 1, 2]
+    assert list(index['error']) == ['', 'RuntimeError: no locations', '']
+    assert index.loc[1, 'bytes'] == 0 and index.loc[1, 'aggregates'] == ''
+    assert (index.loc[[0, 2], 'bytes'] > 0).all()
+    assert not (output_dir / 'tenant-000001').exists()
+    assert (output_dir / 'tenant-000002' / 'kpis.csv').exists()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils.result_cache import ResultCache
+
+
+def block(kb):
+    return np.zeros(kb * 1024, dtype=np.uint8)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_budget_evicts_least_recently_used_first():
+    cache = ResultCache(3 * 1024)
+    for key in 'abc':
+        cache.put(key, block(1))
+    cache.get_or_build('a', lambda: pytest.fail("'a' is cached"))
+
+    cache.put('d', block(1))
+    assert [entry['key'] for entry in cache.entries()] == ['c', 'a', 'd']
+    cache.put('e', block(2))
+    assert [entry['key'] for entry in cache.entries()] == ['d', 'e']
+    stats = cache.stats()
+    assert (stats['evictions'], stats['bytes']) == (3, 3 * 1024)
+
+    # Larger than the whole budget: returned, never stored
+    assert len(cache.put('f', block(4))) == 4 * 1024
+    assert [entry['key'] for entry in cache.entries()] == ['d', 'e']
+
+
+def test_expired_entry_is_served_while_one_rebuild_runs():
+    cache = ResultCache(2**20, ttl=0.05)
+    builds = []
+    release = threading.Event()
+
+    def build():
+        builds.append(len(builds))
+        if len(builds) > 1:
+            release.wait(5)
+        return len(builds)
+
+    assert cache.get_or_build('k', build) == 1
+    time.sleep(0.1)
+
+    values = []
+    readers = [threading.Thread(target=lambda: values.append(cache.get_or_build('k', build))) for _ in range(16)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    # Every reader got the stale value at once, a single rebuild is running
+    assert values == [1] * 16
+    assert len(builds) == 2
+    release.set()
+
+    assert wait_for(lambda: cache.get_or_build('k', build) == 2)
+    assert len(builds) == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_background_result_starts_one_build():
+    cache = ResultCache(2**20)
+    calls = []
+    release = threading.Event()
+
+    def build():
+        calls.append(1)
+        release.wait(5)
+        return 'done'
+
+    assert [cache.get_or_start('k', build) for _ in range(10)] == [None] * 10
+    release.set()
+    assert wait_for(lambda: cache.get_or_start('k', build) == 'done')
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.rolling import QUANTILES, RollingStats, quantile_label
+
+WINDOWS = {'3h': 3, '1d': 24, '7d': 168}
+
+
+def series(points=500):
+    rng = np.random.default_rng(7)
+    traffic = rng.gamma(2.0, 400.0, points)
+    # Flat runs and negative values take the kernels' special cases
+    traffic[100:130] = 250.0
+    traffic[300:310] *= -1
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=points, freq='h'), 'traffic': traffic})
+
+
+def expected(df):
+    columns = {}
+    for label, size in WINDOWS.items():
+        window = df['traffic'].rolling(size)
+        columns[f'traffic_sum_{label}'] = window.sum()
+        columns[f'traffic_mean_{label}'] = window.mean()
+        columns[f'traffic_std_{label}'] = window.std()
+        for q in QUANTILES:
+            columns[f'traffic_{quantile_label(q)}_{label}'] = window.quantile(q)
+    return pd.DataFrame(columns)
+
+
+@pytest.mark.parametrize('chunks', [[500], [1] * 500, [7] * 71 + [3], [168, 1, 200, 131]])
+def test_matches_pandas_rolling_whatever_the_chunks(chunks):
+    df = series(sum(chunks))
+    stats = RollingStats(['traffic'], WINDOWS, time_col='date')
+    offset = 0
+    for size in chunks:
+        stats.append(df.iloc[offset:offset + size])
+        offset += size
+
+    result = stats.frame()
+    pd.testing.assert_series_equal(result['date'], df['date'])
+    reference = expected(df)
+    for column in reference:
+        pd.testing.assert_series_equal(result[column], reference[column], check_names=False, check_exact=True)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import disk_cache
+from utils.data_generator import generate_province_data
+from utils.schemas import DTYPES, SchemaError, compact, default_dtypes, validate
+from utils.streaming import generate_range
+
+
+@pytest.fixture(scope='module')
+def frames():
+    return {
+        'analytics': compact('analytics', generate_range('analytics', '2024-01-01', '2024-01-08', seed=1)),
+        'canada': compact('canada', generate_province_data()),
+    }
+
+
+@pytest.mark.parametrize('name', ['analytics', 'canada'])
+def test_compact_gives_the_dataset_dtypes(frames, name):
+    df = validate(name, frames[name])
+    assert dict(df.dtypes) == {column: pd.api.types.pandas_dtype(dtype) for column, dtype in DTYPES[name].items()}
+    # Back from the default dtypes, values unchanged
+    pd.testing.assert_frame_equal(compact(name, default_dtypes(df)), df)
+
+
+@pytest.mark.parametrize('name', ['analytics', 'canada'])
+def test_frames_loaded_from_the_disk_cache_keep_their_dtypes(tmp_path, frames, name):
+    params = {'test': name}
+    disk_cache.cached_frame(name, params, lambda: frames[name], cache_dir=str(tmp_path))
+    # Second call: mapped from the file, not rebuilt
+    loaded = disk_cache.cached_frame(name, params, pytest.fail, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(validate(name, loaded), frames[name])
+
+
+@pytest.mark.parametrize('column, dtype', [('traffic', np.int64), ('bounce_rate', np.float64), ('hour', np.int32)])
+def test_validate_refuses_another_dtype(frames, column, dtype):
+    # As read back by pandas from a database, with its default dtypes
+    df = frames['analytics'].astype({column: dtype})
+    with pytest.raises(SchemaError, match=column):
+        validate('analytics', df)
+
+
+def test_validate_refuses_labels_without_categories(frames):
+    with pytest.raises(SchemaError, match='province'):
+        validate('canada', frames['canada'].astype({'province': object}))
+
+
+def test_validate_refuses_a_missing_column(frames):
+    with pytest.raises(SchemaError, match='session_duration: missing'):
+        validate('analytics', frames['analytics'].drop(columns='session_duration'))
+
+
+def test_compact_refuses_values_that_do_not_fit(frames):
+    df = default_dtypes(frames['analytics'])
+    df.loc[0, 'hour'] = 1_000
+    with pytest.raises(SchemaError, match='hour'):
+        compact('analytics', df)
+
+
+def test_compact_refuses_missing_integers(frames):
+    df = default_dtypes(frames['analytics']).astype({'traffic': float})
+    df.loc[3, 'traffic'] = np.nan
+    with pytest.raises(SchemaError, match='traffic: missing values'):
+        compact('analytics', df)
+
+
+def test_compact_refuses_unknown_categories(frames):
+    df = default_dtypes(frames['canada'])
+    df.loc[0, 'province'] = 'Atlantis'
+    with pytest.raises(SchemaError, match='Atlantis'):
+        compact('canada', df)
+
+
+def test_unknown_dataset():
+    with pytest.raises(ValueError, match='Unknown dataset'):
+        validate('nope', pd.DataFrame())
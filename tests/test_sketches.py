@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.sketches import HyperLogLog, TDigest, relative_error, stratified_mean
+
+P = 12
+
+
+@pytest.mark.parametrize('n', [100, 5_000, 100_000, 1_000_000])
+def test_hyperloglog_stays_within_three_standard_errors(n):
+    rng = np.random.default_rng(n)
+    ids = rng.integers(0, 2 ** 62, n)
+    exact = len(np.unique(ids))
+    assert abs(HyperLogLog.from_values(ids, P).estimate() / exact - 1) < 3 * relative_error(P)
+
+
+def test_hyperloglog_interval_covers_about_95_percent():
+    covered = 0
+    for seed in range(40):
+        ids = np.random.default_rng(seed).integers(0, 2 ** 62, 20_000)
+        _, low, high = HyperLogLog.from_values(ids, P).interval()
+        covered += low <= len(np.unique(ids)) <= high
+    assert covered >= 34
+
+
+def test_hyperloglog_merge_is_the_sketch_of_the_union():
+    rng = np.random.default_rng(2)
+    # Overlapping parts: duplicates across parts are counted once
+    parts = [rng.integers(0, 50_000, 20_000) for _ in range(5)]
+    merged = HyperLogLog.merge([HyperLogLog.from_values(part, P) for part in parts])
+    union = HyperLogLog.from_values(np.concatenate(parts), P)
+    assert np.array_equal(merged.registers, union.registers)
+    assert abs(merged.estimate() / len(np.unique(np.concatenate(parts))) - 1) < 3 * relative_error(P)
+
+
+@pytest.mark.parametrize('distribution', ['normal', 'lognormal', 'exponential'])
+def test_tdigest_quantiles_of_merged_digests(distribution):
+    rng = np.random.default_rng(4)
+    values = getattr(rng, distribution)(size=200_000)
+    digest = TDigest.merge([TDigest.from_values(part) for part in np.array_split(values, 30)])
+    assert digest.count == len(values)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        estimate, low, high = digest.interval(q)
+        # The exact quantile lies within the centroid holding it, and the
+        # estimate is within a small fraction of the ranks of it
+        assert low <= np.quantile(values, q) <= high
+        assert abs(np.mean(values <= estimate) - q) < 1e-3
+
+
+def test_tdigest_of_nothing():
+    digest = TDigest.merge([TDigest.from_values([])])
+    assert digest.quantile(0.5) is None
+    assert digest.interval(0.5) == (None, None, None)
+
+
+def test_stratified_mean_of_fully_sampled_strata_is_exact():
+    rng = np.random.default_rng(6)
+    strata = [rng.poisson(3, size) for size in (50, 120, 80)]
+    estimate, low, high = stratified_mean(
+        [len(s) for s in strata], [len(s) for s in strata],
+        [s.sum() for s in strata], [np.square(s).sum() for s in strata],
+    )
+    assert estimate == pytest.approx(np.concatenate(strata).mean())
+    assert low == pytest.approx(estimate) and high == pytest.approx(estimate)
+
+
+def test_stratified_mean_interval_covers_about_95_percent():
+    rng = np.random.default_rng(8)
+    strata = [rng.poisson(lam, size) for lam, size in zip(rng.uniform(1, 6, 20), rng.integers(500, 3000, 20))]
+    exact = np.concatenate(strata).mean()
+    covered = 0
+    for _ in range(100):
+        samples = [rng.choice(s, 40, replace=False) for s in strata]
+        _, low, high = stratified_mean(
+            [len(s) for s in strata], [len(s) for s in samples],
+            [s.sum() for s in samples], [np.square(s).sum() for s in samples],
+        )
+        covered += low <= exact <= high
+    assert covered >= 88
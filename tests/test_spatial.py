@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_generator import COUNTRIES, generate_point_data
+from utils.spatial import MIN_CELL_PX, MIN_LEVEL, WORLD, SpatialGrid, cell_index, cell_size, grid_partials
+
+KEYS = ['country_code', 'province_code']
+METRICS = ['points', 'visitors', 'revenue', 'conversions']
+LEVEL = 8
+
+
+@pytest.fixture(scope='module')
+def points():
+    return generate_point_data(COUNTRIES[:12], 30_000, rng=4).assign(points=1)
+
+
+@pytest.fixture(scope='module')
+def grid(points):
+    return SpatialGrid.from_partials(grid_partials(points, KEYS, METRICS[1:], LEVEL), METRICS[1:], LEVEL)
+
+
+def point_cells(points, level):
+    # Cell of each point at ``level``, clipped like the grid at the east edge and the pole
+    ix, iy = cell_index(points['lat'], points['lon'], level)
+    return np.clip(ix, 0, 2 ** level - 1), np.clip(iy, 0, 2 ** (level - 1) - 1)
+
+
+def direct(points, level):
+    ix, iy = point_cells(points, level)
+    return points.assign(cell=iy * 2 ** level + ix).groupby('cell', sort=True)[METRICS].sum().reset_index()
+
+
+def assert_sums_equal(result, expected):
+    result, expected = result.reset_index(drop=True), expected.reset_index(drop=True)
+    for metric in METRICS:
+        # Integer sums are exact; revenue is summed in another order
+        exact = metric != 'revenue'
+        pd.testing.assert_series_equal(result[metric], expected[metric], check_dtype=False, check_exact=exact,
+                                       rtol=1e-9)
+
+
+def test_every_level_is_the_groupby_of_the_points(grid, points):
+    for level in range(MIN_LEVEL, LEVEL + 1):
+        cells = grid.cells(level)
+        expected = direct(points, level)
+        assert list(cells['cell']) == list(expected['cell'])
+        assert_sums_equal(cells, expected)
+    assert grid.totals()['visitors'] == points['visitors'].sum()
+
+
+def test_regions_are_the_groupby_of_the_points(grid, points):
+    countries = grid.by_region('country_code')
+    expected = points.groupby('country_code', observed=True, sort=True)[METRICS].sum().reset_index()
+    assert list(countries['country_code']) == list(expected['country_code'])
+    assert_sums_equal(countries, expected)
+
+    provinces = grid.by_region('province_code', country_code='CAN')
+    canada = points[points['country_code'] == 'CAN']
+    expected = canada.groupby('province_code', observed=True, sort=True)[METRICS].sum().reset_index()
+    assert list(provinces['province_code']) == list(expected['province_code'])
+    assert_sums_equal(provinces, expected)
+
+
+@pytest.mark.parametrize('bounds', [
+    WORLD, (-141.0, 41.7, -52.6, 83.1), (100.0, -10.0, 150.0, 45.0), (-5.0, 40.0, 5.0, 50.0),
+])
+@pytest.mark.parametrize('level', [MIN_LEVEL, 4, LEVEL])
+def test_view_cells_are_those_of_the_points_in_view(grid, points, bounds, level):
+    ix, iy = point_cells(points, level)
+    corners = pd.DataFrame({'lon': [bounds[0], bounds[2]], 'lat': [bounds[1], bounds[3]]})
+    (ix0, ix1), (iy0, iy1) = point_cells(corners, level)
+    inside = (ix >= ix0) & (ix <= ix1) & (iy >= iy0) & (iy <= iy1)
+    expected = direct(points[inside], level)
+
+    view = grid.cells(level, bounds)
+    assert list(view['cell']) == list(expected['cell'])
+    assert_sums_equal(view, expected)
+    size = cell_size(level)
+    assert ((view['lon'] + 180.0) / size % 1 == 0.5).all() and ((view['lat'] + 90.0) / size % 1 == 0.5).all()
+
+
+@pytest.mark.parametrize('bounds, width', [
+    (WORLD, 1200), ((-141.0, 41.7, -52.6, 83.1), 800), ((-1.0, 45.0, 1.0, 46.0), 600), ((-0.01, 45.0, 0.01, 45.01), 600),
+])
+def test_level_for_picks_the_finest_readable_level(grid, bounds, width):
+    height = width // 2
+    level = grid.level_for(bounds, width, height)
+    degrees_per_px = max((bounds[2] - bounds[0]) / width, (bounds[3] - bounds[1]) / height)
+    assert MIN_LEVEL <= level <= LEVEL
+    if level > MIN_LEVEL:
+        assert cell_size(level) / degrees_per_px >= MIN_CELL_PX
+    if level < LEVEL:
+        assert cell_size(level + 1) / degrees_per_px < MIN_CELL_PX
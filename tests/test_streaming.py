@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from utils.streaming import BLOCK_ROWS, generate_partitions, generate_range, iter_chunks, partition_bounds
+
+# (dataset, start, end, freq): a range crossing blocks, one starting before
+# 1970 (negative blocks) and one with several rows per timestamp
+RANGES = [
+    ('analytics', '2024-01-01', '2025-03-01', 'h'),
+    ('analytics', '1969-10-01', '1970-03-01', 'h'),
+    ('sample', '1945-05-08', '2000-01-01', 'D'),
+    ('marketing', '2023-06-01', '2024-06-01', 'D'),
+]
+
+
+@pytest.fixture(scope='module', params=RANGES, ids=lambda r: f'{r[0]}-{r[1]}')
+def whole(request):
+    dataset, start, end, freq = request.param
+    return request.param, generate_range(dataset, start, end, seed=11, freq=freq)
+
+
+@pytest.mark.parametrize('chunk_size', [1000, BLOCK_ROWS, BLOCK_ROWS + 1, 50_000])
+def test_same_rows_whatever_the_chunk_size(whole, chunk_size):
+    (dataset, start, end, freq), expected = whole
+    chunks = list(iter_chunks(dataset, start, end, seed=11, chunk_size=chunk_size, freq=freq))
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+@pytest.mark.parametrize('parts', [2, 3, 7])
+def test_same_rows_whatever_the_partitioning(whole, parts):
+    (dataset, start, end, freq), expected = whole
+    pieces = [generate_range(dataset, lo, hi, seed=11, freq=freq) for lo, hi in partition_bounds(start, end, parts, freq)]
+    pd.testing.assert_frame_equal(pd.concat(pieces, ignore_index=True), expected)
+
+
+def test_sub_ranges_are_slices_of_the_whole_range(whole):
+    (dataset, start, end, freq), expected = whole
+    lo = pd.Timestamp(start) + (pd.Timestamp(end) - pd.Timestamp(start)) / 3
+    lo, hi = lo.ceil(freq), (lo + pd.Timedelta(days=40)).ceil(freq)
+    time_col = expected.columns[0]
+    inside = expected[(expected[time_col] >= lo) & (expected[time_col] < hi)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(generate_range(dataset, lo, hi, seed=11, freq=freq), inside)
+
+
+def test_parquet_partitions_hold_the_same_rows(tmp_path):
+    expected = generate_range('analytics', '1969-12-01', '1970-02-01', seed=11)
+    written = generate_partitions('analytics', '1969-12-01', '1970-02-01', str(tmp_path), seed=11, parts=3,
+                                  processes=1, chunk_size=500)
+    assert sum(rows for _, rows in written) == len(expected)
+    frames = [pd.read_parquet(path) for path, _ in written]
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), expected, check_dtype=False)
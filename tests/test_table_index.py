@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.table_index import SortedTable
+
+COLUMNS = ['visitors', 'revenue']
+
+
+@pytest.fixture(scope='module')
+def df():
+    rng = np.random.default_rng(3)
+    n = 1_000
+    # Few distinct visitor counts: many ties
+    return pd.DataFrame({
+        'visitors': rng.integers(0, 20, n),
+        'revenue': rng.uniform(0, 1000, n).round(1),
+        'name': [f'row {i}' for i in range(n)],
+    })
+
+
+def expected(df, minimums, sort_by, ascending):
+    # Same rows by a boolean filter and a stable sort of the frame
+    mask = np.ones(len(df), dtype=bool)
+    for column, minimum in minimums.items():
+        if minimum is not None:
+            mask &= df[column].to_numpy() >= minimum
+    ids = np.flatnonzero(mask)
+    order = np.argsort(df[sort_by].to_numpy()[ids], kind='stable')
+    return ids[order] if ascending else ids[order][::-1]
+
+
+@pytest.mark.parametrize('minimums', [{}, {'visitors': 10}, {'revenue': 500.0}, {'visitors': 5, 'revenue': None},
+                                      {'visitors': 5, 'revenue': 250.0}, {'visitors': 100}])
+@pytest.mark.parametrize('sort_by', COLUMNS)
+@pytest.mark.parametrize('ascending', [True, False])
+def test_row_ids_match_filter_and_sort(df, minimums, sort_by, ascending):
+    table = SortedTable(df, COLUMNS)
+    assert np.array_equal(table.row_ids(minimums, sort_by, ascending), expected(df, minimums, sort_by, ascending))
+
+
+def test_ties_keep_the_row_order(df):
+    table = SortedTable(df, COLUMNS)
+    ids = table.row_ids({}, 'visitors', ascending=True)
+    visitors = df['visitors'].to_numpy()[ids]
+    for value in np.unique(visitors):
+        assert np.all(np.diff(ids[visitors == value]) > 0)
+    # Descending order walks the ascending one backwards, ties included
+    assert np.array_equal(table.row_ids({}, 'visitors', ascending=False), ids[::-1])
+
+
+@pytest.mark.parametrize('page_size', [1, 7, 50, 1_000, 2_000])
+def test_pages_cover_every_row_once(df, page_size):
+    table = SortedTable(df, COLUMNS)
+    ids = table.row_ids({'visitors': 3}, 'revenue')
+    pages = -(-len(ids) // page_size)
+    rows = [table.take(ids, page, page_size) for page in range(pages)]
+    assert all(len(page) == page_size for page in rows[:-1])
+    assert 0 < len(rows[-1]) <= page_size
+    pd.testing.assert_frame_equal(pd.concat(rows), df.iloc[ids])
+    # Past the last page
+    assert table.take(ids, pages, page_size).empty
+
+
+def test_empty_result(df):
+    table = SortedTable(df, COLUMNS)
+    ids = table.row_ids({'revenue': 2_000.0}, 'visitors')
+    assert len(ids) == 0
+    assert table.take(ids).empty
@@ -0,0 +1,191 @@
+"""Audience KPIs of the Analytics page, exact or estimated from per-day sketches.
+
+The rows of the analytics dataset only hold per-bucket averages. The
+sessions behind them (``data_generator.session_columns``: visitor, duration,
+pages) are generated day by day from the rows, with generators seeded by the
+day, so a day always yields the same sessions. Three KPIs need the sessions
+themselves rather than sums: unique visitors, session duration percentiles
+and pages per session.
+
+``exact_audience`` goes through every session of the period. The
+approximate mode reads an ``AudienceSummary`` instead: per day, the number
+of sessions, a uniform sample of ``SAMPLE_SIZE`` sessions (pages per
+session, stratified by day), a HyperLogLog of the visitors and a t-digest of
+the durations (``utils.sketches``). ``AudienceSketches`` sketches each day
+once, when it appears in the data (the current day again at each refresh),
+so an estimate only merges one small summary per day of the period, whatever
+the number of sessions, and every value comes with its 95 % interval.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.config import ANALYTICS_DAYS, DATA_SOURCE, SEED
+from utils.data_generator import session_columns
+from utils.sketches import (
+    HyperLogLog,
+    TDigest,
+    estimate_registers,
+    relative_error,
+    stratified_mean,
+    with_error,
+)
+
+# Sessions kept per day for the sample-based estimates
+SAMPLE_SIZE = 256
+
+# HyperLogLog registers: 2**12, 1.6 % relative standard error
+HLL_P = 12
+
+METRICS = ['visitors', 'duration_p50', 'duration_p90', 'pages']
+
+QUANTILES = {'duration_p50': 0.5, 'duration_p90': 0.9}
+
+# Stream of the per-day sample draws, after the ones of session_columns
+_SAMPLE_STREAM = 99
+
+
+def day_sessions(buckets, day, seed=0):
+    """Return the sessions of the analytics ``buckets`` of ``day``."""
+    return session_columns(buckets, [seed, pd.Timestamp(day).toordinal()])
+
+
+def _period(frame, start, end, last=None):
+    rows = frame[(frame['date'] >= pd.Timestamp(start)) & (frame['date'] < pd.Timestamp(end))]
+    if last is not None:
+        rows = rows[rows['datetime'] <= last]
+    return rows.groupby('date', sort=True)
+
+
+def exact_audience(frame, start, end, seed=0, last=None):
+    """Return the audience KPIs of the days in ``[start, end)``, from every session.
+
+    ``last`` leaves out the buckets after it, e.g. those an estimate did not
+    see yet. Values are ``(value, low, high)`` tuples with ``low == high == value``.
+    """
+    started = time.perf_counter()
+    visitors, durations = [], []
+    sessions = pages = 0
+    for day, buckets in _period(frame, start, end, last):
+        day_frame = day_sessions(buckets, day, seed)
+        visitors.append(np.unique(day_frame['visitor_id'].to_numpy()))
+        durations.append(day_frame['duration'].to_numpy())
+        sessions += len(day_frame)
+        pages += int(day_frame['pages'].sum())
+
+    values = {metric: (None, None, None) for metric in METRICS}
+    if sessions:
+        durations = np.concatenate(durations)
+        values['visitors'] = (float(len(np.unique(np.concatenate(visitors)))),) * 3
+        for metric, q in QUANTILES.items():
+            values[metric] = (float(np.quantile(durations, q)),) * 3
+        values['pages'] = (pages / sessions,) * 3
+    return {'exact': True, 'sessions': sessions, 'values': values, 'seconds': time.perf_counter() - started}
+
+
+class AudienceSummary:
+    """Per-day sketches of the sessions, read-only, for the estimates of any period."""
+
+    def __init__(self, days, sessions, registers, digests, samples, last, p=HLL_P):
+        self.days = np.asarray(days, dtype='datetime64[ns]')
+        self.sessions = np.asarray(sessions, dtype=np.int64)
+        self.registers = registers
+        self.digests = digests
+        self.samples = samples
+        # Last bucket the sketches saw
+        self.last = last
+        self.p = p
+        pages = [sample['pages'].to_numpy(np.float64) for sample in samples]
+        self.sample_counts = np.array([len(values) for values in pages])
+        self.sample_sums = np.array([values.sum() for values in pages])
+        self.sample_squares = np.array([np.square(values).sum() for values in pages])
+
+    def __sizeof__(self):
+        return int(
+            self.registers.nbytes + sum(digest.__sizeof__() for digest in self.digests)
+            + sum(sample.memory_usage(deep=True).sum() for sample in self.samples)
+        )
+
+    def estimate(self, start, end):
+        """Return the estimated audience KPIs of the days in ``[start, end)``.
+
+        Values are ``(estimate, low, high)`` tuples, ``low``/``high`` being
+        the bounds of the 95 % interval.
+        """
+        started = time.perf_counter()
+        bounds = np.array([pd.Timestamp(start).to_datetime64(), pd.Timestamp(end).to_datetime64()],
+                          dtype='datetime64[ns]')
+        i, j = np.searchsorted(self.days, bounds)
+        values = {metric: (None, None, None) for metric in METRICS}
+        sessions = int(self.sessions[i:j].sum())
+        if sessions:
+            registers = self.registers[i:j].max(axis=0)
+            values['visitors'] = with_error(estimate_registers(registers), relative_error(self.p))
+            digest = TDigest.merge(self.digests[i:j])
+            for metric, q in QUANTILES.items():
+                values[metric] = digest.interval(q)
+            values['pages'] = stratified_mean(
+                self.sessions[i:j], self.sample_counts[i:j], self.sample_sums[i:j], self.sample_squares[i:j]
+            )
+        return {'exact': False, 'sessions': sessions, 'values': values, 'seconds': time.perf_counter() - started}
+
+
+class AudienceSketches:
+    """Sketches of the sessions of the last ``days`` days, extended as the data grows."""
+
+    def __init__(self, days, seed=0, sample_size=SAMPLE_SIZE, p=HLL_P):
+        self.days = days
+        self.seed = seed
+        self.sample_size = sample_size
+        self.p = p
+        # day -> (sessions, sample, registers, digest)
+        self._sketches = {}
+        # First day to read at the next update: the last one may still grow
+        self.since = None
+        # Last bucket sketched
+        self.last = None
+        self._lock = threading.Lock()
+
+    def _sketch(self, day, buckets):
+        sessions = day_sessions(buckets, day, self.seed)
+        rng = np.random.default_rng([self.seed, pd.Timestamp(day).toordinal(), _SAMPLE_STREAM])
+        kept = np.sort(rng.choice(len(sessions), min(len(sessions), self.sample_size), replace=False))
+        return (
+            len(sessions),
+            sessions.iloc[kept].reset_index(drop=True),
+            HyperLogLog.from_values(sessions['visitor_id'].to_numpy(), self.p).registers,
+            TDigest.from_values(sessions['duration'].to_numpy()),
+        )
+
+    def update(self, frame):
+        """Sketch the days of ``frame`` (rows from ``self.since`` on) and return the summary."""
+        with self._lock:
+            if len(frame):
+                for day, buckets in frame.groupby('date', sort=True):
+                    self._sketches[pd.Timestamp(day)] = self._sketch(day, buckets)
+                last_day = pd.Timestamp(frame['date'].max())
+                self.since = last_day
+                first_day = last_day - pd.Timedelta(days=self.days)
+                for day in [day for day in self._sketches if day < first_day]:
+                    del self._sketches[day]
+                self.last = max(self.last or last_day, pd.Timestamp(frame['datetime'].max()))
+            days = sorted(self._sketches)
+            sketches = [self._sketches[day] for day in days]
+            return AudienceSummary(
+                days,
+                [sketch[0] for sketch in sketches],
+                np.stack([sketch[2] for sketch in sketches]) if sketches else np.zeros((0, 2 ** self.p), np.uint8),
+                [sketch[3] for sketch in sketches],
+                [sketch[1] for sketch in sketches],
+                self.last,
+                self.p,
+            )
+
+
+@st.cache_resource
+def get_audience_sketches(url=DATA_SOURCE):
+    """Return the session sketches of the source at ``url``, shared by every session of the process."""
+    return AudienceSketches(2 * ANALYTICS_DAYS, seed=SEED)
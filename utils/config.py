@@ -0,0 +1,56 @@
+"""Dataset sizes, seed and data source of the pages, overridable through environment variables.
+
+The defaults are the sizes the dashboard was designed for; the page
+benchmarks (``benchmarks/bench_pages.py``) override them to run the pages at
+larger scales.
+"""
+import os
+
+SEED = int(os.environ.get('DASHBOARD_SEED', 0))
+
+# Days of daily data on the main dashboard
+SAMPLE_DAYS = int(os.environ.get('DASHBOARD_SAMPLE_DAYS', 30))
+
+# History and granularity of the Analytics page
+ANALYTICS_DAYS = int(os.environ.get('DASHBOARD_ANALYTICS_DAYS', 90))
+ANALYTICS_FREQ = os.environ.get('DASHBOARD_ANALYTICS_FREQ', 'h')
+
+# Days of history kept on disk for the time series (utils.partitions), beyond the windows held in memory
+HISTORY_DAYS = int(os.environ.get('DASHBOARD_HISTORY_DAYS', 730))
+
+# Number of countries on the Geographic page (at most len(COUNTRIES))
+GEO_COUNTRIES = int(os.environ.get('DASHBOARD_GEO_COUNTRIES', 10))
+
+# Visitor locations (lat/lon) aggregated by the spatial grid of the Geographic page
+GEO_POINTS = int(os.environ.get('DASHBOARD_GEO_POINTS', 1_000_000))
+
+# Backend of utils.data_sources: 'synthetic', 'sqlite:///path/to/file.db' or
+# 'duckdb:///path/to/file.duckdb'
+DATA_SOURCE = os.environ.get('DASHBOARD_DATA_SOURCE', 'synthetic')
+
+# Connections kept open by a SQL backend, shared by every session of the process
+DB_POOL_SIZE = int(os.environ.get('DASHBOARD_DB_POOL_SIZE', 4))
+
+# Budget (in MB) and default lifetime (in seconds, 0 for none) of the shared result cache
+RESULT_CACHE_MB = int(os.environ.get('DASHBOARD_RESULT_CACHE_MB', 256))
+RESULT_CACHE_TTL = int(os.environ.get('DASHBOARD_RESULT_CACHE_TTL', 600))
+
+# Seconds between two background refreshes of the datasets (0 refreshes only on first use)
+REFRESH_INTERVAL = int(os.environ.get('DASHBOARD_REFRESH_INTERVAL', 60))
+
+# Processes used by the partitioned marketing generation and aggregation (0: one per core)
+WORKERS = int(os.environ.get('DASHBOARD_WORKERS', 0))
+
+# Live mode of the main dashboard: seconds between two redraws, synthetic events
+# per second, bound of the event queue (beyond it, events are coalesced), and
+# seconds without a session draining the feed after which events stop
+LIVE_INTERVAL = float(os.environ.get('DASHBOARD_LIVE_INTERVAL', 2))
+LIVE_EVENTS_PER_S = float(os.environ.get('DASHBOARD_LIVE_EVENTS_PER_S', 20))
+LIVE_QUEUE_SIZE = int(os.environ.get('DASHBOARD_LIVE_QUEUE_SIZE', 1000))
+LIVE_IDLE = float(os.environ.get('DASHBOARD_LIVE_IDLE', 5 * LIVE_INTERVAL))
+
+# Approximate mode of the Analytics audience KPIs (utils.audience): on by default when 1
+APPROXIMATE = os.environ.get('DASHBOARD_APPROXIMATE', '') not in ('', '0', 'false')
+
+# Build each chart once per process and reuse it as a skeleton (utils.figures); 0 rebuilds every chart
+FIGURE_FACTORY = os.environ.get('DASHBOARD_FIGURE_FACTORY', '1') not in ('', '0', 'false')
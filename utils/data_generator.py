@@ -3,9 +3,251 @@ import numpy as np
 import random
 from datetime import datetime, timedelta
 
-def generate_sales_data(days=30):
+CHANNELS = ['Google Ads', 'Facebook', 'Instagram', 'LinkedIn', 'Twitter', 'Email', 'SEO', 'Direct']
+
+PRODUCTS = [
+    "Laptop Pro 15", "Smartphone X", "Tablet Ultra", "Headphones Premium",
+    "Camera DSLR", "Monitor 4K", "Keyboard Mechanical", "Mouse Wireless",
+    "Speaker Bluetooth", "Watch Smart"
+]
+
+CATEGORIES = ['Electronics', 'Accessories', 'Computers', 'Audio']
+
+# The first ten are the ones shown by default on the Geographic page
+COUNTRIES = [
+    {"country": "Canada", "code": "CAN", "lat": 56.1304, "lon": -106.3468},
+    {"country": "United States", "code": "USA", "lat": 37.0902, "lon": -95.7129},
+    {"country": "France", "code": "FRA", "lat": 46.2276, "lon": 2.2137},
+    {"country": "Germany", "code": "DEU", "lat": 51.1657, "lon": 10.4515},
+    {"country": "United Kingdom", "code": "GBR", "lat": 55.3781, "lon": -3.4360},
+    {"country": "Japan", "code": "JPN", "lat": 36.2048, "lon": 138.2529},
+    {"country": "Australia", "code": "AUS", "lat": -25.2744, "lon": 133.7751},
+    {"country": "Brazil", "code": "BRA", "lat": -14.2350, "lon": -51.9253},
+    {"country": "India", "code": "IND", "lat": 20.5937, "lon": 78.9629},
+    {"country": "China", "code": "CHN", "lat": 35.8617, "lon": 104.1954},
+    {"country": "Mexico", "code": "MEX", "lat": 23.6345, "lon": -102.5528},
+    {"country": "Argentina", "code": "ARG", "lat": -38.4161, "lon": -63.6167},
+    {"country": "Chile", "code": "CHL", "lat": -35.6751, "lon": -71.5430},
+    {"country": "Colombia", "code": "COL", "lat": 4.5709, "lon": -74.2973},
+    {"country": "Peru", "code": "PER", "lat": -9.1900, "lon": -75.0152},
+    {"country": "Spain", "code": "ESP", "lat": 40.4637, "lon": -3.7492},
+    {"country": "Italy", "code": "ITA", "lat": 41.8719, "lon": 12.5674},
+    {"country": "Portugal", "code": "PRT", "lat": 39.3999, "lon": -8.2245},
+    {"country": "Netherlands", "code": "NLD", "lat": 52.1326, "lon": 5.2913},
+    {"country": "Belgium", "code": "BEL", "lat": 50.5039, "lon": 4.4699},
+    {"country": "Switzerland", "code": "CHE", "lat": 46.8182, "lon": 8.2275},
+    {"country": "Austria", "code": "AUT", "lat": 47.5162, "lon": 14.5501},
+    {"country": "Sweden", "code": "SWE", "lat": 60.1282, "lon": 18.6435},
+    {"country": "Norway", "code": "NOR", "lat": 60.4720, "lon": 8.4689},
+    {"country": "Denmark", "code": "DNK", "lat": 56.2639, "lon": 9.5018},
+    {"country": "Finland", "code": "FIN", "lat": 61.9241, "lon": 25.7482},
+    {"country": "Poland", "code": "POL", "lat": 51.9194, "lon": 19.1451},
+    {"country": "Ireland", "code": "IRL", "lat": 53.4129, "lon": -8.2439},
+    {"country": "Russia", "code": "RUS", "lat": 61.5240, "lon": 105.3188},
+    {"country": "Turkey", "code": "TUR", "lat": 38.9637, "lon": 35.2433},
+    {"country": "Egypt", "code": "EGY", "lat": 26.8206, "lon": 30.8025},
+    {"country": "Nigeria", "code": "NGA", "lat": 9.0820, "lon": 8.6753},
+    {"country": "South Africa", "code": "ZAF", "lat": -30.5595, "lon": 22.9375},
+    {"country": "Kenya", "code": "KEN", "lat": -0.0236, "lon": 37.9062},
+    {"country": "Saudi Arabia", "code": "SAU", "lat": 23.8859, "lon": 45.0792},
+    {"country": "United Arab Emirates", "code": "ARE", "lat": 23.4241, "lon": 53.8478},
+    {"country": "South Korea", "code": "KOR", "lat": 35.9078, "lon": 127.7669},
+    {"country": "Indonesia", "code": "IDN", "lat": -0.7893, "lon": 113.9213},
+    {"country": "Thailand", "code": "THA", "lat": 15.8700, "lon": 100.9925},
+    {"country": "New Zealand", "code": "NZL", "lat": -40.9006, "lon": 174.8860}
+]
+
+# Canadian provinces with their approximate center and their share of the
+# Canadian visitors (the midpoints of generate_province_data's ranges)
+PROVINCES = [
+    {"province": "Ontario", "code": "ON", "lat": 50.0, "lon": -85.0, "weight": 2000},
+    {"province": "Quebec", "code": "QC", "lat": 52.9, "lon": -73.5, "weight": 1650},
+    {"province": "British Columbia", "code": "BC", "lat": 53.7, "lon": -127.6, "weight": 1300},
+    {"province": "Alberta", "code": "AB", "lat": 53.9, "lon": -116.6, "weight": 1150},
+    {"province": "Manitoba", "code": "MB", "lat": 53.8, "lon": -98.8, "weight": 500},
+    {"province": "Saskatchewan", "code": "SK", "lat": 52.9, "lon": -106.5, "weight": 375},
+    {"province": "Nova Scotia", "code": "NS", "lat": 44.7, "lon": -63.7, "weight": 450},
+    {"province": "New Brunswick", "code": "NB", "lat": 46.5, "lon": -66.2, "weight": 325},
+    {"province": "Newfoundland and Labrador", "code": "NL", "lat": 53.1, "lon": -57.7, "weight": 250},
+    {"province": "Prince Edward Island", "code": "PE", "lat": 46.5, "lon": -63.4, "weight": 125}
+]
+
+ENGINES = ('python', 'numpy')
+
+
+def _daily_dates(days):
+    return pd.date_range(start=datetime.now() - timedelta(days=days), end=datetime.now(), freq='D')
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+
+def make_rng(rng=None):
+    """Return a numpy Generator from a seed, an existing Generator or None."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def _safe_ratio(num, den):
+    # Same convention as the row loop: 0 when the denominator is 0
+    return np.divide(num, den, out=np.zeros(len(num), dtype=np.float64), where=den > 0)
+
+
+# Columnar builders: one vectorized draw per column instead of one per row.
+# They take the timestamps to fill and a numpy Generator, so callers control
+# seeding and can build any slice of a date range independently.
+
+def sales_columns(dates, rng):
+    """Build the sales columns for ``dates`` from numpy arrays."""
+    n = len(dates)
+    # Simulate weekly patterns (higher sales on weekends)
+    day_multiplier = np.where(dates.weekday >= 5, 1.2, 1.0)
+    sales = np.maximum(10, (100 * day_multiplier + rng.normal(0, 30, n)).astype(np.int64))
+
+    return pd.DataFrame({
+        'date': dates,
+        'sales': sales,
+        'revenue': sales * rng.uniform(20, 80, n),
+        'customers': np.maximum(5, (sales * rng.uniform(0.3, 0.8, n)).astype(np.int64)),
+        'avg_order_value': rng.uniform(25, 150, n)
+    })
+
+
+def user_columns(dates, rng):
+    """Build the user engagement columns for ``dates`` from numpy arrays."""
+    n = len(dates)
+    active_users = rng.integers(500, 2000, n, endpoint=True)
+
+    return pd.DataFrame({
+        'date': dates,
+        'active_users': active_users,
+        'new_users': np.maximum(10, (active_users * rng.uniform(0.05, 0.15, n)).astype(np.int64)),
+        'returning_users': active_users - np.maximum(10, (active_users * rng.uniform(0.05, 0.15, n)).astype(np.int64)),
+        'session_duration': rng.uniform(120, 600, n),
+        'page_views': active_users * rng.integers(2, 8, n, endpoint=True),
+        'bounce_rate': rng.uniform(0.2, 0.7, n)
+    })
+
+
+def product_columns(products, rng):
+    """Build the product performance columns for ``products`` from numpy arrays."""
+    n = len(products)
+
+    return pd.DataFrame({
+        'product': products,
+        'units_sold': rng.integers(50, 500, n, endpoint=True),
+        'revenue': rng.uniform(5000, 50000, n),
+        'rating': rng.uniform(3.5, 5.0, n),
+        'reviews': rng.integers(10, 200, n, endpoint=True),
+        'category': rng.choice(CATEGORIES, n)
+    })
+
+
+def marketing_columns(dates, channels, rng):
+    """Build the marketing columns for the ``dates`` x ``channels`` grid from numpy arrays."""
+    n = len(dates) * len(channels)
+    spend = rng.uniform(100, 1000, n)
+    impressions = (spend * rng.uniform(50, 200, n)).astype(np.int64)
+    clicks = (impressions * rng.uniform(0.01, 0.05, n)).astype(np.int64)
+    conversions = (clicks * rng.uniform(0.02, 0.08, n)).astype(np.int64)
+
+    return pd.DataFrame({
+        'date': np.repeat(dates, len(channels)),
+        'channel': np.tile(np.asarray(channels, dtype=object), len(dates)),
+        'spend': spend,
+        'impressions': impressions,
+        'clicks': clicks,
+        'conversions': conversions,
+        'cpc': _safe_ratio(spend, clicks),
+        'ctr': _safe_ratio(clicks, impressions),
+        'conversion_rate': _safe_ratio(conversions, clicks)
+    })
+
+
+def sample_columns(dates, rng):
+    """Build the main dashboard columns (app.py) for ``dates`` from numpy arrays."""
+    n = len(dates)
+
+    return pd.DataFrame({
+        'date': dates,
+        'ventes': rng.integers(50, 200, n, endpoint=True),
+        'utilisateurs': rng.integers(100, 500, n, endpoint=True),
+        'revenus': np.round(rng.uniform(1000, 5000, n), 2),
+        'conversions': np.round(rng.uniform(2, 8, n), 2)
+    })
+
+
+def analytics_columns(dates, rng):
+    """Build the Analytics page columns for (usually hourly) ``dates`` from numpy arrays.
+
+    Unlike the page's row loop, ``date`` is kept as a normalized datetime64
+    column rather than Python ``date`` objects.
+    """
+    n = len(dates)
+    hour = np.asarray(dates.hour)
+    # Simulate different patterns based on hour of day
+    base_traffic = 100 + (50 * np.sin(hour * np.pi / 12))
+    traffic = np.maximum(10, (base_traffic + rng.normal(0, 20, n)).astype(np.int64))
+
+    return pd.DataFrame({
+        'datetime': dates,
+        'date': dates.normalize(),
+        'hour': hour,
+        'traffic': traffic,
+        'bounce_rate': np.clip(0.4 + rng.normal(0, 0.1, n), 0.1, 0.9),
+        'page_views': traffic * rng.integers(2, 5, n, endpoint=True),
+        'session_duration': np.maximum(30, 180 + rng.normal(0, 60, n))
+    })
+
+
+# Visitors of the sessions: a fixed population, some of whom come back far more often than others
+VISITOR_POOL = 200_000
+
+
+def session_columns(buckets, seed):
+    """Build one row per session of analytics ``buckets`` (``traffic`` sessions each).
+
+    ``visitor_id``, ``duration`` (seconds, log-normal around the bucket's
+    ``session_duration``) and ``pages`` (1 for a bounce) follow the bucket's
+    averages. Each column draws from its own generator seeded with
+    ``seed + [column]``, so adding buckets after the last one leaves the
+    sessions of the others unchanged.
+    """
+    counts = np.asarray(buckets['traffic'], dtype=np.int64)
+    n = int(counts.sum())
+
+    def draw(stream):
+        return np.random.default_rng(list(seed) + [stream])
+
+    def per_session(column):
+        return np.repeat(np.asarray(buckets[column], dtype=np.float64), counts)
+
+    # Low ids are drawn more often: regular visitors
+    visitor_id = (VISITOR_POOL * draw(0).random(n) ** 2).astype(np.int64)
+    sigma = 0.8
+    duration = np.exp(np.log(per_session('session_duration')) - sigma ** 2 / 2 + sigma * draw(1).standard_normal(n))
+    bounce = per_session('bounce_rate')
+    bounced = draw(2).random(n) < bounce
+    # Pages of the sessions that did not bounce, so that the bucket keeps its page views per session
+    extra = (per_session('page_views') / np.maximum(per_session('traffic'), 1) - 1) / np.maximum(1 - bounce, 0.05)
+    pages = np.where(bounced, 1, 1 + draw(3).poisson(np.maximum(extra, 0.0)))
+    return pd.DataFrame({
+        'visitor_id': visitor_id,
+        'duration': duration.astype(np.float32),
+        'pages': pages.astype(np.int16),
+    })
+
+
+def generate_sales_data(days=30, engine='python', rng=None):
     """Generate sample sales data for the specified number of days."""
-    dates = pd.date_range(start=datetime.now() - timedelta(days=days), end=datetime.now(), freq='D')
+    _check_engine(engine)
+    dates = _daily_dates(days)
+    if engine == 'numpy':
+        return sales_columns(dates, make_rng(rng))
+
     data = []
 
     for date in dates:
@@ -25,9 +267,13 @@ def generate_sales_data(days=30):
 
     return pd.DataFrame(data)
 
-def generate_user_data(days=30):
+def generate_user_data(days=30, engine='python', rng=None):
     """Generate sample user engagement data."""
-    dates = pd.date_range(start=datetime.now() - timedelta(days=days), end=datetime.now(), freq='D')
+    _check_engine(engine)
+    dates = _daily_dates(days)
+    if engine == 'numpy':
+        return user_columns(dates, make_rng(rng))
+
     data = []
 
     for date in dates:
@@ -44,31 +290,32 @@ def generate_user_data(days=30):
 
     return pd.DataFrame(data)
 
-def generate_product_data():
+def generate_product_data(engine='python', rng=None):
     """Generate sample product performance data."""
-    products = [
-        "Laptop Pro 15", "Smartphone X", "Tablet Ultra", "Headphones Premium",
-        "Camera DSLR", "Monitor 4K", "Keyboard Mechanical", "Mouse Wireless",
-        "Speaker Bluetooth", "Watch Smart"
-    ]
+    _check_engine(engine)
+    if engine == 'numpy':
+        return product_columns(PRODUCTS, make_rng(rng))
 
     data = []
-    for product in products:
+    for product in PRODUCTS:
         data.append({
             'product': product,
             'units_sold': random.randint(50, 500),
             'revenue': random.uniform(5000, 50000),
             'rating': random.uniform(3.5, 5.0),
             'reviews': random.randint(10, 200),
-            'category': random.choice(['Electronics', 'Accessories', 'Computers', 'Audio'])
+            'category': random.choice(CATEGORIES)
         })
 
     return pd.DataFrame(data)
 
-def generate_marketing_data(days=30):
+def generate_marketing_data(days=30, channels=None, engine='python', rng=None):
     """Generate sample marketing campaign data."""
-    channels = ['Google Ads', 'Facebook', 'Instagram', 'LinkedIn', 'Twitter', 'Email', 'SEO', 'Direct']
-    dates = pd.date_range(start=datetime.now() - timedelta(days=days), end=datetime.now(), freq='D')
+    _check_engine(engine)
+    channels = CHANNELS if channels is None else channels
+    dates = _daily_dates(days)
+    if engine == 'numpy':
+        return marketing_columns(dates, channels, make_rng(rng))
 
     data = []
     for date in dates:
@@ -90,4 +337,95 @@ def generate_marketing_data(days=30):
                 'conversion_rate': conversions / clicks if clicks > 0 else 0
             })
 
-    return pd.DataFrame(data)
\ No newline at end of file
+    return pd.DataFrame(data)
+
+def generate_country_data(countries=None):
+    """Generate sample visitor and revenue figures per country."""
+    countries = COUNTRIES if countries is None else countries
+
+    data = []
+    for country in countries:
+        visitors = random.randint(100, 5000)
+        revenue = visitors * random.uniform(10, 100)
+        conversion_rate = random.uniform(1, 8)
+
+        data.append({
+            **country,
+            "visitors": visitors,
+            "revenue": round(revenue, 2),
+            "conversion_rate": round(conversion_rate, 2),
+            "avg_session_duration": random.randint(120, 600)
+        })
+
+    return pd.DataFrame(data)
+
+def generate_province_data():
+    """Generate sample visitors per Canadian province."""
+    provinces = [
+        {"province": "Ontario", "code": "ON", "visitors": random.randint(1000, 3000)},
+        {"province": "Quebec", "code": "QC", "visitors": random.randint(800, 2500)},
+        {"province": "British Columbia", "code": "BC", "visitors": random.randint(600, 2000)},
+        {"province": "Alberta", "code": "AB", "visitors": random.randint(500, 1800)},
+        {"province": "Manitoba", "code": "MB", "visitors": random.randint(200, 800)},
+        {"province": "Saskatchewan", "code": "SK", "visitors": random.randint(150, 600)},
+        {"province": "Nova Scotia", "code": "NS", "visitors": random.randint(200, 700)},
+        {"province": "New Brunswick", "code": "NB", "visitors": random.randint(150, 500)},
+        {"province": "Newfoundland and Labrador", "code": "NL", "visitors": random.randint(100, 400)},
+        {"province": "Prince Edward Island", "code": "PE", "visitors": random.randint(50, 200)}
+    ]
+    return pd.DataFrame(provinces)
+
+def generate_point_data(countries=None, points=1_000_000, cities=40, rng=None):
+    """Generate visitors, revenue and conversions per location (lat/lon).
+
+    Each country gets ``cities`` random cities around its center, Canadian
+    ones around the province centers; locations are spread around the
+    cities, the largest cities getting the most of them. Each row carries
+    its country code and, in Canada, its province code.
+    """
+    rng = make_rng(rng)
+    countries = COUNTRIES if countries is None else countries
+
+    city_country = np.repeat(np.arange(len(countries)), cities)
+    city_lat = np.array([country["lat"] for country in countries])[city_country]
+    city_lon = np.array([country["lon"] for country in countries])[city_country]
+    spread = np.full(len(city_country), 3.0)
+    city_province = np.full(len(city_country), -1)
+    in_canada = np.array([country["code"] for country in countries])[city_country] == "CAN"
+    if in_canada.any():
+        weights = np.array([province["weight"] for province in PROVINCES], dtype=float)
+        # Every province gets at least one city when there are enough of them
+        first = np.arange(min(len(PROVINCES), in_canada.sum()))
+        others = rng.choice(len(PROVINCES), size=in_canada.sum() - len(first), p=weights / weights.sum())
+        chosen = rng.permutation(np.concatenate([first, others]))
+        city_province[in_canada] = chosen
+        city_lat[in_canada] = np.array([province["lat"] for province in PROVINCES])[chosen]
+        city_lon[in_canada] = np.array([province["lon"] for province in PROVINCES])[chosen]
+        spread[in_canada] = 1.5
+    city_lat = city_lat + rng.normal(0, 1, len(city_country)) * spread
+    city_lon = city_lon + rng.normal(0, 1.5, len(city_country)) * spread
+
+    # Share of each city in the locations: country size times a Zipf-like rank
+    rank = np.tile(np.arange(1, cities + 1), len(countries))
+    city_weight = rng.uniform(0.2, 1.0, len(countries))[city_country] / rank
+    city = rng.choice(len(city_country), size=points, p=city_weight / city_weight.sum())
+
+    lat = np.clip(city_lat[city] + rng.normal(0, 0.2, points), -89.9, 89.9)
+    lon = (city_lon[city] + rng.normal(0, 0.3, points) + 180) % 360 - 180
+    visitors = 1 + rng.poisson(3, points)
+    revenue = np.round(visitors * rng.uniform(10, 100, len(city_country))[city] * rng.uniform(0.5, 1.5, points), 2)
+    conversions = rng.binomial(visitors, rng.uniform(0.01, 0.08, len(countries))[city_country][city])
+
+    return pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        "country_code": pd.Categorical.from_codes(
+            city_country[city], categories=[country["code"] for country in countries]
+        ),
+        "province_code": pd.Categorical.from_codes(
+            city_province[city], categories=[province["code"] for province in PROVINCES]
+        ),
+        "visitors": visitors,
+        "revenue": revenue,
+        "conversions": conversions
+    })
@@ -0,0 +1,698 @@
+"""Data sources behind the dashboard pages.
+
+Pages do not build or query their data themselves: they ask the source
+returned by ``get_source()`` for the rows of a dataset or for an aggregate
+(period totals, hourly partial sums and counts, per-day and per-hour
+series, hour x weekday matrix, rolling statistics, top-N rows, sums per
+spatial grid cell). Two backends
+implement the same methods:
+
+- ``SyntheticSource`` (the default) serves the seeded generators through the
+  incremental stores and their rollups;
+- ``SqlSource`` reads tables of the same names and columns from SQLite or
+  DuckDB. Period filters, group-bys and top-N run in the database, rows come
+  back as Arrow record batches, and connections come from a pool shared by
+  every session of the process.
+
+``current_version(dataset)`` reads the version left by the background
+refresher (``utils.refresher``), which re-runs ``source.refresh(dataset)`` for
+the datasets of the pages (``PAGE_DATASETS``) on a schedule; pages pass it to the result cache as the data dependency.
+The synthetic time series keep ``HISTORY_DAYS`` of history in time
+partitions on disk (``utils.partitions``): periods that start before the
+in-memory window are read from the partitions they overlap only.
+``shared_dataset(dataset)`` returns the rows of that version from the
+process-wide registry (``utils.registry``), loaded once and read by every
+session through views.
+
+``python -m utils.data_sources sqlite:///dashboard.db`` fills a database with
+the synthetic data, as a local stand-in for a real warehouse.
+"""
+import argparse
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils import disk_cache
+from utils.config import (
+    ANALYTICS_DAYS, ANALYTICS_FREQ, DATA_SOURCE, DB_POOL_SIZE, GEO_COUNTRIES, GEO_POINTS, HISTORY_DAYS,
+    REFRESH_INTERVAL, SAMPLE_DAYS, SEED
+)
+from utils.data_generator import COUNTRIES, generate_country_data, generate_point_data, generate_province_data
+from utils.incremental import IncrementalStore
+from utils.refresher import Refresher
+from utils.registry import DatasetRegistry, time_slice
+from utils.rolling import RollingStats
+from utils.rollups import DAY_ORDER, Rollup, partial_aggregates
+from utils.schemas import compact, validate
+from utils.spatial import MAX_LEVEL, grid_partials
+
+# dataset -> (time column or None, metric columns)
+SCHEMAS = {
+    'sample': ('date', ['ventes', 'utilisateurs', 'revenus', 'conversions']),
+    'analytics': ('datetime', ['traffic', 'bounce_rate', 'page_views', 'session_duration']),
+    'geo': (None, ['visitors', 'revenue', 'conversion_rate', 'avg_session_duration']),
+    'canada': (None, ['visitors']),
+    'geo_points': (None, ['visitors', 'revenue', 'conversions']),
+}
+
+# Datasets the pages read, kept up to date by the background refresher. The
+# per-country and per-province snapshots ('geo', 'canada') are only written to
+# SQL databases by load(): the Geographic page rolls its regions up from the
+# grid of 'geo_points'
+PAGE_DATASETS = ('sample', 'analytics', 'geo_points')
+
+# Datasets of locations -> region columns of their spatial grid (utils.spatial),
+# with the coordinates in ``lat`` and ``lon``
+GRID_KEYS = {
+    'geo_points': ['country_code', 'province_code'],
+}
+
+# Days of history kept for the time-series datasets: twice the longest period
+# shown, so that every period can be compared with the one before it
+WINDOW_DAYS = {
+    'sample': 2 * SAMPLE_DAYS,
+    'analytics': 2 * ANALYTICS_DAYS,
+}
+
+# Columns of the hourly buckets of ``partials()`` in the SQL tables
+_BUCKET_KEYS = {
+    'sample': ['date'],
+    'analytics': ['date', 'hour'],
+}
+
+# dataset -> (metrics, window lengths in days, spacing of the points) of the
+# rolling statistics; the analytics windows run over hourly totals, whatever
+# ANALYTICS_FREQ
+ROLLING = {
+    'sample': (['ventes', 'revenus'], (7, 28), pd.Timedelta(days=1)),
+    'analytics': (['traffic'], (7, 28, 90), pd.Timedelta(hours=1)),
+}
+
+BACKENDS = ('sqlite', 'duckdb')
+
+FETCH_BATCH_ROWS = 65_536
+
+_SQL_AGGREGATES = {'sum': 'SUM', 'mean': 'AVG'}
+
+# Truncation of a non-negative float to an integer (a DuckDB cast rounds)
+_SQL_FLOOR = {'sqlite': 'CAST({} AS INTEGER)', 'duckdb': 'CAST(FLOOR({}) AS BIGINT)'}
+
+
+def _metrics(dataset, metrics):
+    return SCHEMAS[dataset][1] if metrics is None else list(metrics)
+
+
+def new_rolling_stats(dataset):
+    """Return empty rolling statistics with the windows of ``ROLLING[dataset]``."""
+    metrics, days, step = ROLLING[dataset]
+    windows = {f'{length}d': pd.Timedelta(days=length) // step for length in days}
+    return RollingStats(metrics, windows, time_col=SCHEMAS[dataset][0])
+
+
+def _rolling_points(source, dataset):
+    # Raw rows, or hourly totals read from the partial aggregates
+    time_col = SCHEMAS[dataset][0]
+    metrics, _, step = ROLLING[dataset]
+    if step == pd.Timedelta(hours=1):
+        parts = source.partials(dataset)
+        points = parts.rename(columns={'bucket': time_col, **{f'{metric}_sum': metric for metric in metrics}})
+    else:
+        points = source.frame(dataset)
+    return points[[time_col] + metrics]
+
+
+class SyntheticSource:
+    """Seeded synthetic data: incremental stores for time series, daily snapshots otherwise.
+
+    The stores keep their window (``WINDOW_DAYS``) in memory and
+    ``HISTORY_DAYS`` in time partitions on disk: raw days for the analytics
+    (compacted into hourly rollups once they leave the window), raw months
+    for the sample.
+    """
+
+    def __init__(self, seed=SEED):
+        self.stores = {
+            'sample': IncrementalStore(
+                'sample', WINDOW_DAYS['sample'], seed=seed, persist=True, time_col='date',
+                metrics=SCHEMAS['sample'][1], history_days=HISTORY_DAYS, granularity='M'
+            ),
+            'analytics': IncrementalStore(
+                'analytics', WINDOW_DAYS['analytics'], seed=seed, freq=ANALYTICS_FREQ,
+                rollup_metrics=SCHEMAS['analytics'][1], persist=True, history_days=HISTORY_DAYS
+            ),
+        }
+        # dataset -> (cache key, frame) of today's snapshot
+        self._snapshots = {}
+        # dataset -> (watermark, start, Rollup) of the last period read from the partitions
+        self._history_rollups = {}
+        # dataset -> RollingStats, extended with the points added by each refresh
+        self._rolling = {}
+        self._rolling_lock = threading.Lock()
+
+    def _snapshot(self, dataset):
+        # Snapshots are shared by all workers through the on-disk cache, one per day
+        params = {'day': date.today().isoformat()}
+        if dataset == 'geo':
+            params['countries'] = GEO_COUNTRIES
+            builder = lambda: compact('geo', generate_country_data(COUNTRIES[:GEO_COUNTRIES]))
+        elif dataset == 'geo_points':
+            params.update(countries=GEO_COUNTRIES, points=GEO_POINTS, seed=SEED)
+            rng = [SEED, date.today().toordinal()]
+            builder = lambda: compact(
+                'geo_points', generate_point_data(COUNTRIES[:GEO_COUNTRIES], GEO_POINTS, rng=rng)
+            )
+        else:
+            builder = lambda: compact('canada', generate_province_data())
+        key = disk_cache.cache_key(params)
+        snapshot = self._snapshots.get(dataset)
+        if snapshot is None or snapshot[0] != key:
+            snapshot = (key, validate(dataset, disk_cache.cached_frame(dataset, params, builder)))
+            self._snapshots[dataset] = snapshot
+        return snapshot
+
+    def refresh(self, dataset):
+        """Bring ``dataset`` up to date and return a token that changes with its rows."""
+        if dataset in self.stores:
+            store = self.stores[dataset]
+            store.refresh()
+            return store.watermark.isoformat()
+        return self._snapshot(dataset)[0]
+
+    def _window(self, dataset):
+        # Kept up to date by refresh() (in the background); only the first read loads it
+        store = self.stores[dataset]
+        return store.frame if store.frame is not None else store.refresh()
+
+    def _in_history(self, dataset, since):
+        # Periods that start before the in-memory window are read from the partitions
+        store = self.stores[dataset]
+        self._window(dataset)
+        return since is not None and store.history is not None and pd.Timestamp(since) < store.start
+
+    def frame(self, dataset, since=None, until=None):
+        """Return the rows of ``dataset`` (in ``[since, until)``, for time series)."""
+        if dataset not in self.stores:
+            return self._snapshot(dataset)[1]
+        if self._in_history(dataset, since):
+            rows = self.stores[dataset].history.read(since, until)
+            if rows is not None:
+                return validate(dataset, rows)
+        df = self._window(dataset)
+        if since is not None or until is not None:
+            # Rows are sorted by time: a slice of the window, not a copy
+            df = time_slice(df, SCHEMAS[dataset][0], since, until)
+        return df
+
+    def first_time(self, dataset):
+        """Return the first time of a time series the source holds: the start of its history."""
+        store = self.stores[dataset]
+        self._window(dataset)
+        held = None if store.history is None else store.history.metadata.get('since')
+        return store.start if held is None else pd.Timestamp(held)
+
+    def fetch_arrow(self, dataset, since=None, until=None):
+        """Return the rows of ``dataset`` as a ``pyarrow.Table``."""
+        return pa.Table.from_pandas(self.frame(dataset, since, until), preserve_index=False)
+
+    def _rollup(self, dataset, metric, since=None):
+        if self._in_history(dataset, since):
+            # Hourly partials of the partitions, kept for the last period read
+            # until the next refresh
+            store = self.stores[dataset]
+            start = pd.Timestamp(since).floor('D')
+            cached = self._history_rollups.get(dataset)
+            if cached is None or cached[:2] != (store.watermark, start):
+                cached = (store.watermark, start, Rollup(self.partials(dataset, start), SCHEMAS[dataset][1]))
+                self._history_rollups[dataset] = cached
+            return cached[2]
+        df = self.frame(dataset)
+        if dataset == 'analytics':
+            return self.stores[dataset].rollup
+        return Rollup.from_frame(df, [metric], time_col=SCHEMAS[dataset][0])
+
+    def totals(self, dataset, since=None, metrics=None):
+        """Return ``{metric: (sum, count)}`` over the period."""
+        metrics = _metrics(dataset, metrics)
+        if dataset == 'analytics' and since is not None:
+            totals = self._rollup(dataset, None, since).totals(since)
+            return {metric: totals[metric] for metric in metrics}
+        df = self.frame(dataset, since)
+        return {metric: (df[metric].sum(), int(df[metric].count())) for metric in metrics}
+
+    def partials(self, dataset, start=None, end=None):
+        """Return one ``bucket, <metric>_sum, <metric>_count`` row per hour of a time series.
+
+        Without ``start``, the hours of the in-memory window.
+        """
+        time_col, metrics = SCHEMAS[dataset]
+        if self._in_history(dataset, start):
+            return self.stores[dataset].history.partials(start, end)
+        if dataset == 'analytics':
+            rollup = self._rollup(dataset, None)
+            parts = rollup.hourly[['bucket'] + rollup.columns]
+            if start is None and end is None:
+                return parts
+            return time_slice(parts, 'bucket', None if start is None else pd.Timestamp(start).ceil('h'), end)
+        return partial_aggregates(self.frame(dataset, start, end), metrics, time_col=time_col)
+
+    def grid_partials(self, dataset, level=MAX_LEVEL):
+        """Return ``ix, iy, <GRID_KEYS>, points, <metrics>``: sums per grid cell of ``level`` and region.
+
+        Saved next to the snapshot in the disk cache, so a new process reads
+        the cells instead of aggregating the locations again.
+        """
+        key = self._snapshot(dataset)[0]
+        return disk_cache.cached_frame(
+            f'{dataset}_grid', {'snapshot': key, 'level': level},
+            lambda: grid_partials(self.frame(dataset), GRID_KEYS[dataset], SCHEMAS[dataset][1], level)
+        )
+
+    def rolling(self, dataset):
+        """Return the rolling statistics of ``dataset`` (``ROLLING``), one row per point of its history.
+
+        Only the points added since the previous call go through the windows;
+        a point is added once its period is over.
+        """
+        time_col = SCHEMAS[dataset][0]
+        step = ROLLING[dataset][2]
+        with self._rolling_lock:
+            points = _rolling_points(self, dataset)
+            points = points[points[time_col] + step <= self.stores[dataset].watermark]
+            stats = self._rolling.get(dataset)
+            new = points
+            if stats is not None and stats.last is not None:
+                new = points[points[time_col] > stats.last]
+                if len(new) and new[time_col].iloc[0] - stats.last != step:
+                    # Gap after a full rebuild of the store: start over
+                    stats, new = None, points
+            if stats is None:
+                stats = self._rolling[dataset] = new_rolling_stats(dataset)
+            if len(new):
+                stats.append(new)
+                stats.since(points[time_col].iloc[0])
+            return stats.frame()
+
+    def by_date(self, dataset, since, metric, how='sum'):
+        """Return a ``date, <metric>`` frame with one row per day of the period."""
+        return self._rollup(dataset, metric, since).by_date(since, metric, how)
+
+    def by_hour(self, dataset, since, metric, how='mean'):
+        """Return an ``hour, <metric>`` frame aggregated over the period by hour of day."""
+        return self._rollup(dataset, metric, since).by_hour(since, metric, how)
+
+    def heatmap(self, dataset, since, metric, how='mean'):
+        """Return an hour x weekday matrix, weekdays ordered from Monday."""
+        return self._rollup(dataset, metric, since).heatmap(since, metric, how)
+
+    def top(self, dataset, n, by, columns=None):
+        """Return the ``n`` rows with the largest ``by``."""
+        rows = self.frame(dataset).nlargest(n, by)
+        return rows if columns is None else rows[list(columns)]
+
+
+class ConnectionPool:
+    """Bounded pool of database connections, shared by every session of the process.
+
+    Connections are opened on demand up to ``size``; beyond that, callers wait
+    for one to be returned.
+    """
+
+    def __init__(self, connect, size=DB_POOL_SIZE):
+        self._connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {timeout}s") from None
+
+    @contextmanager
+    def connection(self, timeout=30):
+        """Borrow a connection for the duration of the block."""
+        con = self._acquire(timeout)
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            con.close()
+            with self._lock:
+                self._opened -= 1
+
+
+def parse_url(url):
+    """Split ``'<backend>:///<path>'`` into ``(backend, path)``."""
+    backend, separator, path = url.partition(':///')
+    if not separator or backend not in BACKENDS or not path:
+        raise ValueError(
+            f"Unsupported data source {url!r}, expected 'synthetic', 'sqlite:///<path>' or 'duckdb:///<path>'"
+        )
+    return backend, path
+
+
+def _ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_time(value):
+    return pd.Timestamp(value).isoformat(sep=' ')
+
+
+class SqlSource:
+    """Tables named after the datasets in a SQLite or DuckDB database."""
+
+    def __init__(self, url, pool_size=DB_POOL_SIZE, read_only=True):
+        self.url = url
+        self.backend, self.path = parse_url(url)
+        self.read_only = read_only
+        self._database = None
+        self._lock = threading.Lock()
+        self.pool = ConnectionPool(self._connect, pool_size)
+
+    def _connect(self):
+        if self.backend == 'sqlite':
+            if self.read_only:
+                return sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            return sqlite3.connect(self.path, check_same_thread=False)
+
+        import duckdb
+
+        # A DuckDB file is opened once per process; pooled connections are cursors on it
+        with self._lock:
+            if self._database is None:
+                self._database = duckdb.connect(self.path, read_only=self.read_only)
+            return self._database.cursor()
+
+    def fetch_arrow_sql(self, sql, params=()):
+        """Run ``sql`` and return its rows as a ``pyarrow.Table``."""
+        with self.pool.connection() as con:
+            cursor = con.execute(sql, params)
+            if self.backend == 'duckdb':
+                table = cursor.fetch_arrow_table()
+            else:
+                names = [column[0] for column in cursor.description]
+                tables = []
+                while True:
+                    rows = cursor.fetchmany(FETCH_BATCH_ROWS)
+                    if not rows:
+                        break
+                    columns = [pa.array(values) for values in zip(*rows)]
+                    tables.append(pa.Table.from_arrays(columns, names=names))
+                if tables:
+                    table = pa.concat_tables(tables, promote_options='default')
+                else:
+                    table = pa.table({name: pa.array([], pa.null()) for name in names})
+        return self._typed(table)
+
+    def _typed(self, table):
+        for index, field in enumerate(table.schema):
+            if field.name in ('date', 'datetime') and pa.types.is_string(field.type):
+                # SQLite has no timestamp type: time columns come back as ISO strings
+                target = pa.timestamp('ns')
+            elif pa.types.is_decimal(field.type):
+                # DuckDB sums integers into 128-bit decimals
+                target = pa.int64() if field.type.scale == 0 else pa.float64()
+            else:
+                continue
+            table = table.set_column(index, field.name, table.column(index).cast(target))
+        return table
+
+    def _row(self, sql, params=()):
+        return self.fetch_arrow_sql(sql, params).to_pylist()[0]
+
+    def query(self, sql, params=()):
+        """Run ``sql`` and return its rows as a DataFrame."""
+        return self.fetch_arrow_sql(sql, params).to_pandas()
+
+    def _where(self, dataset, since, until=None):
+        time_col = SCHEMAS[dataset][0]
+        bounds = [(bound, operator) for bound, operator in ((since, '>='), (until, '<')) if bound is not None]
+        if not bounds or time_col is None:
+            return '', ()
+        conditions = ' AND '.join(f'{_ident(time_col)} {operator} ?' for _, operator in bounds)
+        return f' WHERE {conditions}', tuple(_sql_time(bound) for bound, _ in bounds)
+
+    def _default_since(self, dataset, since):
+        if since is None and dataset in WINDOW_DAYS:
+            return datetime.now() - timedelta(days=WINDOW_DAYS[dataset])
+        return since
+
+    def refresh(self, dataset):
+        """Return a token that changes with the rows of ``dataset``."""
+        time_col, metrics = SCHEMAS[dataset]
+        latest = f'MAX({_ident(time_col)})' if time_col else 'NULL'
+        row = self._row(f'SELECT COUNT(*) AS n, {latest} AS latest, SUM({_ident(metrics[0])}) AS checksum '
+                        f'FROM {_ident(dataset)}')
+        return f"{row['n']}|{row['latest']}|{row['checksum']}"
+
+    def frame(self, dataset, since=None, until=None):
+        """Return the rows of ``dataset`` (the window of the last days, for time series)."""
+        return compact(dataset, self.fetch_arrow(dataset, since, until).to_pandas())
+
+    def fetch_arrow(self, dataset, since=None, until=None):
+        """Return the rows of ``dataset`` as a ``pyarrow.Table``, fetched in record batches."""
+        where, params = self._where(dataset, self._default_since(dataset, since), until)
+        order = f' ORDER BY {_ident(SCHEMAS[dataset][0])}' if SCHEMAS[dataset][0] else ''
+        return self.fetch_arrow_sql(f'SELECT * FROM {_ident(dataset)}{where}{order}', params)
+
+    def first_time(self, dataset):
+        """Return the first time of a time series in its table."""
+        row = self._row(f'SELECT MIN({_ident(SCHEMAS[dataset][0])}) AS first FROM {_ident(dataset)}')
+        return None if row['first'] is None else pd.Timestamp(row['first'])
+
+    def totals(self, dataset, since=None, metrics=None):
+        """Return ``{metric: (sum, count)}`` over the period."""
+        metrics = _metrics(dataset, metrics)
+        where, params = self._where(dataset, self._default_since(dataset, since))
+        selects = ', '.join(
+            f'SUM({_ident(m)}) AS {_ident(m + "_sum")}, COUNT({_ident(m)}) AS {_ident(m + "_count")}' for m in metrics
+        )
+        row = self._row(f'SELECT {selects} FROM {_ident(dataset)}{where}', params)
+        return {metric: (row[f'{metric}_sum'], int(row[f'{metric}_count'])) for metric in metrics}
+
+    def partials(self, dataset, start=None, end=None):
+        """Return one ``bucket, <metric>_sum, <metric>_count`` row per hour of a time series.
+
+        Without ``start``, the hours of the window of the last days.
+        """
+        keys = ', '.join(_ident(key) for key in _BUCKET_KEYS[dataset])
+        selects = ', '.join(
+            f'SUM({_ident(m)}) AS {_ident(m + "_sum")}, COUNT({_ident(m)}) AS {_ident(m + "_count")}'
+            for m in SCHEMAS[dataset][1]
+        )
+        if start is not None:
+            start = pd.Timestamp(start).ceil('h')
+        where, params = self._where(dataset, self._default_since(dataset, start), end)
+        parts = self.query(
+            f'SELECT {keys}, {selects} FROM {_ident(dataset)}{where} GROUP BY {keys} ORDER BY {keys}', params
+        )
+        bucket = parts.pop('date')
+        if 'hour' in parts:
+            bucket = bucket + pd.to_timedelta(parts.pop('hour'), unit='h')
+        parts.insert(0, 'bucket', bucket)
+        return parts
+
+    def grid_partials(self, dataset, level=MAX_LEVEL):
+        """Return ``ix, iy, <GRID_KEYS>, points, <metrics>``: sums per grid cell of ``level`` and region.
+
+        The cells are computed and grouped in the database, with the
+        arithmetic of ``utils.spatial.cell_index``.
+        """
+        cells = 2 ** level
+        ix = _SQL_FLOOR[self.backend].format(f'(CAST("lon" AS DOUBLE) + 180.0) * {cells} / 360.0')
+        iy = _SQL_FLOOR[self.backend].format(f'(CAST("lat" AS DOUBLE) + 90.0) * {cells} / 360.0')
+        keys = ', '.join(_ident(key) for key in GRID_KEYS[dataset])
+        sums = ', '.join(f'SUM({_ident(m)}) AS {_ident(m)}' for m in SCHEMAS[dataset][1])
+        return self.query(
+            f'SELECT {ix} AS ix, {iy} AS iy, {keys}, COUNT(*) AS points, {sums} '
+            f'FROM {_ident(dataset)} GROUP BY ix, iy, {keys}'
+        )
+
+    def rolling(self, dataset):
+        """Return the rolling statistics of ``dataset`` (``ROLLING``), one row per point of its history."""
+        stats = new_rolling_stats(dataset)
+        stats.append(_rolling_points(self, dataset))
+        return stats.frame()
+
+    def _grouped(self, dataset, since, metric, how, key):
+        if how not in _SQL_AGGREGATES:
+            raise ValueError(f"Unknown aggregation {how!r}, expected 'sum' or 'mean'")
+        where, params = self._where(dataset, since)
+        return self.query(
+            f'SELECT {_ident(key)}, {_SQL_AGGREGATES[how]}({_ident(metric)}) AS {_ident(metric)} '
+            f'FROM {_ident(dataset)}{where} GROUP BY {_ident(key)} ORDER BY {_ident(key)}',
+            params
+        )
+
+    def by_date(self, dataset, since, metric, how='sum'):
+        """Return a ``date, <metric>`` frame with one row per day of the period."""
+        return self._grouped(dataset, since, metric, how, 'date')
+
+    def by_hour(self, dataset, since, metric, how='mean'):
+        """Return an ``hour, <metric>`` frame aggregated over the period by hour of day."""
+        return self._grouped(dataset, since, metric, how, 'hour')
+
+    def heatmap(self, dataset, since, metric, how='mean'):
+        """Return an hour x weekday matrix, weekdays ordered from Monday.
+
+        The database groups by date and hour (weekday functions differ between
+        SQL dialects); the partial sums are then folded by weekday.
+        """
+        if how not in _SQL_AGGREGATES:
+            raise ValueError(f"Unknown aggregation {how!r}, expected 'sum' or 'mean'")
+        where, params = self._where(dataset, since)
+        parts = self.query(
+            f'SELECT "date", "hour", SUM({_ident(metric)}) AS total, COUNT({_ident(metric)}) AS n '
+            f'FROM {_ident(dataset)}{where} GROUP BY "date", "hour"',
+            params
+        )
+        parts['weekday'] = parts['date'].dt.day_name()
+        grouped = parts.groupby(['hour', 'weekday'])[['total', 'n']].sum()
+        values = grouped['total'] if how == 'sum' else grouped['total'] / grouped['n']
+        matrix = values.unstack('weekday')
+        return matrix.reindex(columns=[day for day in DAY_ORDER if day in matrix.columns])
+
+    def top(self, dataset, n, by, columns=None):
+        """Return the ``n`` rows with the largest ``by``."""
+        selects = '*' if columns is None else ', '.join(_ident(column) for column in columns)
+        return self.query(
+            f'SELECT {selects} FROM {_ident(dataset)} ORDER BY {_ident(by)} DESC LIMIT ?', (int(n),)
+        )
+
+    def write_frame(self, dataset, df):
+        """Replace the table of ``dataset`` with the rows of ``df``."""
+        time_col = SCHEMAS[dataset][0]
+        with self.pool.connection() as con:
+            if self.backend == 'sqlite':
+                df.to_sql(dataset, con, if_exists='replace', index=False, chunksize=FETCH_BATCH_ROWS)
+                if time_col:
+                    con.execute(f'CREATE INDEX {_ident(dataset + "_" + time_col)} '
+                                f'ON {_ident(dataset)} ({_ident(time_col)})')
+                con.commit()
+            else:
+                con.register('_frame', pa.Table.from_pandas(df, preserve_index=False))
+                con.execute(f'CREATE OR REPLACE TABLE {_ident(dataset)} AS SELECT * FROM _frame')
+                con.unregister('_frame')
+
+    def close(self):
+        self.pool.close()
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+
+
+def open_source(url):
+    """Return a new source for ``url`` (``'synthetic'`` or a SQL database URL)."""
+    if url == 'synthetic':
+        return SyntheticSource()
+    return SqlSource(url)
+
+
+@st.cache_resource
+def get_source(url=DATA_SOURCE):
+    """Return the source of the pages, shared by every page and session of the process."""
+    return open_source(url)
+
+
+@st.cache_resource
+def get_refresher(url=DATA_SOURCE):
+    """Return the background refresher of the datasets of the pages (``DASHBOARD_REFRESH_INTERVAL``)."""
+    source = get_source(url)
+    refresher = Refresher(REFRESH_INTERVAL)
+    for dataset in PAGE_DATASETS:
+        refresher.watch(dataset, lambda dataset=dataset: source.refresh(dataset))
+    return refresher.start()
+
+
+def current_version(dataset, url=DATA_SOURCE):
+    """Return the version of ``dataset`` as of its last background refresh.
+
+    Sessions never wait for a refresh: they keep reading the last good
+    version until the refresher has built the next one. Only the first read
+    of a dataset loads it inline, once for all concurrent sessions.
+    """
+    return get_refresher(url).get(dataset)
+
+
+@st.cache_resource
+def get_registry(url=DATA_SOURCE):
+    """Return the registry of the source's datasets, shared by every page and session of the process."""
+    return DatasetRegistry()
+
+
+def shared_dataset(dataset, url=DATA_SOURCE):
+    """Return the ``SharedDataset`` of the current version of ``dataset``.
+
+    Its rows are read from the source once per version; sessions take views
+    of them (``period``, ``tail``, ``top``...) instead of copies.
+    """
+    return get_registry(url).get(
+        dataset, current_version(dataset, url), lambda: get_source(url).frame(dataset), SCHEMAS[dataset][0]
+    )
+
+
+def load(url, datasets=None):
+    """Write the synthetic datasets to the database at ``url``.
+
+    Time series are written with the raw rows of their history: all of it for
+    the sample, the current window for the analytics (older hours are only
+    kept as rollups).
+    """
+    synthetic = SyntheticSource()
+    target = SqlSource(url, pool_size=1, read_only=False)
+    counts = {}
+    try:
+        for dataset in datasets or SCHEMAS:
+            since = datetime.now() - timedelta(days=HISTORY_DAYS) if dataset in WINDOW_DAYS else None
+            df = synthetic.frame(dataset, since)
+            target.write_frame(dataset, df)
+            counts[dataset] = len(df)
+    finally:
+        target.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a SQLite or DuckDB database with the synthetic datasets.")
+    parser.add_argument('url', help="'sqlite:///dashboard.db' or 'duckdb:///dashboard.duckdb'")
+    parser.add_argument('--datasets', nargs='+', choices=sorted(SCHEMAS), default=None)
+    args = parser.parse_args()
+
+    for dataset, rows in load(args.url, args.datasets).items():
+        print(f"{dataset}: {rows:,} lignes")
+
+
+if __name__ == '__main__':
+    main()
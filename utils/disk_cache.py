@@ -0,0 +1,136 @@
+"""Persistent, memory-mapped cache of dashboard DataFrames.
+
+Frames are stored as Arrow IPC files, one per generator name and parameter
+set, in a directory shared by every worker process on the host. Loading
+memory-maps the file, so workers share the pages of the OS file cache instead
+of each holding a private copy, and a restarted process skips the generation.
+
+File names embed ``FORMAT_VERSION`` and the dataset's entry in
+``SCHEMA_VERSIONS``: bump the latter whenever a generator's columns change and
+the old files are ignored, then removed on the next write.
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+CACHE_DIR = os.environ.get(
+    'DASHBOARD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'streamlit-demo-cache')
+)
+
+FORMAT_VERSION = 1
+
+SCHEMA_VERSIONS = {
+    'sample': 3,
+    'analytics': 3,
+    'geo': 2,
+    'canada': 2,
+    'geo_points': 1,
+    'geo_points_grid': 1,
+}
+
+_META_KEY = b'streamlit_demo'
+
+
+def _version(name):
+    return f'v{FORMAT_VERSION}.{SCHEMA_VERSIONS.get(name, 0)}'
+
+
+def cache_key(params):
+    """Return a stable short hash of a JSON-serializable parameter dict."""
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def cache_path(name, params, cache_dir=None):
+    """Return the file holding ``name`` built with ``params``."""
+    return os.path.join(cache_dir or CACHE_DIR, f'{name}-{_version(name)}-{cache_key(params)}.arrow')
+
+
+def partition_root(name, params, cache_dir=None):
+    """Return the directory of the partitioned store (``utils.partitions``) of ``name`` built with ``params``."""
+    return os.path.join(cache_dir or CACHE_DIR, f'{name}-{_version(name)}-{cache_key(params)}')
+
+
+def save_frame(path, df, metadata=None):
+    """Atomically write ``df`` (and a JSON-serializable ``metadata`` dict) to ``path``."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _META_KEY: json.dumps(metadata or {}, default=str).encode(),
+    })
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_frame(path):
+    """Memory-map ``path`` and return ``(df, metadata)``, or ``(None, None)`` if it is missing."""
+    try:
+        source = pa.memory_map(path, 'r')
+    except FileNotFoundError:
+        return None, None
+    table = pa.ipc.open_file(source).read_all()
+    metadata = json.loads((table.schema.metadata or {}).get(_META_KEY, b'{}'))
+    # split_blocks lets numeric columns point straight at the mapped pages
+    return table.to_pandas(split_blocks=True), metadata
+
+
+def purge_stale(name, cache_dir=None):
+    """Remove the files and partition directories of ``name`` written with another format or schema version."""
+    current = f'{name}-{_version(name)}-'
+    for path in glob.glob(os.path.join(cache_dir or CACHE_DIR, f'{name}-v*')):
+        if os.path.basename(path).startswith(current) or path.endswith('.lock'):
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on ``path + '.lock'`` across processes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def cached_frame(name, params, builder, cache_dir=None):
+    """Return ``builder()`` for ``name``/``params``, generated once per host.
+
+    Concurrent workers wait on a file lock, so only one of them builds a
+    missing entry and the others map the file it wrote.
+    """
+    path = cache_path(name, params, cache_dir)
+    df, _ = load_frame(path)
+    if df is not None:
+        return df
+
+    with file_lock(path):
+        df, _ = load_frame(path)
+        if df is None:
+            df = builder()
+            save_frame(path, df, {'name': name, 'params': params})
+            purge_stale(name, cache_dir)
+    return df
@@ -0,0 +1,90 @@
+"""Server-side downsampling of time series before they are sent to Plotly.
+
+A line chart cannot show more points than it has pixels, so series are cut
+to about one point per pixel of the chart's width before the figure is built.
+``lttb`` (Largest-Triangle-Three-Buckets) keeps the visual shape of smooth
+series; ``minmax`` keeps the extreme value of every pixel bucket, so no peak
+is lost on noisy series.
+"""
+import numpy as np
+
+# Plot area of a full-width chart and of a chart in a two-column layout
+FULL_WIDTH_PX = 1200
+HALF_WIDTH_PX = 600
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """Return the indices of the ``n_out`` points kept by LTTB."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x, y = _as_float(x), _as_float(y)
+    # First and last points are always kept; the rest is split in n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+def minmax_indices(y, n_buckets):
+    """Return the indices of the minimum and maximum of each of ``n_buckets`` buckets."""
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+
+    y = _as_float(y)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    kept = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        bucket = y[lo:hi]
+        kept.extend((lo + int(np.argmin(bucket)), lo + int(np.argmax(bucket))))
+    kept.extend((0, n - 1))
+    return np.unique(kept)
+
+
+def visible_slice(x, x_range):
+    """Return the slice of sorted ``x`` inside ``x_range``, plus one point on each side."""
+    if x_range is None:
+        return slice(0, len(x))
+    x = np.asarray(x)
+    lo = np.searchsorted(x, np.asarray(x_range[0], dtype=x.dtype), side='left')
+    hi = np.searchsorted(x, np.asarray(x_range[1], dtype=x.dtype), side='right')
+    return slice(max(0, lo - 1), min(len(x), hi + 1))
+
+
+def downsample(df, x, y, width_px=FULL_WIDTH_PX, x_range=None, method='lttb'):
+    """Return the rows of ``df`` needed to draw ``y`` against ``x`` at ``width_px``.
+
+    ``x_range`` is the visible (zoomed) window: only its rows are kept, at
+    full pixel resolution, so zooming in reveals more detail.
+    """
+    view = df.iloc[visible_slice(df[x].values, x_range)]
+    if method == 'lttb':
+        kept = lttb_indices(view[x].values, view[y].values, width_px)
+    elif method == 'minmax':
+        kept = minmax_indices(view[y].values, width_px // 2)
+    else:
+        raise ValueError(f"Unknown method {method!r}, expected 'lttb' or 'minmax'")
+    return view if len(kept) == len(view) else view.iloc[kept]
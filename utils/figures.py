@@ -0,0 +1,138 @@
+"""Figure factory: chart skeletons built once, data attached as typed arrays.
+
+Plotly Express validates its arguments and builds the whole figure (template,
+axes, legend, hover templates, color axes) on every call, which costs far
+more than the data it plots. ``make_figure`` runs the chart's own builder
+(Plotly Express or graph_objects) only the first time a chart is drawn in the
+process, keeps the result without its data arrays as the chart's skeleton,
+and afterwards copies the skeleton and only attaches the new arrays, creating
+the figure without validation.
+
+Arrays are attached as plotly.js typed arrays (``{'dtype', 'bdata'}``, base64
+of the raw values), which Plotly serializes as a single string instead of one
+JSON number per point. Datetimes become float64 milliseconds since the epoch
+on a ``'date'`` axis, so they are not sent as ISO strings either. Arrays of
+strings or objects are sent as lists.
+
+``DASHBOARD_FIGURE_FACTORY=0`` calls the builders every time, as before; the
+benchmark ``benchmarks/bench_figures.py`` compares both.
+"""
+import base64
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.config import FIGURE_FACTORY
+
+# numpy dtype -> plotly.js typed array dtype
+TYPED_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+# name -> (traces without their data arrays, layout)
+_skeletons = {}
+_lock = threading.Lock()
+
+
+def typed_array(values):
+    """Return ``values`` as a plotly.js typed array spec, or as a list when it has no typed form."""
+    array = np.asarray(values)
+    if array.dtype.kind == 'M':
+        array = array.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    elif array.dtype.kind in 'iu' and array.dtype.name not in TYPED_DTYPES:
+        # 64-bit integers have no typed array in plotly.js
+        fits = array.size == 0 or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max)
+        array = array.astype(np.int32 if fits else np.float64)
+    if array.dtype.name not in TYPED_DTYPES:
+        return array.tolist()
+    spec = {
+        'dtype': TYPED_DTYPES[array.dtype.name],
+        'bdata': base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii'),
+    }
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(str(size) for size in array.shape)
+    return spec
+
+
+def _is_array(value):
+    return isinstance(value, (np.ndarray, pd.Series, pd.Index, list, tuple))
+
+
+def _is_datetime(value):
+    return pd.api.types.is_datetime64_any_dtype(getattr(value, 'dtype', None))
+
+
+def _set(container, path, value):
+    *parents, leaf = path.split('.')
+    for key in parents:
+        container = container.setdefault(key, {})
+    container[leaf] = value
+
+
+def _pop(container, path):
+    *parents, leaf = path.split('.')
+    for key in parents:
+        container = container.get(key, {})
+    container.pop(leaf, None)
+
+
+def _skeleton(name, build, traces):
+    skeleton = _skeletons.get(name)
+    if skeleton is None:
+        spec = build().to_plotly_json()
+        if len(spec['data']) != len(traces):
+            raise ValueError(f"{name}: the builder made {len(spec['data'])} traces, {len(traces)} were given")
+        data = []
+        for trace, arrays in zip(spec['data'], traces):
+            trace = copy.deepcopy(trace)
+            for path in arrays:
+                _pop(trace, path)
+            data.append(trace)
+        with _lock:
+            skeleton = _skeletons.setdefault(name, (data, spec['layout']))
+    return skeleton
+
+
+def make_figure(name, build, traces, layout=None):
+    """Return chart ``name`` drawing the arrays of ``traces``.
+
+    ``build()`` returns the complete figure (e.g. the Plotly Express call);
+    it only runs the first time, to make the skeleton of ``name``, so
+    anything else that changes the figure must be part of ``name``.
+    ``traces`` holds one dict per trace of the figure, mapping a property
+    path to its value: ``[{'x': df['date'], 'y': df['ventes']}]``, with dotted
+    paths for nested properties (``'marker.color'``). Values that depend on
+    the data without being arrays (``'marker.sizeref'``) go there too, and
+    ``layout`` maps the layout properties that depend on the data (e.g.
+    ``'geo.lonaxis.range'``) to their value the same way.
+    """
+    if not FIGURE_FACTORY:
+        return build()
+    skeleton_data, skeleton_layout = _skeleton(name, build, traces)
+    data = []
+    date_axes = set()
+    for skeleton, arrays in zip(skeleton_data, traces):
+        trace = copy.deepcopy(skeleton)
+        for path, value in arrays.items():
+            if not _is_array(value):
+                _set(trace, path, value)
+                continue
+            if path in ('x', 'y') and _is_datetime(value):
+                # Milliseconds are only read as dates on a date axis
+                axis = trace.get(f'{path}axis', path)
+                date_axes.add(f'{path}axis{axis[1:]}')
+            _set(trace, path, typed_array(value))
+        data.append(trace)
+    overrides = layout or {}
+    layout = skeleton_layout
+    if date_axes or overrides:
+        layout = copy.deepcopy(layout) if overrides else dict(layout)
+        for axis in date_axes:
+            layout[axis] = {**layout.get(axis, {}), 'type': 'date'}
+        for path, value in overrides.items():
+            _set(layout, path, value)
+    return go.Figure(data=data, layout=layout, _validate=False)
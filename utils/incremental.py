@@ -0,0 +1,143 @@
+"""Incrementally refreshed time-series datasets.
+
+An ``IncrementalStore`` keeps the last ``days`` of a dataset in memory
+together with a watermark (the end of the newest bucket it holds). A refresh
+only generates the buckets between the watermark and now, appends them and
+drops the ones that fell out of the window, instead of rebuilding the whole
+history. Values come from ``utils.streaming``, so an appended bucket is
+identical to the one a full rebuild would produce, and are stored with the
+compact dtypes of ``utils.schemas``.
+
+With ``persist=True`` the rows are also written to a partitioned store in
+the disk cache (``utils.partitions``): a refresh only rewrites the
+partitions of the buckets it added, and a new process reads the partitions
+of the window back and only generates what happened since the watermark.
+The store keeps ``history_days`` of history (backfilled on first use):
+stores with a rollup compact the partitions that leave the window into
+monthly hourly rollups, the others keep their rows.
+"""
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from utils import disk_cache
+from utils.partitions import PartitionedStore
+from utils.registry import time_slice
+from utils.rollups import Rollup, partial_aggregates
+from utils.schemas import SchemaError, compact, validate
+from utils.streaming import DATASETS, generate_range
+
+
+class IncrementalStore:
+    """Rolling window of a dataset from ``utils.streaming``, extended in place."""
+
+    def __init__(self, dataset, days, seed=0, freq=None, rollup_metrics=None, persist=False,
+                 time_col='datetime', metrics=None, history_days=None, granularity='D'):
+        self.dataset = dataset
+        self.days = days
+        self.seed = seed
+        self.freq = freq or DATASETS[dataset][0]
+        self.step = pd.Timedelta(self.freq) if self.freq[:1].isdigit() else pd.Timedelta(1, unit=self.freq)
+        self.rollup_metrics = rollup_metrics
+        self.time_col = time_col
+        self.history_days = max(history_days or days, days)
+        self.history = None
+        if persist:
+            root = disk_cache.partition_root(dataset, {'seed': seed, 'freq': self.freq, 'granularity': granularity})
+            self.history = PartitionedStore(root, time_col, metrics or rollup_metrics, granularity)
+        self.frame = None
+        self.rollup = None
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def _bounds(self, now):
+        # Same extent as the original loaders: every bucket of the last ``days``
+        # days, the current one included
+        end = pd.Timestamp(now).floor(self.step) + self.step
+        return end - self.days * pd.Timedelta(days=1), end
+
+    @property
+    def start(self):
+        """Return the first time of the window, or None before the first refresh."""
+        return None if self.watermark is None else self.watermark - self.days * pd.Timedelta(days=1)
+
+    def _load(self, start):
+        # The partitions of the window only, up to the saved watermark
+        watermark = self.history.metadata.get('watermark')
+        if watermark is None or pd.Timestamp(watermark) <= start:
+            return
+        try:
+            frame = self.history.read(start, watermark)
+            frame = frame if frame is None else validate(self.dataset, frame)
+        except SchemaError:
+            # Written with other dtypes: rebuilt by the next refresh
+            frame = None
+        if frame is not None:
+            self.frame = frame
+            self.watermark = pd.Timestamp(watermark)
+            if self.rollup_metrics:
+                self.rollup = Rollup.from_frame(frame, self.rollup_metrics, time_col=self.time_col)
+
+    def _backfill(self, first, end):
+        # Generate the history of [first, end) one month at a time, straight
+        # into the rollups when compacting
+        for month_start in pd.date_range(first.to_period('M').start_time, end, freq='MS'):
+            chunk_start = max(month_start, first)
+            chunk_end = min(month_start + pd.offsets.MonthBegin(1), end)
+            if chunk_start >= chunk_end:
+                continue
+            rows = self._generate(chunk_start, chunk_end)
+            if self.rollup_metrics:
+                self.history.write_partials(partial_aggregates(rows, self.rollup_metrics, time_col=self.time_col))
+            else:
+                self.history.write(rows)
+
+    def _save(self, new):
+        history_start = self.watermark - self.history_days * pd.Timedelta(days=1)
+        # One process at a time: rollups add up what they are given, so a
+        # range must be backfilled once
+        with disk_cache.file_lock(os.path.join(self.history.root, 'save')):
+            previous = self.history.metadata.get('watermark')
+            # Another process may have saved a later watermark already
+            watermark = self.watermark if previous is None else max(self.watermark, pd.Timestamp(previous))
+            self.history.write(new, {'watermark': watermark.isoformat()})
+            if previous is not None and pd.Timestamp(previous) < self.start:
+                # Down for longer than the window: the rows in between were never stored
+                self._backfill(max(pd.Timestamp(previous), history_start), self.start)
+            held = self.history.metadata.get('since')
+            if held is None or pd.Timestamp(held) > history_start:
+                self._backfill(history_start, pd.Timestamp(held) if held is not None else self.start)
+                self.history.update_metadata({'since': history_start.isoformat()})
+            if self.rollup_metrics:
+                self.history.compact(self.start)
+            self.history.drop_before(history_start)
+        disk_cache.purge_stale(self.dataset)
+
+    def _generate(self, start, end):
+        return compact(self.dataset, generate_range(self.dataset, start, end, seed=self.seed, freq=self.freq))
+
+    def refresh(self, now=None):
+        """Bring the window up to ``now`` and return the current frame."""
+        with self._lock:
+            start, end = self._bounds(now or datetime.now())
+            if self.history is not None and self.frame is None:
+                self._load(start)
+            if self.watermark is not None and end <= self.watermark:
+                return self.frame
+
+            if self.frame is None or start >= self.watermark:
+                self.frame = new = self._generate(start, end)
+                if self.rollup_metrics:
+                    self.rollup = Rollup.from_frame(self.frame, self.rollup_metrics, time_col=self.time_col)
+            else:
+                new = self._generate(self.watermark, end)
+                kept = time_slice(self.frame, self.time_col, start)
+                self.frame = pd.concat([kept, new], ignore_index=True)
+                if self.rollup_metrics:
+                    self.rollup = self.rollup.append(new, time_col=self.time_col).since(start)
+            self.watermark = end
+            if self.history is not None:
+                self._save(new)
+            return self.frame
@@ -0,0 +1,108 @@
+"""Period KPIs and period-over-period deltas from prefix sums.
+
+``KpiEngine`` sorts the rows (or the hourly partial aggregates of a rollup)
+by time once and keeps the running sums and counts of every metric. The sum,
+count and mean of any metric over any ``[start, end)`` period are then two
+binary searches and a subtraction, whatever the length of the period, and
+``compare`` gets the current and the previous period of all metrics from the
+same three positions.
+"""
+import numpy as np
+import pandas as pd
+
+# Metric -> aggregation of the key metrics of the Analytics page (and of the batch reports)
+ANALYTICS_KPIS = {'traffic': 'sum', 'bounce_rate': 'mean', 'page_views': 'sum', 'session_duration': 'mean'}
+
+
+class KpiEngine:
+    """Prefix sums and counts of ``metrics`` over time-sorted buckets."""
+
+    def __init__(self, times, sums, counts, metrics):
+        self.metrics = list(metrics)
+        self.times = np.asarray(times, dtype='datetime64[ns]')
+        if len(self.times) > 1 and (np.diff(self.times) < np.timedelta64(0)).any():
+            raise ValueError("KpiEngine needs rows sorted by time")
+        shape = (len(self.times) + 1, len(self.metrics))
+        self.sums = np.zeros(shape)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        np.cumsum(np.asarray(sums, dtype=np.float64), axis=0, out=self.sums[1:])
+        np.cumsum(np.asarray(counts, dtype=np.int64), axis=0, out=self.counts[1:])
+
+    @classmethod
+    def from_frame(cls, df, time_col, metrics):
+        """Build the engine from raw rows (missing values are not counted)."""
+        df = df.sort_values(time_col, kind='stable')
+        values = df[list(metrics)].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        return cls(df[time_col].to_numpy(), np.where(present, values, 0.0), present, metrics)
+
+    @classmethod
+    def from_partials(cls, parts, metrics, time_col='bucket'):
+        """Build the engine from ``<metric>_sum`` and ``<metric>_count`` columns per bucket."""
+        parts = parts.sort_values(time_col, kind='stable')
+        return cls(
+            parts[time_col].to_numpy(),
+            parts[[f'{metric}_sum' for metric in metrics]].to_numpy(),
+            parts[[f'{metric}_count' for metric in metrics]].to_numpy(),
+            metrics,
+        )
+
+    @property
+    def first(self):
+        return pd.Timestamp(self.times[0]) if len(self.times) else None
+
+    def _positions(self, bounds):
+        bounds = np.array([pd.Timestamp(bound).to_datetime64() for bound in bounds], dtype='datetime64[ns]')
+        return np.searchsorted(self.times, bounds, side='left')
+
+    def window(self, start, end):
+        """Return the ``(sums, counts)`` arrays of every metric over ``[start, end)``."""
+        i, j = self._positions([start, end])
+        return self.sums[j] - self.sums[i], self.counts[j] - self.counts[i]
+
+    def compare(self, start, end, how):
+        """Return the current and previous period values of every metric in ``how``.
+
+        ``how`` maps a metric to ``'sum'`` or ``'mean'``. The previous period is
+        the one of the same length ending at ``start``; its value is ``None``
+        when it starts before the first bucket, since it would be partial.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        previous_start = start - (end - start)
+        positions = self._positions([previous_start, start, end])
+        sums, counts = self.sums[positions], self.counts[positions]
+        current = (sums[2] - sums[1], counts[2] - counts[1])
+        previous = (sums[1] - sums[0], counts[1] - counts[0])
+        complete = self.first is not None and previous_start >= self.first
+
+        results = {}
+        for metric, aggregate in how.items():
+            if aggregate not in ('sum', 'mean'):
+                raise ValueError(f"Unknown aggregation {aggregate!r}, expected 'sum' or 'mean'")
+            k = self.metrics.index(metric)
+            values = []
+            for period_sums, period_counts in (current, previous):
+                if aggregate == 'sum':
+                    values.append(float(period_sums[k]))
+                else:
+                    values.append(float(period_sums[k] / period_counts[k]) if period_counts[k] else None)
+            value, previous_value = values
+            if not complete:
+                previous_value = None
+            change = None
+            if value is not None and previous_value:
+                change = (value - previous_value) / abs(previous_value)
+            results[metric] = {'value': value, 'previous': previous_value, 'change': change}
+        return results
+
+
+def format_change(kpi):
+    """Return the relative change of ``kpi`` for ``st.metric`` (``'+4.2%'``), or None."""
+    return None if kpi['change'] is None else f"{kpi['change']:+.1%}"
+
+
+def format_difference(kpi, template):
+    """Return ``value - previous`` formatted with ``template`` (e.g. ``'{:+.1f} pt'``), or None."""
+    if kpi['value'] is None or kpi['previous'] is None:
+        return None
+    return template.format(kpi['value'] - kpi['previous'])
@@ -0,0 +1,288 @@
+"""Live mode of the main dashboard: events folded into running aggregates.
+
+A ``LiveFeed`` receives sale events through a bounded queue (a local
+stand-in for a message queue or socket; ``SyntheticEvents`` fills it from a
+thread) and folds them into a ``LiveState``: daily totals of the last days,
+period totals and the 7-day rolling mean of revenue, each updated in place
+by every event instead of being recomputed from the rows.
+
+Pages drain the feed on their own refresh interval, so the render rate does
+not depend on the event rate, and patch the days that changed since their
+last draw into their figure (``LiveState.changes`` and ``patch_figure``)
+instead of rebuilding it; the figure itself is still sent whole.
+
+The state starts from the daily totals of the batch data; when a refresh
+brings a new version of it, ``rebase`` starts a new state from the new
+totals. The synthetic producer runs only while pages drain the feed: it is
+started by the first of them and stops ``LIVE_IDLE`` seconds after the last.
+
+Backpressure: publishers never block. When the queue is full (the pages
+fall behind), new events are coalesced into one pending event per day,
+pushed as soon as the queue has room: totals stay exact, only the number of
+queued items is bounded. A drain folds at most ``max_batch`` events.
+"""
+import math
+import queue
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils.config import LIVE_EVENTS_PER_S, LIVE_IDLE, LIVE_QUEUE_SIZE
+
+# Additive columns carried by the events
+COLUMNS = ['ventes', 'utilisateurs', 'revenus']
+
+ROLLING_DAYS = 7
+
+
+class LiveState:
+    """Daily totals of the last ``days`` days, updated in place by each event."""
+
+    def __init__(self, daily, days, rolling=ROLLING_DAYS):
+        daily = daily.tail(days)
+        self.days = days
+        self.rolling = rolling
+        self.dates = [pd.Timestamp(day) for day in daily['date']]
+        self.values = {column: daily[column].astype(float).tolist() for column in COLUMNS}
+        self.totals = {column: math.fsum(self.values[column]) for column in COLUMNS}
+        # Same values as pandas' rolling(rolling).mean() on the daily revenue
+        self.trend = daily['revenus'].astype(float).rolling(rolling).mean().tolist()
+        self.version = 0
+        self.late = 0
+        self._changed = [0] * len(self.dates)
+        self._lock = threading.Lock()
+
+    def _advance(self, day):
+        # Open the days up to ``day`` and drop the ones that leave the window
+        while self.dates[-1] < day:
+            self.dates.append(self.dates[-1] + pd.Timedelta(days=1))
+            for column in COLUMNS:
+                self.values[column].append(0.0)
+            revenue = self.values['revenus']
+            enough = len(revenue) >= self.rolling
+            self.trend.append(math.fsum(revenue[-self.rolling:]) / self.rolling if enough else np.nan)
+            self._changed.append(self.version)
+            if len(self.dates) > self.days:
+                for column in COLUMNS:
+                    self.totals[column] -= self.values[column].pop(0)
+                self.dates.pop(0)
+                self.trend.pop(0)
+                self._changed.pop(0)
+
+    def fold(self, events):
+        """Add ``events`` (dicts with ``time`` and the ``COLUMNS``) to the aggregates."""
+        with self._lock:
+            for event in events:
+                self.version += 1
+                day = pd.Timestamp(event['time']).normalize()
+                if day > self.dates[-1]:
+                    self._advance(day)
+                i = (day - self.dates[0]).days
+                if i < 0:
+                    # Older than the window
+                    self.late += 1
+                    continue
+                for column in COLUMNS:
+                    self.values[column][i] += event[column]
+                    self.totals[column] += event[column]
+                # The revenue of day i is in the rolling mean of the next ``rolling`` days
+                for j in range(i, min(i + self.rolling, len(self.dates))):
+                    if not math.isnan(self.trend[j]):
+                        self.trend[j] += event['revenus'] / self.rolling
+                    self._changed[j] = self.version
+
+    def frame(self):
+        """Return the current days as a ``date, <COLUMNS>, tendance`` frame."""
+        with self._lock:
+            return pd.DataFrame({
+                'date': list(self.dates),
+                **{column: list(values) for column, values in self.values.items()},
+                'tendance': list(self.trend),
+            })
+
+    def changes(self, since):
+        """Return ``(version, rows changed after version since, first date)``."""
+        with self._lock:
+            rows = [i for i, changed in enumerate(self._changed) if changed > since]
+            changed = pd.DataFrame({
+                'date': [self.dates[i] for i in rows],
+                **{column: [values[i] for i in rows] for column, values in self.values.items()},
+                'tendance': [self.trend[i] for i in rows],
+            })
+            return self.version, changed, self.dates[0]
+
+    def snapshot(self):
+        """Return ``(version, period totals)``."""
+        with self._lock:
+            return self.version, dict(self.totals)
+
+
+class LiveFeed:
+    """Bounded event queue in front of a ``LiveState`` built from version ``base`` of the batch data."""
+
+    def __init__(self, state, queue_size=LIVE_QUEUE_SIZE, max_batch=None, base=None):
+        self.state = state
+        self.base = base
+        self.last_drain = time.monotonic()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.max_batch = max_batch or queue_size
+        self.received = 0
+        self.coalesced = 0
+        self.folded = 0
+        # day -> event merging the events that found the queue full
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+
+    def _flush_pending(self):
+        for day in list(self._pending):
+            try:
+                self.queue.put_nowait(self._pending[day])
+            except queue.Full:
+                return
+            del self._pending[day]
+
+    def publish(self, event):
+        """Queue ``event``, or coalesce it with the pending events of its day when the queue is full."""
+        with self._lock:
+            self.received += 1
+            self._flush_pending()
+            if not self._pending:
+                try:
+                    self.queue.put_nowait(event)
+                    return
+                except queue.Full:
+                    pass
+            day = pd.Timestamp(event['time']).normalize()
+            pending = self._pending.get(day)
+            if pending is None:
+                self._pending[day] = dict(event)
+            else:
+                for column in COLUMNS:
+                    pending[column] += event[column]
+                pending['time'] = max(pending['time'], event['time'])
+            self.coalesced += 1
+
+    def rebase(self, base, build):
+        """Replace the state with ``build()`` if the batch data is no longer version ``base``."""
+        if base == self.base:
+            return self.state
+        with self._drain_lock:
+            if base != self.base:
+                self.state = build()
+                self.base = base
+            return self.state
+
+    def drain(self):
+        """Fold up to ``max_batch`` queued events into the state and return how many."""
+        with self._drain_lock:
+            self.last_drain = time.monotonic()
+            events = []
+            while len(events) < self.max_batch:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if events:
+                self.state.fold(events)
+            with self._lock:
+                self._flush_pending()
+                self.folded += len(events)
+            return len(events)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'received': self.received,
+                'folded': self.folded,
+                'coalesced': self.coalesced,
+                'queued': self.queue.qsize(),
+                'pending_days': len(self._pending),
+                'late': self.state.late,
+            }
+
+
+def _produce(ref, rate, rng, idle, stopped):
+    # Publishes about ``rate`` events per second, in ticks of 50 ms, until no
+    # page drained the feed for ``idle`` seconds; only a weak reference to the
+    # feed is kept, so the thread ends with it
+    tick = 0.05
+    while not stopped.wait(tick):
+        feed = ref()
+        if feed is None or time.monotonic() - feed.last_drain > idle:
+            return
+        now = pd.Timestamp.now()
+        for _ in range(rng.poisson(rate * tick)):
+            feed.publish({
+                'time': now,
+                'ventes': 1,
+                'utilisateurs': int(rng.integers(1, 5, endpoint=True)),
+                'revenus': round(float(rng.uniform(5, 45)), 2),
+            })
+        del feed
+
+
+class SyntheticEvents:
+    """Thread publishing random sale events to a feed, in place of a real event stream.
+
+    ``start`` is called by every page that drains the feed: it starts the
+    thread if it is not running, which it stops doing ``idle`` seconds after
+    the last drain.
+    """
+
+    def __init__(self, feed, rate=LIVE_EVENTS_PER_S, seed=0, idle=LIVE_IDLE):
+        self.rate = rate
+        self.idle = idle
+        self._feed = weakref.ref(feed)
+        self._rng = np.random.default_rng(seed)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.rate > 0 and not self.running:
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=_produce, args=(self._feed, self.rate, self._rng, self.idle, self._stopped),
+                    name='dashboard-live-events', daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+
+def patch_figure(fig, changes, columns, first=None):
+    """Write the changed rows into the traces of ``fig``, in place of rebuilding it.
+
+    Trace ``k`` plots ``columns[k]`` against ``date`` (sorted): changed days
+    update their point, new days are appended and days before ``first``
+    dropped, on the numpy arrays of the traces. The figure is still sent
+    whole by ``st.plotly_chart``: the patch saves the rebuild, not the payload.
+    """
+    days = changes['date'].to_numpy(dtype='datetime64[ns]')
+    for trace, column in zip(fig.data, columns):
+        x = np.asarray(trace.x, dtype='datetime64[ns]')
+        y = np.array(trace.y, dtype=np.float64)
+        values = changes[column].to_numpy(dtype=np.float64)
+        positions = np.searchsorted(x, days)
+        found = positions < len(x)
+        found[found] = x[positions[found]] == days[found]
+        y[positions[found]] = values[found]
+        # Days the trace does not have yet come after its last one
+        x = np.concatenate([x, days[~found]])
+        y = np.concatenate([y, values[~found]])
+        if first is not None:
+            keep = np.searchsorted(x, pd.Timestamp(first).to_datetime64())
+            x, y = x[keep:], y[keep:]
+        trace.x, trace.y = x, y
+    return fig
@@ -0,0 +1,127 @@
+"""Partitioned, multi-process generation and aggregation of the marketing dataset.
+
+Every channel draws from its own random stream (``utils.streaming`` with
+``stream='marketing/<channel>'``), so a channel's rows only depend on the
+seed, the channel and the date. The work can therefore be split by channel
+groups or by date ranges across a process pool and the pieces merged back:
+the result is identical whatever the number of workers or the split.
+
+Aggregation runs inside the workers: each one returns mergeable partial sums
+(spend, impressions, clicks, conversions, row count) per period and channel
+instead of its raw rows, and the ratios (cpc, ctr, conversion_rate) are
+derived from the merged sums.
+
+Splitting by channel is the efficient choice for daily data: a date
+partition still builds whole blocks of ``BLOCK_ROWS`` days per channel.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.config import WORKERS
+from utils.data_generator import CHANNELS
+from utils.streaming import generate_range
+
+PARTITIONS = ('channel', 'date')
+
+SUM_COLUMNS = ['spend', 'impressions', 'clicks', 'conversions']
+
+# Tasks per worker when splitting by channel, to even out the load
+TASKS_PER_WORKER = 4
+
+
+def resolve_workers(workers=None):
+    """Return the number of processes to use (``DASHBOARD_WORKERS``, 0 for one per core)."""
+    workers = WORKERS if workers is None else workers
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def channel_frame(channel, start, end, seed=0):
+    """Return the daily marketing rows of ``channel`` for ``start <= date < end``."""
+    return generate_range('marketing', start, end, seed=seed, stream=f'marketing/{channel}', channels=[channel])
+
+
+def channel_partials(df, freq='D'):
+    """Aggregate marketing rows into partial sums per ``freq`` period and channel."""
+    period = df['date'].dt.to_period(freq).dt.start_time.rename('period')
+    grouped = df.groupby([period, df['channel'].rename('channel')], sort=False)
+    parts = grouped[SUM_COLUMNS].sum()
+    parts['rows'] = grouped.size()
+    return parts.reset_index()
+
+
+def merge_partials(parts, channels):
+    """Merge partial sums that may cover the same periods, ordered by period then ``channels``."""
+    merged = pd.concat(parts, ignore_index=True).groupby(['period', 'channel'], sort=False).sum().reset_index()
+    order = pd.Categorical(merged['channel'], categories=list(dict.fromkeys(channels)))
+    return merged.assign(_order=order.codes).sort_values(['period', '_order']).drop(columns='_order').reset_index(drop=True)
+
+
+def finalize(stats):
+    """Add cpc, ctr and conversion_rate computed from the summed columns."""
+    def ratio(num, den):
+        num, den = num.to_numpy(dtype=float), den.to_numpy(dtype=float)
+        return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+    return stats.assign(
+        cpc=ratio(stats['spend'], stats['clicks']),
+        ctr=ratio(stats['clicks'], stats['impressions']),
+        conversion_rate=ratio(stats['conversions'], stats['clicks']),
+    )
+
+
+def _run_task(task):
+    channels, start, end, seed, freq = task
+    frames = [channel_frame(channel, start, end, seed) for channel in channels]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return df if freq is None else channel_partials(df, freq)
+
+
+def _tasks(start, end, channels, seed, workers, by, freq):
+    if by not in PARTITIONS:
+        raise ValueError(f"Unknown partitioning {by!r}, expected one of {PARTITIONS}")
+    if by == 'channel':
+        parts = 1 if workers == 1 else min(len(channels), workers * TASKS_PER_WORKER)
+        groups = np.array_split(np.asarray(channels, dtype=object), parts)
+        return [(list(group), start, end, seed, freq) for group in groups if len(group)]
+    days = pd.date_range(pd.Timestamp(start).ceil('D'), pd.Timestamp(end), freq='D', inclusive='left')
+    edges = np.linspace(0, len(days), min(len(days), workers) + 1).round().astype(int)
+    bounds = [
+        (days[lo], days[hi] if hi < len(days) else pd.Timestamp(end))
+        for lo, hi in zip(edges[:-1], edges[1:]) if lo < hi
+    ]
+    return [(list(channels), lo, hi, seed, freq) for lo, hi in bounds]
+
+
+def _map(tasks, workers):
+    if workers == 1 or len(tasks) <= 1:
+        return [_run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(_run_task, tasks))
+
+
+def generate_marketing(start, end, channels=None, seed=0, workers=None, by='channel'):
+    """Return the marketing rows of ``channels`` for ``start <= date < end``, built in parallel.
+
+    Rows are ordered by date, then in the order of ``channels``.
+    """
+    channels = CHANNELS if channels is None else list(channels)
+    workers = resolve_workers(workers)
+    frames = _map(_tasks(start, end, channels, seed, workers, by, None), workers)
+    df = pd.concat(frames, ignore_index=True)
+    order = pd.Categorical(df['channel'], categories=list(dict.fromkeys(channels))).codes
+    return df.iloc[np.lexsort((order, df['date'].to_numpy()))].reset_index(drop=True)
+
+
+def channel_stats(start, end, channels=None, seed=0, workers=None, by='channel', freq='D'):
+    """Return spend, impressions, clicks, conversions, cpc, ctr and conversion_rate per period and channel.
+
+    The workers generate and aggregate their partition; only the partial
+    sums cross process boundaries.
+    """
+    channels = CHANNELS if channels is None else list(channels)
+    workers = resolve_workers(workers)
+    parts = _map(_tasks(start, end, channels, seed, workers, by, freq), workers)
+    return finalize(merge_partials(parts, channels))
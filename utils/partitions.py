@@ -0,0 +1,310 @@
+"""Time-partitioned storage of a time series on local disk.
+
+A ``PartitionedStore`` is a directory of Arrow IPC files (``utils.disk_cache``
+format, memory-mapped on read) and a ``manifest.json`` that lists them:
+
+- raw partitions hold the rows of one day (``granularity='D'``) or one month
+  (``'M'``), e.g. ``day=2024-05-03``;
+- rollup partitions hold the hourly partial aggregates (``bucket``,
+  ``<metric>_sum``, ``<metric>_count``, see ``utils.rollups``) of one month,
+  e.g. ``rollup=2024-05``.
+
+The manifest keeps the min/max of every numeric and time column of each
+partition. A period read only opens the partitions whose time range overlaps
+it (``partitions``), so its cost follows the length of the period, not of
+the history. ``compact`` folds the raw partitions that ended before a date
+into the monthly rollups: the history stays queryable by hour at a fraction
+of the size.
+
+Every change writes new files, then the manifest (atomically), under a lock
+shared by the processes of the host. The files it replaced are listed in the
+manifest as retired and only removed by a later change, ``RETIRE_AFTER_S``
+seconds on: a reader that listed them from the previous manifest can still
+open them. Readers see either the old or the new manifest, never a partial
+change; a read that finds a partition file missing all the same starts over
+from the current manifest, and raises rather than return part of a period.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import disk_cache
+from utils.registry import time_slice
+from utils.rollups import merge, partial_aggregates
+
+MANIFEST = 'manifest.json'
+
+# Seconds a replaced file is kept for the readers of the previous manifest
+RETIRE_AFTER_S = 60
+
+# Reads of a period started over when a partition file disappears under them
+READ_ATTEMPTS = 3
+
+# Granularity -> (partition key prefix, pandas period)
+GRANULARITIES = {'D': ('day', 'D'), 'M': ('month', 'M')}
+
+
+def _stats(frame):
+    # min/max of the time and numeric columns, as JSON values
+    stats = {}
+    for column in frame.columns:
+        values = frame[column]
+        if not len(values):
+            continue
+        if values.dtype.kind == 'M':
+            stats[column] = [values.min().isoformat(), values.max().isoformat()]
+        elif values.dtype.kind in 'iuf':
+            stats[column] = [float(values.min()), float(values.max())]
+    return stats
+
+
+class PartitionedStore:
+    """Raw day or month partitions and monthly hourly rollups of a time series, in ``root``."""
+
+    def __init__(self, root, time_col, metrics=None, granularity='D'):
+        self.root = root
+        self.time_col = time_col
+        self.metrics = list(metrics or [])
+        self.prefix, self.period = GRANULARITIES[granularity]
+        self._manifest_path = os.path.join(root, MANIFEST)
+        self._cached = (None, None)
+        self.retire_after = RETIRE_AFTER_S
+        # Partitions opened and skipped by the reads of this process
+        self.reads = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _read_manifest(self):
+        try:
+            stat = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return {'generation': 0, 'metadata': {}, 'partitions': {}}
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._cached[0] != signature:
+            with open(self._manifest_path) as handle:
+                self._cached = (signature, json.load(handle))
+        return self._cached[1]
+
+    def _commit(self, manifest, replaced):
+        # Manifest first, then the retired files past their grace period
+        os.makedirs(self.root, exist_ok=True)
+        now = time.time()
+        current = {entry['file'] for entry in manifest['partitions'].values()}
+        retired = [item for item in manifest.get('retired', []) if item[0] not in current]
+        retired += [[name, now] for name in sorted(set(replaced) - current)]
+        expired = [name for name, since in retired if now - since >= self.retire_after]
+        manifest['retired'] = [item for item in retired if item[0] not in expired]
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(manifest, handle)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self._manifest_path)
+        for name in expired:
+            try:
+                os.unlink(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def _write(self, manifest, key, level, frame, time_col):
+        name = f"{key}.{manifest['generation']}.arrow"
+        disk_cache.save_frame(os.path.join(self.root, name), frame)
+        old = manifest['partitions'].get(key)
+        manifest['partitions'][key] = {
+            'level': level,
+            'file': name,
+            'rows': len(frame),
+            'bytes': os.path.getsize(os.path.join(self.root, name)),
+            'min': frame[time_col].min().isoformat(),
+            'max': frame[time_col].max().isoformat(),
+            'stats': _stats(frame),
+        }
+        return [] if old is None else [old['file']]
+
+    def _load(self, entry):
+        path = os.path.join(self.root, entry['file'])
+        frame, _ = disk_cache.load_frame(path)
+        if frame is None:
+            raise FileNotFoundError(f"Partition file {path} is missing")
+        return frame
+
+    def _retrying(self, read):
+        # A file retired and removed between the manifest and the read: the
+        # next attempt lists the partitions of the manifest that replaced it
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                return read()
+            except FileNotFoundError:
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    @property
+    def metadata(self):
+        """Return the metadata saved with the last write (e.g. a watermark)."""
+        return self._read_manifest()['metadata']
+
+    def partitions(self, start=None, end=None, level=None):
+        """Return ``(key, entry)`` of the partitions holding rows in ``[start, end)``, in time order.
+
+        Partitions are pruned on the min/max of their time column, without
+        opening them.
+        """
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        selected, skipped = [], 0
+        for key, entry in self._read_manifest()['partitions'].items():
+            if level is not None and entry['level'] != level:
+                continue
+            if (start is not None and pd.Timestamp(entry['max']) < start) or \
+                    (end is not None and pd.Timestamp(entry['min']) >= end):
+                skipped += 1
+                continue
+            selected.append((key, entry))
+        with self._lock:
+            self.reads += len(selected)
+            self.skipped += skipped
+        return sorted(selected, key=lambda item: item[1]['min'])
+
+    def read(self, start=None, end=None, columns=None):
+        """Return the raw rows in ``[start, end)``, from the overlapping raw partitions only."""
+        return self._retrying(lambda: self._read(start, end, columns))
+
+    def _read(self, start, end, columns):
+        frames = []
+        for _, entry in self.partitions(start, end, level='raw'):
+            frame = self._load(entry)
+            frames.append(frame if columns is None else frame[[self.time_col] + list(columns)])
+        if not frames:
+            return None
+        rows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return time_slice(rows, self.time_col, start, end)
+
+    def partials(self, start=None, end=None):
+        """Return one ``bucket, <metric>_sum, <metric>_count`` row per hour of ``[start, end)``.
+
+        Rollup partitions are read as they are; raw partitions are
+        aggregated on the fly.
+        """
+        return self._retrying(lambda: self._partials(start, end))
+
+    def _partials(self, start, end):
+        start = None if start is None else pd.Timestamp(start).ceil('h')
+        raw, parts = [], []
+        for _, entry in self.partitions(start, end):
+            if entry['level'] == 'raw':
+                raw.append(self._load(entry))
+            else:
+                parts.append(time_slice(self._load(entry), 'bucket', start, end))
+        if raw:
+            rows = pd.concat(raw, ignore_index=True) if len(raw) > 1 else raw[0]
+            parts.append(partial_aggregates(time_slice(rows, self.time_col, start, end), self.metrics,
+                                            time_col=self.time_col))
+        if not parts:
+            columns = [f'{metric}_{part}' for metric in self.metrics for part in ('sum', 'count')]
+            return pd.DataFrame({'bucket': pd.Series(dtype='datetime64[ns]'),
+                                 **{column: pd.Series(dtype=np.float64) for column in columns}})
+        return merge(*parts)
+
+    def write(self, frame, metadata=None):
+        """Store the rows of ``frame`` (sorted by time) in their raw partitions.
+
+        In each partition, the rows of ``frame`` replace the stored rows
+        between its first and last times: appending new rows, filling older
+        ones and rewriting a range are the same call. Only the partitions
+        ``frame`` touches are rewritten.
+        """
+        with disk_cache.file_lock(self._manifest_path):
+            manifest = self._read_manifest()
+            manifest = {**manifest, 'partitions': dict(manifest['partitions']),
+                        'generation': manifest['generation'] + 1}
+            replaced = []
+            if len(frame):
+                keys = frame[self.time_col].dt.to_period(self.period).astype(str)
+                for period, rows in frame.groupby(keys.to_numpy(), sort=True):
+                    key = f'{self.prefix}={period}'
+                    entry = manifest['partitions'].get(key)
+                    if entry is not None:
+                        stored = self._load(entry)
+                        times = stored[self.time_col].to_numpy()
+                        i = np.searchsorted(times, rows[self.time_col].iloc[0].to_datetime64(), side='left')
+                        j = np.searchsorted(times, rows[self.time_col].iloc[-1].to_datetime64(), side='right')
+                        rows = pd.concat([stored.iloc[:i], rows, stored.iloc[j:]], ignore_index=True)
+                    replaced += self._write(manifest, key, 'raw', rows.reset_index(drop=True), self.time_col)
+            manifest['metadata'] = {**manifest['metadata'], **(metadata or {})}
+            self._commit(manifest, replaced)
+
+    def update_metadata(self, metadata):
+        """Merge ``metadata`` into the metadata of the manifest."""
+        self.write(pd.DataFrame({self.time_col: pd.Series(dtype='datetime64[ns]')}), metadata)
+
+    def write_partials(self, parts, metadata=None):
+        """Merge hourly partial aggregates into the monthly rollup partitions."""
+        with disk_cache.file_lock(self._manifest_path):
+            manifest = self._read_manifest()
+            manifest = {**manifest, 'partitions': dict(manifest['partitions']),
+                        'generation': manifest['generation'] + 1}
+            replaced = self._merge_partials(manifest, parts)
+            manifest['metadata'] = {**manifest['metadata'], **(metadata or {})}
+            self._commit(manifest, replaced)
+
+    def _merge_partials(self, manifest, parts):
+        replaced = []
+        if not len(parts):
+            return replaced
+        months = parts['bucket'].dt.to_period('M').astype(str)
+        for month, rows in parts.groupby(months.to_numpy(), sort=True):
+            key = f'rollup={month}'
+            entry = manifest['partitions'].get(key)
+            if entry is not None:
+                rows = merge(self._load(entry), rows)
+            replaced += self._write(manifest, key, 'rollup', rows.reset_index(drop=True), 'bucket')
+        return replaced
+
+    def compact(self, before):
+        """Fold the raw partitions whose rows all precede ``before`` into the monthly rollups."""
+        before = pd.Timestamp(before)
+        with disk_cache.file_lock(self._manifest_path):
+            manifest = self._read_manifest()
+            old = [
+                (key, entry) for key, entry in manifest['partitions'].items()
+                if entry['level'] == 'raw' and pd.Timestamp(entry['max']) < before
+            ]
+            if not old:
+                return 0
+            manifest = {**manifest, 'partitions': dict(manifest['partitions']),
+                        'generation': manifest['generation'] + 1}
+            rows = pd.concat([self._load(entry) for _, entry in old], ignore_index=True)
+            replaced = self._merge_partials(
+                manifest, partial_aggregates(rows, self.metrics, time_col=self.time_col)
+            )
+            for key, entry in old:
+                del manifest['partitions'][key]
+                replaced.append(entry['file'])
+            self._commit(manifest, replaced)
+            return len(old)
+
+    def drop_before(self, before):
+        """Remove the partitions whose rows all precede ``before``."""
+        before = pd.Timestamp(before)
+        with disk_cache.file_lock(self._manifest_path):
+            manifest = self._read_manifest()
+            old = [key for key, entry in manifest['partitions'].items() if pd.Timestamp(entry['max']) < before]
+            if not old:
+                return 0
+            manifest = {**manifest, 'partitions': dict(manifest['partitions']),
+                        'generation': manifest['generation'] + 1}
+            replaced = [manifest['partitions'].pop(key)['file'] for key in old]
+            self._commit(manifest, replaced)
+            return len(old)
+
+    def entries(self):
+        """Return ``(key, level, rows, bytes, min, max)`` tuples, in time order."""
+        items = sorted(self._read_manifest()['partitions'].items(), key=lambda item: item[1]['min'])
+        return [
+            (key, entry['level'], entry['rows'], entry['bytes'], entry['min'], entry['max'])
+            for key, entry in items
+        ]
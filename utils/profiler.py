@@ -0,0 +1,173 @@
+"""Optional render-time profiler for the dashboard pages.
+
+Each page run opens a ``PageRun`` and wraps its named sections (data, metrics,
+each chart, the heatmap, the table) in ``run.section(name)``. Charts go
+through ``run.plotly_chart(name, fig)``, which also times the
+``st.plotly_chart`` call and keeps the figure: the size of its JSON payload
+is measured when the run is recorded, after its total time is taken, so the
+extra serialization adds to no section. Finished runs are
+kept in a per-process history (p50/p95 in the sidebar) and, when
+``DASHBOARD_PROFILE_LOG`` is set, appended to that JSONL file.
+
+Profiling is off unless ``DASHBOARD_PROFILE=1`` or the sidebar toggle is on;
+disabled runs only forward the calls. Fragments rerun on their own, so they
+record their own runs under ``<page>/<fragment>``.
+
+The first run of each page in the process is timed whatever the toggle and
+added to the startup timeline (``utils.startup``).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils import startup
+
+PROFILE_DEFAULT = os.environ.get('DASHBOARD_PROFILE', '') not in ('', '0', 'false')
+PROFILE_LOG = os.environ.get('DASHBOARD_PROFILE_LOG')
+
+HISTORY_SIZE = 50
+
+# page -> recent finished runs, shared by every session of the process
+_history = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+_lock = threading.Lock()
+
+
+class PageRun:
+    """Timings and chart payload sizes of one run of a page."""
+
+    def __init__(self, page, enabled, first=False):
+        self.page = page
+        self.enabled = enabled
+        # First render of the page in the process: timed for the startup timeline
+        self.first = first
+        self.sections = {}
+        # Offset of each section's first start from the start of the run
+        self.starts = {}
+        self.payload_bytes = {}
+        # Charts sent, serialized for their payload size by record()
+        self._figures = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def section(self, name):
+        if not (self.enabled or self.first):
+            yield
+            return
+        start = time.perf_counter()
+        self.starts.setdefault(name, start - self._start)
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - start
+
+    def plotly_chart(self, name, fig, **kwargs):
+        """Send ``fig`` with ``st.plotly_chart``, timing the call; its payload size is measured by ``record``."""
+        with self.section(f'{name}/send'):
+            element = st.plotly_chart(fig, **kwargs)
+        if self.enabled:
+            self._figures[name] = fig
+        return element
+
+    def record(self):
+        """Return the run as a JSON-serializable dict."""
+        total = time.perf_counter() - self._start
+        if self._figures:
+            import plotly.io as pio
+
+            # Same serialization as st.plotly_chart, outside the timings
+            for name, fig in self._figures.items():
+                self.payload_bytes[name] = len(pio.to_json(fig, validate=False).encode())
+            self._figures.clear()
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'page': self.page,
+            'total_s': total,
+            'sections_s': dict(self.sections),
+            'payload_bytes': dict(self.payload_bytes),
+        }
+
+    def finish(self):
+        """Store the run in the history and in the JSONL log."""
+        if not (self.enabled or self.first):
+            return None
+        record = self.record()
+        if self.first:
+            startup.record_render(self.page, record, self.starts)
+        if not self.enabled:
+            return record
+        with _lock:
+            _history[self.page].append(record)
+            if PROFILE_LOG:
+                with open(PROFILE_LOG, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps(record) + '\n')
+        return record
+
+
+def start_run(page):
+    """Open a run of ``page``, enabled by the sidebar toggle."""
+    enabled = st.sidebar.toggle("⏱️ Profilage", value=PROFILE_DEFAULT, key='profiler_enabled')
+    return PageRun(page, enabled, first=startup.first_render(page))
+
+
+def start_fragment_run(page, fragment):
+    """Open a run of a fragment of ``page``, recorded under ``<page>/<fragment>``."""
+    enabled = st.session_state.get('profiler_enabled', PROFILE_DEFAULT)
+    return PageRun(f'{page}/{fragment}', enabled)
+
+
+def summary(page):
+    """Return p50/p95 per section over the recent runs of ``page`` and of its fragments."""
+    with _lock:
+        histories = {
+            name: list(runs) for name, runs in _history.items()
+            if name == page or name.startswith(page + '/')
+        }
+    timings = defaultdict(list)
+    payloads = defaultdict(list)
+    for name, runs in histories.items():
+        prefix = '' if name == page else name.split('/', 1)[1] + ' · '
+        for run in runs:
+            timings[prefix + 'total'].append(run['total_s'])
+            for section, seconds in run['sections_s'].items():
+                timings[prefix + section].append(seconds)
+            for chart, size in run['payload_bytes'].items():
+                payloads[prefix + chart].append(size)
+    run_count = len(histories.get(page, []))
+
+    rows = []
+    for name, values in timings.items():
+        rows.append({
+            'section': name,
+            'p50 (ms)': np.percentile(values, 50) * 1e3,
+            'p95 (ms)': np.percentile(values, 95) * 1e3,
+            'payload (Ko)': np.mean(payloads[name]) / 1024 if name in payloads else None,
+        })
+    return pd.DataFrame(rows), run_count
+
+
+def render_sidebar_summary(run):
+    """Show the profiling summary of ``run.page`` in the sidebar."""
+    if not run.enabled:
+        return
+    table, run_count = summary(run.page)
+    with st.sidebar.expander(f"⏱️ Profilage ({run_count} exécutions)", expanded=True):
+        st.dataframe(
+            table,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "p50 (ms)": st.column_config.NumberColumn(format="%.1f"),
+                "p95 (ms)": st.column_config.NumberColumn(format="%.1f"),
+                "payload (Ko)": st.column_config.NumberColumn(format="%.1f"),
+            }
+        )
+        if PROFILE_LOG:
+            st.caption(f"Journal : `{PROFILE_LOG}`")
@@ -0,0 +1,186 @@
+"""Background refresh of the datasets, with stale-while-revalidate reads.
+
+A ``Refresher`` owns a daemon thread that re-runs each watched job (usually
+``source.refresh(dataset)``) every ``interval`` seconds. Readers call
+``get(key)`` and always receive the last value a job produced, so no session
+waits for a refresh; only the very first read of a key computes it inline.
+
+Every computation goes through a ``SingleFlight``: callers asking for a key
+that is already being computed wait for that computation and share its
+result instead of starting their own.
+"""
+import logging
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent computations of the same key."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``fn()``, or the result of the computation of ``key`` already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class _Job:
+    def __init__(self, fn):
+        self.fn = fn
+        self.value = None
+        self.ready = False
+        self.updated = None
+        self.duration = None
+        self.error = None
+        self.next_run = 0.0
+
+
+def _loop(ref):
+    # Only a weak reference is kept between iterations, so a refresher that is
+    # no longer used (e.g. after st.cache_resource.clear()) stops its thread
+    while True:
+        refresher = ref()
+        if refresher is None or refresher._stopped.is_set():
+            return
+        delay = refresher._run_due()
+        wakeup = refresher._wakeup
+        del refresher
+        wakeup.wait(delay)
+        wakeup.clear()
+
+
+class Refresher:
+    """Daemon thread re-running the watched jobs every ``interval`` seconds."""
+
+    def __init__(self, interval, name='dashboard-refresher'):
+        self.interval = interval
+        self.name = name
+        self._jobs = {}
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, key, fn):
+        """Refresh ``key`` with ``fn()`` on the schedule.
+
+        The first refresh is due one interval from now: until then the job is
+        only computed by its first ``get``, so that a new process does not
+        load every dataset in the background while it renders its first page.
+        """
+        job = _Job(fn)
+        job.next_run = time.monotonic() + self.interval
+        with self._lock:
+            self._jobs[key] = job
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=_loop, args=(weakref.ref(self),), name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _refresh(self, key, job):
+        def run():
+            start = time.perf_counter()
+            try:
+                value = job.fn()
+            except Exception as error:
+                # Keep serving the last good value
+                job.error = repr(error)
+                logger.exception("Refresh of %r failed", key)
+                raise
+            job.value, job.ready, job.error = value, True, None
+            job.updated = time.time()
+            job.duration = time.perf_counter() - start
+            return value
+
+        try:
+            return self._flight.do(key, run)
+        finally:
+            job.next_run = time.monotonic() + self.interval
+
+    def _run_due(self):
+        with self._lock:
+            jobs = list(self._jobs.items())
+        for key, job in jobs:
+            if job.next_run <= time.monotonic() and not self._stopped.is_set():
+                try:
+                    self._refresh(key, job)
+                except Exception:
+                    pass
+        if not jobs:
+            return self.interval
+        return max(0.0, min(job.next_run for _, job in jobs) - time.monotonic())
+
+    def get(self, key):
+        """Return the last value of ``key``, computing it inline only the first time."""
+        job = self._jobs[key]
+        if job.ready:
+            return job.value
+        return self._refresh(key, job)
+
+    def refresh_now(self, key=None):
+        """Schedule ``key`` (every job by default) for the next iteration of the thread."""
+        with self._lock:
+            for job_key, job in self._jobs.items():
+                if key is None or job_key == key:
+                    job.next_run = 0.0
+        self._wakeup.set()
+
+    def status(self):
+        """Return one row per job: last value, refresh time and duration, last error."""
+        with self._lock:
+            jobs = list(self._jobs.items())
+        return [
+            {
+                'key': key,
+                'value': job.value,
+                'updated': job.updated,
+                'duration_s': job.duration,
+                'next_in_s': max(0.0, job.next_run - time.monotonic()),
+                'running': self._flight.in_flight(key),
+                'error': job.error,
+            }
+            for key, job in jobs
+        ]
@@ -0,0 +1,36 @@
+"""Per-country and per-province tables of the Geographic page, rolled up from the spatial grid.
+
+Shared by the page and the batch reports (``utils.reports``), so both show
+the same figures.
+"""
+from utils.data_generator import COUNTRIES, PROVINCES
+
+# Columns of the top-N tables of the Geographic page
+TOP_COLUMNS = {
+    'visitors': ['country', 'visitors', 'revenue'],
+    'revenue': ['country', 'revenue', 'conversion_rate'],
+}
+
+COUNTRY_NAMES = {country['code']: country['country'] for country in COUNTRIES}
+PROVINCE_NAMES = {province['code']: province['province'] for province in PROVINCES}
+
+
+def with_conversion_rate(df):
+    """Add the conversion rate (%) of the summed visitors and conversions of ``df``."""
+    return df.assign(conversion_rate=100 * df['conversions'] / df['visitors'])
+
+
+def country_regions(grid):
+    """Return ``country, code, points, <metrics>, conversion_rate`` per country of ``grid``."""
+    countries = grid.by_region('country_code').rename(columns={'country_code': 'code'})
+    countries['code'] = countries['code'].astype(str)
+    countries.insert(0, 'country', countries['code'].map(COUNTRY_NAMES))
+    return with_conversion_rate(countries)
+
+
+def province_regions(grid):
+    """Return ``province, code, points, <metrics>`` per Canadian province of ``grid``."""
+    provinces = grid.by_region('province_code', country_code='CAN').rename(columns={'province_code': 'code'})
+    provinces['code'] = provinces['code'].astype(str)
+    provinces.insert(0, 'province', provinces['code'].map(PROVINCE_NAMES))
+    return provinces
@@ -0,0 +1,136 @@
+"""Shared read-only datasets, handed to sessions as views.
+
+``DatasetRegistry`` keeps one ``SharedDataset`` per dataset: the rows of its
+current version, loaded once for the whole process and sorted by time.
+Sessions never filter or sort a copy of it:
+
+- a period is a range of positions found by binary search in the time
+  column, and ``period``/``tail`` return the rows in that range as a slice,
+  which shares the memory of the dataset;
+- sort orders are index arrays computed once per column; ``top`` and
+  ``sorted`` only take the rows they return.
+
+With pandas copy-on-write, a session that writes to its view gets its own
+copy of the touched columns: the shared rows cannot change under other
+sessions. Copy-on-write is the default from pandas 3 and is turned on at
+import on pandas 2, where without it every slice would be a copy. A new
+version replaces the previous one, which is freed once the last view of it
+is gone.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.refresher import SingleFlight
+
+if int(pd.__version__.split('.')[0]) < 3:
+    # Slices share the rows of the dataset only with copy-on-write
+    pd.set_option('mode.copy_on_write', True)
+
+
+def time_slice(frame, time_col, start=None, end=None):
+    """Return the rows of ``frame`` (sorted by ``time_col``) in ``[start, end)``, without copying them."""
+    times = frame[time_col].to_numpy()
+    i = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start).to_datetime64(), side='left'))
+    j = len(times) if end is None else int(np.searchsorted(times, pd.Timestamp(end).to_datetime64(), side='left'))
+    return frame.iloc[i:j].reset_index(drop=True)
+
+
+class SharedDataset:
+    """Read-only rows of a dataset, sorted by time, and their sort orders."""
+
+    def __init__(self, frame, time_col=None):
+        if time_col is not None and not frame[time_col].is_monotonic_increasing:
+            frame = frame.sort_values(time_col, kind='stable')
+        self.frame = frame.reset_index(drop=True)
+        self.time_col = time_col
+        # column -> ascending positions, built on first use
+        self._orders = {}
+        self._lock = threading.Lock()
+        # Reads served (period, tail, take), for the Diagnostics page
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __sizeof__(self):
+        return int(self.frame.memory_usage(deep=True).sum()) + sum(order.nbytes for order in self._orders.values())
+
+    def _served(self):
+        with self._calls_lock:
+            self.calls += 1
+
+    def period(self, start=None, end=None):
+        """Return the rows in ``[start, end)`` as a view."""
+        self._served()
+        return time_slice(self.frame, self.time_col, start, end)
+
+    def tail(self, n):
+        """Return the last ``n`` rows as a view."""
+        self._served()
+        return self.frame.iloc[max(len(self.frame) - n, 0):].reset_index(drop=True)
+
+    def order(self, column):
+        """Return the positions of the rows by ascending ``column`` (stable, read-only)."""
+        order = self._orders.get(column)
+        if order is None:
+            with self._lock:
+                order = self._orders.get(column)
+                if order is None:
+                    order = np.argsort(self.frame[column].to_numpy(), kind='stable')
+                    order.flags.writeable = False
+                    self._orders[column] = order
+        return order
+
+    def take(self, ids, columns=None):
+        """Return the rows at positions ``ids``, in that order."""
+        self._served()
+        rows = self.frame if columns is None else self.frame[list(columns)]
+        return rows.take(ids).reset_index(drop=True)
+
+    def sorted(self, by, ascending=True, columns=None):
+        """Return the rows sorted by ``by``."""
+        order = self.order(by)
+        return self.take(order if ascending else order[::-1], columns)
+
+    def top(self, n, by, columns=None):
+        """Return the ``n`` rows with the largest ``by``, largest first."""
+        order = self.order(by)
+        return self.take(order[::-1][:n], columns)
+
+
+class DatasetRegistry:
+    """The current version of each dataset, shared by every session of the process."""
+
+    def __init__(self):
+        # dataset -> (version, SharedDataset)
+        self._datasets = {}
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def get(self, dataset, version, load, time_col=None):
+        """Return the ``SharedDataset`` of ``dataset`` at ``version``, loading its rows with ``load()`` once."""
+        entry = self._datasets.get(dataset)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return self._flight.do((dataset, version), lambda: self._load(dataset, version, load, time_col))
+
+    def _load(self, dataset, version, load, time_col):
+        entry = self._datasets.get(dataset)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        shared = SharedDataset(load(), time_col)
+        with self._lock:
+            self._datasets[dataset] = (version, shared)
+        return shared
+
+    def entries(self):
+        """Return ``(dataset, version, rows, bytes, sort orders, reads served)`` tuples."""
+        with self._lock:
+            items = list(self._datasets.items())
+        return [
+            (dataset, version, len(shared), shared.__sizeof__(), len(shared._orders), shared.calls)
+            for dataset, (version, shared) in items
+        ]
@@ -0,0 +1,281 @@
+"""Headless batch export of the dashboard's numbers, one report per tenant.
+
+A report holds the tables the pages show, built with the same code:
+
+- ``kpis``: the key metrics of the Analytics page over the period and the
+  period before it (``KpiEngine``, ``ANALYTICS_KPIS``);
+- ``daily_traffic`` and ``heatmap``: daily traffic and the hour x weekday
+  matrix (``Rollup``);
+- ``top_visitors``, ``top_revenue`` and ``provinces``: the country and
+  province figures of the Geographic page, rolled up from the spatial grid
+  (``SpatialGrid``, ``utils.regions``).
+
+Every tenant has its own random streams (``utils.streaming``, like the
+marketing channels of ``utils.marketing``). Its hourly partial aggregates
+and grid cells are kept in the disk cache, so a second export of the same
+period (another format, a failed night) reads the aggregates instead of
+generating the rows again.
+
+Tenants run in parallel on a process pool. Each worker writes the files of
+its tenant (CSV, Parquet, static HTML) straight to disk and only returns its
+timings: the parent never holds more than one line per tenant, which it
+appends to ``index.csv`` as the reports come in. A tenant that fails gets its
+error in the index instead of stopping the batch.
+
+    python -m utils.reports out/ --tenants 1000 --formats csv parquet html
+"""
+import argparse
+import csv
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import disk_cache
+from utils.config import ANALYTICS_FREQ, GEO_COUNTRIES, SEED
+from utils.data_generator import COUNTRIES, generate_point_data
+from utils.data_sources import GRID_KEYS, SCHEMAS
+from utils.kpis import ANALYTICS_KPIS, KpiEngine
+from utils.marketing import resolve_workers
+from utils.regions import TOP_COLUMNS, country_regions, province_regions
+from utils.registry import SharedDataset, time_slice
+from utils.rollups import Rollup, partial_aggregates
+from utils.schemas import compact
+from utils.spatial import SpatialGrid, grid_partials
+from utils.streaming import generate_range
+
+FORMATS = ('csv', 'parquet', 'html')
+
+ANALYTICS_METRICS = SCHEMAS['analytics'][1]
+GEO_KEYS = GRID_KEYS['geo_points']
+GEO_METRICS = SCHEMAS['geo_points'][1]
+
+# Grid level of the reports: only the per-region sums are exported
+REPORT_GRID_LEVEL = 0
+
+# Locations per tenant, far fewer than the dashboard's own map (GEO_POINTS)
+DEFAULT_POINTS = 20_000
+
+# Tenants handed to a worker at a time
+CHUNK_TENANTS = 8
+
+def report_period(days, end=None):
+    """Return the ``(start, end)`` of a report over the ``days`` whole days before ``end`` (today)."""
+    end = pd.Timestamp(end or pd.Timestamp.now()).normalize()
+    return end - pd.Timedelta(days=days), end
+
+
+def tenant_partials(tenant, start, end, freq=ANALYTICS_FREQ, seed=SEED, cache_dir=None):
+    """Return the hourly partial aggregates of the analytics of ``tenant`` in ``[start, end)``."""
+    def build():
+        rows = generate_range('analytics', start, end, seed=seed, freq=freq, stream=f'analytics/tenant-{tenant}')
+        return partial_aggregates(compact('analytics', rows), ANALYTICS_METRICS)
+
+    params = {'tenant': tenant, 'start': start, 'end': end, 'freq': freq, 'seed': seed}
+    return disk_cache.cached_frame('report_partials', params, build, cache_dir)
+
+
+def tenant_grid(tenant, day, points=DEFAULT_POINTS, countries=GEO_COUNTRIES, seed=SEED, cache_dir=None):
+    """Return the grid cells (``grid_partials``) of the locations of ``tenant`` on ``day``."""
+    def build():
+        rows = generate_point_data(COUNTRIES[:countries], points, rng=[seed, tenant, day.toordinal()])
+        return grid_partials(compact('geo_points', rows), GEO_KEYS, GEO_METRICS, REPORT_GRID_LEVEL)
+
+    params = {'tenant': tenant, 'day': day, 'points': points, 'countries': countries, 'seed': seed}
+    return disk_cache.cached_frame('report_grid', params, build, cache_dir)
+
+
+def report_tables(parts, cells, start, end, top=5):
+    """Return ``{name: DataFrame}``: the tables of one report.
+
+    ``parts`` covers ``[start - (end - start), end)``, so that the key
+    metrics are compared with the period before.
+    """
+    kpis = KpiEngine.from_partials(parts, ANALYTICS_METRICS).compare(start, end, ANALYTICS_KPIS)
+    rollup = Rollup(time_slice(parts, 'bucket', start), ANALYTICS_METRICS)
+    grid = SpatialGrid.from_partials(cells, GEO_METRICS, REPORT_GRID_LEVEL)
+    countries = SharedDataset(country_regions(grid))
+    provinces = province_regions(grid)
+    heatmap = rollup.heatmap(start, 'traffic', how='mean')
+    heatmap.columns = heatmap.columns.astype(str)
+    return {
+        'kpis': pd.DataFrame([
+            {'metric': metric, 'aggregate': ANALYTICS_KPIS[metric], **kpis[metric]} for metric in ANALYTICS_KPIS
+        ]),
+        'daily_traffic': rollup.by_date(start, 'traffic', how='sum'),
+        'heatmap': heatmap.reset_index(),
+        'top_visitors': countries.top(top, 'visitors', TOP_COLUMNS['visitors']),
+        'top_revenue': countries.top(top, 'revenue', TOP_COLUMNS['revenue']),
+        'provinces': provinces.assign(share=provinces['visitors'] / provinces['visitors'].sum())
+                              [['province', 'code', 'visitors', 'share']]
+                              .sort_values('visitors', ascending=False, ignore_index=True),
+    }
+
+
+def _write_csv(tables, directory, title):
+    paths = []
+    for name, table in tables.items():
+        paths.append(os.path.join(directory, f'{name}.csv'))
+        table.to_csv(paths[-1], index=False)
+    return paths
+
+
+def _write_parquet(tables, directory, title):
+    paths = []
+    for name, table in tables.items():
+        paths.append(os.path.join(directory, f'{name}.parquet'))
+        table.to_parquet(paths[-1], index=False)
+    return paths
+
+
+def _write_html(tables, directory, title):
+    path = os.path.join(directory, 'report.html')
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write(
+            '<!DOCTYPE html>\n<html lang="fr"><head><meta charset="utf-8">'
+            f'<title>{html.escape(title)}</title><style>'
+            'body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}'
+            'td,th{border:1px solid #ddd;padding:4px 8px;text-align:right}</style></head><body>\n'
+            f'<h1>{html.escape(title)}</h1>\n'
+        )
+        for name, table in tables.items():
+            handle.write(f'<h2>{html.escape(name)}</h2>\n')
+            handle.write(table.to_html(index=False, na_rep='–', float_format=lambda value: f'{value:,.2f}'))
+            handle.write('\n')
+        handle.write('</body></html>\n')
+    return [path]
+
+
+WRITERS = {'csv': _write_csv, 'parquet': _write_parquet, 'html': _write_html}
+
+
+def run_tenant(task):
+    """Build and write the report of one tenant; return ``(tenant, bytes, {stage: seconds}, error)``.
+
+    ``error`` is empty for a written report, else the exception that stopped
+    it: the timings then cover the stages it finished.
+    """
+    tenant, start, end, options = task
+    timings = {}
+    clock = time.perf_counter()
+    size = 0
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = now - clock
+        clock = now
+
+    try:
+        parts = tenant_partials(tenant, start - (end - start), end, options['freq'], options['seed'],
+                                options['cache_dir'])
+        cells = tenant_grid(tenant, (end - pd.Timedelta(days=1)).date(), options['points'],
+                            options['countries'], options['seed'], options['cache_dir'])
+        lap('aggregates')
+        tables = report_tables(parts, cells, start, end, options['top'])
+        lap('tables')
+        directory = os.path.join(options['output_dir'], f'tenant-{tenant:06d}')
+        os.makedirs(directory, exist_ok=True)
+        title = f"Rapport du locataire {tenant} – {start:%d/%m/%Y} au {end - pd.Timedelta(days=1):%d/%m/%Y}"
+        for name in options['formats']:
+            size += sum(os.path.getsize(path) for path in WRITERS[name](tables, directory, title))
+            lap(name)
+    except Exception as exc:
+        # Reported in the index; the other tenants go on
+        return tenant, size, timings, f'{type(exc).__name__}: {exc}'
+    return tenant, size, timings, ''
+
+
+def run_reports(output_dir, tenants, days=30, formats=FORMATS, workers=None, end=None, points=DEFAULT_POINTS,
+                countries=GEO_COUNTRIES, top=5, freq=ANALYTICS_FREQ, seed=SEED, cache_dir=None):
+    """Write the reports of ``tenants`` to ``output_dir``; return the run summary.
+
+    The summary holds the number of reports, failed reports, bytes
+    written, wall time, reports per second and ``{stage: [seconds per
+    tenant]}``. ``index.csv`` has one line per tenant, with its error if it
+    failed.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown formats {sorted(unknown)}, expected some of {FORMATS}")
+    start, end = report_period(days, end)
+    workers = resolve_workers(workers)
+    options = {
+        'output_dir': output_dir, 'formats': list(formats), 'points': points, 'countries': countries,
+        'top': top, 'freq': freq, 'seed': seed,
+        'cache_dir': cache_dir or os.path.join(disk_cache.CACHE_DIR, 'reports'),
+    }
+    tasks = [(tenant, start, end, options) for tenant in tenants]
+    os.makedirs(output_dir, exist_ok=True)
+
+    stages = {}
+    total_bytes = 0
+    failures = 0
+    columns = ['aggregates', 'tables'] + list(formats)
+    began = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(tasks) > 1 else None
+    try:
+        results = pool.map(run_tenant, tasks, chunksize=CHUNK_TENANTS) if pool else map(run_tenant, tasks)
+        with open(os.path.join(output_dir, 'index.csv'), 'w', newline='') as index:
+            writer = csv.writer(index)
+            writer.writerow(['tenant', 'bytes'] + columns + ['error'])
+            for tenant, size, timings, error in results:
+                total_bytes += size
+                failures += bool(error)
+                for stage, seconds in timings.items():
+                    stages.setdefault(stage, []).append(seconds)
+                writer.writerow(
+                    [tenant, size] + [f'{timings[stage]:.6f}' if stage in timings else '' for stage in columns]
+                    + [error]
+                )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - began
+    return {
+        'reports': len(tasks),
+        'failures': failures,
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'per_second': len(tasks) / elapsed if elapsed else float('inf'),
+        'workers': workers,
+        'stages': stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the dashboard's numbers of many tenants, in parallel.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--tenants', type=int, default=100, help="number of tenants (0 to N-1)")
+    parser.add_argument('--first', type=int, default=0, help="first tenant id")
+    parser.add_argument('--days', type=int, default=30, help="period of the reports, in whole days up to today")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--workers', type=int, default=None, help="processes (DASHBOARD_WORKERS, 0 for one per core)")
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS, help="locations per tenant")
+    parser.add_argument('--top', type=int, default=5, help="countries in the top tables")
+    args = parser.parse_args()
+
+    summary = run_reports(
+        args.output_dir, range(args.first, args.first + args.tenants), days=args.days, formats=args.formats,
+        workers=args.workers, points=args.points, top=args.top
+    )
+    print(f"{summary['reports']:,} rapports en {summary['seconds']:.1f} s avec {summary['workers']} processus : "
+          f"{summary['per_second']:.1f} rapports/s, {summary['bytes'] / 2**20:.1f} Mo écrits")
+    if summary['failures']:
+        print(f"{summary['failures']:,} rapports en échec : voir la colonne error de "
+              f"{os.path.join(args.output_dir, 'index.csv')}")
+    print(f"{'étape':<12}{'total (s)':>11}{'moyenne (ms)':>14}{'p95 (ms)':>10}{'part':>7}")
+    busy = sum(sum(seconds) for seconds in summary['stages'].values())
+    for stage, seconds in summary['stages'].items():
+        seconds = np.asarray(seconds)
+        print(f"{stage:<12}{seconds.sum():>11.2f}{seconds.mean() * 1e3:>14.1f}"
+              f"{np.percentile(seconds, 95) * 1e3:>10.1f}{seconds.sum() / busy:>7.0%}")
+    if summary['failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
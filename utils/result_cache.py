@@ -0,0 +1,204 @@
+"""Process-wide cache of derived results, bounded in bytes.
+
+Filtered frames, aggregates and built figures are kept once per process and
+shared by every session, keyed by a name and the inputs they were built from
+(data version, period, metric...). The cache holds at most ``max_bytes``
+(estimated with ``sizeof``): inserting past the budget evicts the least
+recently used entries. An entry older than its TTL is still served while it
+is rebuilt in the background, and concurrent misses on a key share a single
+build; ``background_result`` returns at once and leaves the build to a
+background thread. Hits, misses, evictions and expirations are counted for
+the Diagnostics page.
+
+Cached values are shared between sessions: treat them as read-only. Builders
+may run on a background thread, so they must not call Streamlit.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils.config import RESULT_CACHE_MB, RESULT_CACHE_TTL
+from utils.refresher import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def sizeof(value):
+    """Return an estimate of the memory held by ``value``, in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pa.Table, pa.RecordBatch, pa.Array, pa.ChunkedArray)):
+        return value.nbytes
+    if hasattr(value, 'to_plotly_json'):
+        return sizeof(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    def __init__(self, value, size, ttl):
+        self.value = value
+        self.size = size
+        self.created = time.monotonic()
+        self.expires = self.created + ttl if ttl else None
+        self.hits = 0
+
+
+class ResultCache:
+    """LRU cache with a byte budget and a per-entry TTL, safe to share between threads."""
+
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._flight = SingleFlight()
+        # Keys rebuilt by a background thread
+        self._rebuilding = set()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def put(self, key, value, ttl=None):
+        """Store ``value`` under ``key``, evicting least recently used entries past the budget."""
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, size, self.ttl if ttl is None else ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def _hit(self, key, entry, build, ttl):
+        # Under the lock: an expired entry starts one background rebuild
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        if entry.expires is not None and entry.expires <= time.monotonic() and self._start_rebuild(key, build, ttl):
+            self.expirations += 1
+
+    def _start_rebuild(self, key, build, ttl):
+        # Under the lock, so that the readers of an expired entry start a single thread
+        if key in self._rebuilding or self._flight.in_flight(key):
+            return False
+        self._rebuilding.add(key)
+        threading.Thread(target=self._revalidate, args=(key, build, ttl), daemon=True).start()
+        return True
+
+    def get_or_build(self, key, build, ttl=None):
+        """Return the cached value of ``key``, calling ``build()`` on a miss.
+
+        Concurrent misses on the same key wait for a single ``build()``. An
+        expired entry is still returned while a background thread rebuilds it
+        (stale-while-revalidate).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._hit(key, entry, build, ttl)
+        if entry is None:
+            return self._flight.do(key, lambda: self.put(key, build(), ttl))
+        return entry.value
+
+    def get_or_start(self, key, build, ttl=None):
+        """Return the cached value of ``key``, or None after starting ``build()`` on a background thread.
+
+        Callers that have something to show meanwhile (e.g. an estimate) ask
+        again later; concurrent callers share a single build. Expired entries
+        are handled as in ``get_or_build``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                self._start_rebuild(key, build, ttl)
+            else:
+                self._hit(key, entry, build, ttl)
+        return None if entry is None else entry.value
+
+    def _revalidate(self, key, build, ttl):
+        try:
+            self._flight.do(key, lambda: self.put(key, build(), ttl))
+        except Exception:
+            # The stale value stays in place; the next access tries again
+            logger.exception("Rebuild of %r failed", key)
+        finally:
+            with self._lock:
+                self._rebuilding.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the counters and the current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def entries(self):
+        """Return one row per entry, from least to most recently used."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    'key': key,
+                    'bytes': entry.size,
+                    'age_s': now - entry.created,
+                    'ttl_s': None if entry.expires is None else entry.expires - now,
+                    'hits': entry.hits,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+
+@st.cache_resource
+def get_result_cache():
+    """Return the result cache of the process (``DASHBOARD_RESULT_CACHE_MB``, ``DASHBOARD_RESULT_CACHE_TTL``)."""
+    return ResultCache(RESULT_CACHE_MB * 2**20, ttl=RESULT_CACHE_TTL)
+
+
+def cached_result(name, deps, build, ttl=None):
+    """Return ``build()`` for ``name``, shared by every session while ``deps`` are unchanged."""
+    return get_result_cache().get_or_build((name, deps), build, ttl)
+
+
+def background_result(name, deps, build, ttl=None):
+    """Return ``build()`` for ``name`` if it is cached, else None while it is built in the background."""
+    return get_result_cache().get_or_start((name, deps), build, ttl)
@@ -0,0 +1,120 @@
+"""Pre-aggregated rollups of time-series data.
+
+A rollup keeps mergeable partial aggregates (``<metric>_sum`` and
+``<metric>_count``) per time bucket, at hour and day granularity. Period
+queries read the daily rollup for whole days and the hourly rollup for the
+first, partial day, and means are always ``sum / count`` of the merged
+partials, so they match a scan of the raw rows exactly.
+"""
+import pandas as pd
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def partial_aggregates(df, metrics, time_col='datetime', freq='h'):
+    """Aggregate ``df`` into one row of sums and counts per ``freq`` bucket."""
+    bucket = df[time_col].dt.floor(freq).rename('bucket')
+    grouped = df.groupby(bucket, sort=True)[list(metrics)]
+    # Compact float32 columns are summed into float64 partials
+    sums = grouped.sum().astype({m: 'float64' for m in metrics if df[m].dtype.kind == 'f'})
+    parts = pd.concat([sums.add_suffix('_sum'), grouped.count().add_suffix('_count')], axis=1)
+    return parts.reset_index()
+
+
+def merge(*rollups):
+    """Merge partial aggregates that may cover overlapping buckets."""
+    combined = pd.concat(rollups, ignore_index=True)
+    return combined.groupby('bucket', sort=True).sum().reset_index()
+
+
+def _with_calendar(cube):
+    cube['date'] = cube['bucket'].dt.normalize()
+    cube['hour'] = cube['bucket'].dt.hour
+    cube['weekday'] = cube['bucket'].dt.day_name()
+    return cube
+
+
+def _finalize(cube, metric, how):
+    if how == 'sum':
+        return cube[f'{metric}_sum']
+    if how == 'mean':
+        return cube[f'{metric}_sum'] / cube[f'{metric}_count']
+    raise ValueError(f"Unknown aggregation {how!r}, expected 'sum' or 'mean'")
+
+
+class Rollup:
+    """Hourly and daily partial aggregates of a time-series DataFrame.
+
+    Build it once per data refresh; every query then scans at most one row
+    per hour of the requested period instead of the raw rows.
+    """
+
+    def __init__(self, hourly, metrics):
+        self.metrics = list(metrics)
+        self.columns = [f'{metric}_{part}' for metric in self.metrics for part in ('sum', 'count')]
+        hourly = hourly[['bucket'] + self.columns]
+        self.hourly = _with_calendar(hourly.copy())
+        daily = hourly.assign(bucket=hourly['bucket'].dt.normalize())
+        self.daily = _with_calendar(daily.groupby('bucket', sort=True).sum().reset_index())
+
+    @classmethod
+    def from_frame(cls, df, metrics, time_col='datetime'):
+        """Build the rollup from raw rows."""
+        return cls(partial_aggregates(df, metrics, time_col=time_col), metrics)
+
+    def append(self, df, time_col='datetime'):
+        """Return a new rollup with the raw rows of ``df`` merged in."""
+        new = partial_aggregates(df, self.metrics, time_col=time_col)
+        return Rollup(merge(self.hourly[['bucket'] + self.columns], new), self.metrics)
+
+    def since(self, start):
+        """Return a new rollup without the buckets that end before ``start``."""
+        hourly = self.hourly[self.hourly['bucket'] >= pd.Timestamp(start).floor('h')]
+        return Rollup(hourly, self.metrics)
+
+    def window(self, since):
+        """Return one row of partial aggregates per day, for buckets starting at or after ``since``.
+
+        Whole days come from the daily rollup; only the first day is read
+        from the hourly one. Buckets that start before ``since`` are left out,
+        which is exact when rows sit on hour boundaries.
+        """
+        since = pd.Timestamp(since).ceil('h')
+        first_day = since.normalize()
+        if since == first_day:
+            return self.daily[self.daily['bucket'] >= first_day]
+        head = self.hourly[(self.hourly['bucket'] >= since) & (self.hourly['bucket'] < first_day + pd.Timedelta(days=1))]
+        head_day = pd.DataFrame({'bucket': [first_day], **{c: [head[c].sum()] for c in self.columns}})
+        tail = self.daily[self.daily['bucket'] > first_day]
+        if head.empty:
+            return tail
+        return pd.concat([_with_calendar(head_day), tail], ignore_index=True)
+
+    def _hours(self, since):
+        return self.hourly[self.hourly['bucket'] >= pd.Timestamp(since).ceil('h')]
+
+    def totals(self, since):
+        """Return ``{metric: (sum, count)}`` over the period."""
+        window = self.window(since)
+        return {
+            metric: (window[f'{metric}_sum'].sum(), int(window[f'{metric}_count'].sum()))
+            for metric in self.metrics
+        }
+
+    def by_date(self, since, metric, how='sum'):
+        """Return a ``date, <metric>`` frame with one row per day of the period."""
+        window = self.window(since)
+        return pd.DataFrame({'date': window['date'].values, metric: _finalize(window, metric, how).values})
+
+    def by_hour(self, since, metric, how='mean'):
+        """Return an ``hour, <metric>`` frame aggregated over the period by hour of day."""
+        hours = self._hours(since)
+        grouped = hours.groupby('hour')[[f'{metric}_sum', f'{metric}_count']].sum()
+        return _finalize(grouped, metric, how).rename(metric).reset_index()
+
+    def heatmap(self, since, metric, how='mean'):
+        """Return an hour x weekday matrix, weekdays ordered from Monday."""
+        hours = self._hours(since)
+        grouped = hours.groupby(['hour', 'weekday'])[[f'{metric}_sum', f'{metric}_count']].sum()
+        matrix = _finalize(grouped, metric, how).unstack('weekday')
+        return matrix.reindex(columns=[day for day in DAY_ORDER if day in matrix.columns])
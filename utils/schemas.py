@@ -0,0 +1,234 @@
+"""Compact dtypes of the dashboard datasets.
+
+``DTYPES`` gives every dataset the smallest dtype that holds its values:
+int8/int16/int32 for counts, float32 for rates and durations (money stays
+float64), categoricals with a fixed category list for the repeated labels
+(countries, provinces, channels, product categories), and datetime64 for
+dates. ``compact`` converts a frame and refuses values that would not fit;
+``validate`` checks a frame loaded from a cache or a database.
+
+``python -m utils.schemas`` prints the memory used by each dataset with the
+pandas default dtypes and with the compact ones.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utils.data_generator import (
+    CATEGORIES, CHANNELS, COUNTRIES, PRODUCTS, PROVINCES, generate_country_data, generate_product_data,
+    generate_province_data
+)
+
+# Fixed categories, so that chunks concatenated later keep the categorical dtype
+COUNTRY = pd.CategoricalDtype([country['country'] for country in COUNTRIES])
+COUNTRY_CODE = pd.CategoricalDtype([country['code'] for country in COUNTRIES])
+PROVINCE = pd.CategoricalDtype([province['province'] for province in PROVINCES])
+PROVINCE_CODE = pd.CategoricalDtype([province['code'] for province in PROVINCES])
+CHANNEL = pd.CategoricalDtype(CHANNELS)
+CATEGORY = pd.CategoricalDtype(CATEGORIES)
+PRODUCT = pd.CategoricalDtype(PRODUCTS)
+
+DATETIME = np.dtype('datetime64[ns]')
+
+DTYPES = {
+    'sample': {
+        'date': DATETIME,
+        'ventes': np.int16,
+        'utilisateurs': np.int16,
+        'revenus': np.float64,
+        'conversions': np.float32,
+    },
+    'analytics': {
+        'datetime': DATETIME,
+        'date': DATETIME,
+        'hour': np.int8,
+        'traffic': np.int32,
+        'bounce_rate': np.float32,
+        'page_views': np.int32,
+        'session_duration': np.float32,
+    },
+    'geo': {
+        'country': COUNTRY,
+        'code': COUNTRY_CODE,
+        'lat': np.float32,
+        'lon': np.float32,
+        'visitors': np.int32,
+        'revenue': np.float64,
+        'conversion_rate': np.float32,
+        'avg_session_duration': np.int16,
+    },
+    'canada': {
+        'province': PROVINCE,
+        'code': PROVINCE_CODE,
+        'visitors': np.int16,
+    },
+    'geo_points': {
+        'lat': np.float32,
+        'lon': np.float32,
+        'country_code': COUNTRY_CODE,
+        'province_code': PROVINCE_CODE,
+        'visitors': np.int16,
+        'revenue': np.float64,
+        'conversions': np.int16,
+    },
+    'sales': {
+        'date': DATETIME,
+        'sales': np.int16,
+        'revenue': np.float64,
+        'customers': np.int16,
+        'avg_order_value': np.float32,
+    },
+    'users': {
+        'date': DATETIME,
+        'active_users': np.int32,
+        'new_users': np.int32,
+        'returning_users': np.int32,
+        'session_duration': np.float32,
+        'page_views': np.int32,
+        'bounce_rate': np.float32,
+    },
+    'marketing': {
+        'date': DATETIME,
+        'channel': CHANNEL,
+        'spend': np.float64,
+        'impressions': np.int32,
+        'clicks': np.int32,
+        'conversions': np.int32,
+        'cpc': np.float32,
+        'ctr': np.float32,
+        'conversion_rate': np.float32,
+    },
+    'products': {
+        'product': PRODUCT,
+        'units_sold': np.int32,
+        'revenue': np.float64,
+        'rating': np.float32,
+        'reviews': np.int32,
+        'category': CATEGORY,
+    },
+}
+
+
+class SchemaError(ValueError):
+    """A frame does not match (or cannot be converted to) its dataset's dtypes."""
+
+
+def _dtypes(name):
+    if name not in DTYPES:
+        raise ValueError(f"Unknown dataset {name!r}, expected one of {sorted(DTYPES)}")
+    return DTYPES[name]
+
+
+def _convert(column, values, dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        unknown = values.notna() & ~values.isin(dtype.categories)
+        if unknown.any():
+            raise SchemaError(f"{column}: values outside the categories, e.g. {values[unknown].iloc[0]!r}")
+        return values.astype(dtype)
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'M':
+        return pd.to_datetime(values).astype(dtype)
+    if dtype.kind in 'iu' and len(values):
+        if values.isna().any():
+            raise SchemaError(f"{column}: missing values in an integer column")
+        info = np.iinfo(dtype)
+        low, high = values.min(), values.max()
+        if low < info.min or high > info.max:
+            raise SchemaError(f"{column}: values in [{low}, {high}] do not fit in {dtype}")
+    return values.astype(dtype)
+
+
+def compact(name, df):
+    """Return ``df`` with the compact dtypes of dataset ``name``."""
+    dtypes = _dtypes(name)
+    missing = [column for column in dtypes if column not in df.columns]
+    if missing:
+        raise SchemaError(f"{name}: missing columns {missing}")
+    converted = {
+        column: values if values.dtype == dtypes.get(column, values.dtype) else _convert(column, values, dtypes[column])
+        for column, values in df.items()
+    }
+    return pd.DataFrame(converted, index=df.index)
+
+
+def validate(name, df):
+    """Raise ``SchemaError`` unless ``df`` has the columns and dtypes of dataset ``name``."""
+    problems = [
+        f"{column}: {'missing' if column not in df.columns else df[column].dtype} (expected {dtype})"
+        for column, dtype in _dtypes(name).items()
+        if column not in df.columns or df[column].dtype != dtype
+    ]
+    if problems:
+        raise SchemaError(f"{name}: " + '; '.join(problems))
+    return df
+
+
+def default_dtypes(df):
+    """Return ``df`` with the dtypes pandas gives rows built in Python.
+
+    Integers and floats become 64-bit, labels become Python strings, and a
+    ``date`` column holding midnights becomes ``datetime.date`` objects, as
+    built by the original page loops.
+    """
+    converted = {}
+    for column, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype.kind in 'OT':
+            converted[column] = values.astype(object)
+        elif values.dtype.kind in 'iu':
+            converted[column] = values.astype(np.int64)
+        elif values.dtype.kind == 'f':
+            converted[column] = values.astype(np.float64)
+        elif column == 'date' and values.dtype.kind == 'M' and 'datetime' in df.columns:
+            converted[column] = pd.Series(values.dt.date, index=df.index, dtype=object)
+        else:
+            converted[column] = values
+    return pd.DataFrame(converted, index=df.index)
+
+
+def memory_report(frames):
+    """Return the default and compact memory of each ``{name: compact frame}``."""
+    rows = []
+    for name, df in frames.items():
+        compact_bytes = int(df.memory_usage(deep=True, index=False).sum())
+        default_bytes = int(default_dtypes(df).memory_usage(deep=True, index=False).sum())
+        rows.append({
+            'dataset': name,
+            'rows': len(df),
+            'default_mb': default_bytes / 2**20,
+            'compact_mb': compact_bytes / 2**20,
+            'ratio': default_bytes / compact_bytes if compact_bytes else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def sample_frames(days=90, freq='h'):
+    """Build every dataset once, in its compact form, for the memory report."""
+    from utils.streaming import generate_range
+
+    end = pd.Timestamp.now().floor('D')
+    start = end - pd.Timedelta(days=days)
+    frames = {
+        name: compact(name, generate_range(name, start, end, freq=freq if name == 'analytics' else None))
+        for name in ('sample', 'analytics', 'sales', 'users', 'marketing')
+    }
+    frames['geo'] = compact('geo', generate_country_data())
+    frames['canada'] = compact('canada', generate_province_data())
+    frames['products'] = compact('products', generate_product_data(engine='numpy'))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of each dataset with default and compact dtypes.")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--freq', default='h', help="granularity of the analytics dataset")
+    args = parser.parse_args()
+
+    report = memory_report(sample_frames(args.days, args.freq))
+    print(f"{'jeu':<12}{'lignes':>10}{'défaut (Mo)':>14}{'compact (Mo)':>14}{'gain':>8}")
+    for row in report.itertuples():
+        print(f"{row.dataset:<12}{row.rows:>10,}{row.default_mb:>14.2f}{row.compact_mb:>14.2f}{row.ratio:>7.1f}×")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Mergeable summaries of large collections: distinct counts, quantiles, sample means.
+
+- ``HyperLogLog`` counts the distinct values of a collection of ids in
+  ``2**p`` one-byte registers (4 KB for ``p=12``), with a relative standard
+  error of ``1.04 / sqrt(2**p)`` (1.6 %);
+- ``TDigest`` keeps about ``compression / 2`` weighted centroids of a
+  distribution, small at the tails and larger in the middle, and answers
+  quantiles;
+- ``stratified_mean`` estimates a mean and its 95 % confidence interval from
+  uniform samples of each stratum (e.g. one per day).
+
+Every summary is built from numpy arrays in one vectorized pass and merges
+without going back to the data, so summaries kept per day combine into any
+period.
+"""
+import numpy as np
+
+# Two-sided 95 % quantile of the normal distribution
+Z95 = 1.959963984540054
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def hash64(values):
+    """Return the 64-bit SplitMix64 mix of integer ``values``, well spread over the 64 bits."""
+    x = np.asarray(values).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(values):
+    # Position of the highest set bit of uint64 values (0 for 0), computed on
+    # 32-bit halves, which float64 holds exactly
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(
+            high > 0, np.floor(np.log2(high)) + 33,
+            np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+        ).astype(np.int64)
+
+
+class HyperLogLog:
+    """Distinct count of 64-bit ids, in ``2**p`` registers."""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def from_values(cls, values, p=12):
+        sketch = cls(p)
+        sketch.add(values)
+        return sketch
+
+    def add(self, values):
+        """Add integer ids (hashed here) to the sketch."""
+        hashed = hash64(values)
+        index = (hashed >> np.uint64(64 - self.p)).astype(np.int64)
+        # Rank of the first set bit of the remaining 64 - p bits
+        rest = (hashed << np.uint64(self.p)) & _MASK64
+        rank = np.minimum(65 - _bit_length(rest), 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    @classmethod
+    def merge(cls, sketches):
+        """Return the sketch of the union of ``sketches``."""
+        sketches = list(sketches)
+        return cls(sketches[0].p, np.maximum.reduce([sketch.registers for sketch in sketches]))
+
+    def estimate(self):
+        return estimate_registers(self.registers)
+
+    def interval(self, z=Z95):
+        """Return ``(estimate, low, high)``, the bounds at ``z`` standard errors."""
+        return with_error(self.estimate(), relative_error(self.p), z)
+
+
+def relative_error(p):
+    """Return the relative standard error of a ``HyperLogLog`` with ``2**p`` registers."""
+    return 1.04 / np.sqrt(2 ** p)
+
+
+def with_error(estimate, relative, z=Z95):
+    """Return ``(estimate, low, high)`` for a relative standard error."""
+    return estimate, max(float(estimate * (1 - z * relative)), 0.0), float(estimate * (1 + z * relative))
+
+
+def estimate_registers(registers):
+    """Return the distinct count of a register array (merge several with ``max`` over axis 0 first)."""
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        # Small range: linear counting of the empty registers
+        return float(m * np.log(m / zeros))
+    return float(raw)
+
+
+def _k_scale(q, compression):
+    # k1 scale function: centroids span one unit of k, so they are small near
+    # q = 0 and q = 1 and large in the middle
+    return compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0.0, 1.0) - 1)
+
+
+class TDigest:
+    """Quantiles of a distribution from weighted centroids."""
+
+    def __init__(self, means, weights, low, high, compression=200):
+        self.means = means
+        self.weights = weights
+        self.low = low
+        self.high = high
+        self.compression = compression
+
+    @classmethod
+    def _compress(cls, means, weights, low, high, compression):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        # Each value (or centroid) joins the centroid of the unit of k where its left edge falls
+        left = (np.cumsum(weights) - weights) / total
+        groups = np.floor(_k_scale(left, compression) - _k_scale(0.0, compression)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+        return cls(merged_means, merged_weights, low, high, compression)
+
+    @classmethod
+    def from_values(cls, values, compression=200):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return cls(np.empty(0), np.empty(0), np.nan, np.nan, compression)
+        return cls._compress(values, np.ones(len(values)), values.min(), values.max(), compression)
+
+    @classmethod
+    def merge(cls, digests, compression=None):
+        """Return the digest of the union of ``digests``."""
+        digests = [digest for digest in digests if len(digest.weights)]
+        compression = compression or (digests[0].compression if digests else 200)
+        if not digests:
+            return cls(np.empty(0), np.empty(0), np.nan, np.nan, compression)
+        return cls._compress(
+            np.concatenate([digest.means for digest in digests]),
+            np.concatenate([digest.weights for digest in digests]),
+            min(digest.low for digest in digests), max(digest.high for digest in digests),
+            compression,
+        )
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def __sizeof__(self):
+        return self.means.nbytes + self.weights.nbytes
+
+    def _quantiles(self, q):
+        # Centroids stand at the middle of their ranks; the extremes at both ends
+        cumulative = np.cumsum(self.weights)
+        ranks = np.r_[0.0, cumulative - self.weights / 2, cumulative[-1]]
+        values = np.r_[self.low, self.means, self.high]
+        return np.interp(np.asarray(q) * cumulative[-1], ranks, values)
+
+    def quantile(self, q):
+        """Return the value at quantile ``q`` (between 0 and 1)."""
+        if not len(self.weights):
+            return None
+        return float(self._quantiles(q))
+
+    def interval(self, q):
+        """Return ``(estimate, low, high)``: the quantile and the values at both ends of its centroid.
+
+        The digest only knows the mean of each centroid, so the quantile can
+        be anywhere among the ranks the centroid holding it covers.
+        """
+        if not len(self.weights):
+            return None, None, None
+        cumulative = np.cumsum(self.weights)
+        total = cumulative[-1]
+        i = min(int(np.searchsorted(cumulative, q * total)), len(cumulative) - 1)
+        start, end = (cumulative[i] - self.weights[i]) / total, cumulative[i] / total
+        low, estimate, high = self._quantiles([start, q, end])
+        return float(estimate), float(low), float(high)
+
+
+def stratified_mean(sizes, sample_counts, sample_sums, sample_squares, z=Z95):
+    """Return ``(estimate, low, high)`` of a mean from uniform samples of each stratum.
+
+    Arrays hold, per stratum, its size, the size of its sample and the sum
+    and sum of squares of the sampled values. The variance of the estimate
+    accounts for the share of each stratum that was sampled (finite
+    population correction), so fully sampled strata add no error.
+    """
+    sizes, n = np.asarray(sizes, np.float64), np.asarray(sample_counts, np.float64)
+    sums, squares = np.asarray(sample_sums, np.float64), np.asarray(sample_squares, np.float64)
+    keep = n > 0
+    sizes, n, sums, squares = sizes[keep], n[keep], sums[keep], squares[keep]
+    total = sizes.sum()
+    if not total:
+        return None, None, None
+    means = sums / n
+    variances = np.where(n > 1, (squares - n * means ** 2) / np.maximum(n - 1, 1), 0.0)
+    weights = sizes / total
+    estimate = float(np.sum(weights * means))
+    error = z * float(np.sqrt(np.sum(weights ** 2 * (1 - n / sizes) * np.maximum(variances, 0.0) / n)))
+    return estimate, estimate - error, estimate + error
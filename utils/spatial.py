@@ -0,0 +1,169 @@
+"""Spatial grid of pre-aggregated visitor locations, at several zoom levels.
+
+The grid cuts the equirectangular map into square cells: at level ``z`` a
+cell is ``360 / 2**z`` degrees wide and high, and its id is
+``iy * 2**z + ix``, where ``ix`` counts cells eastwards from longitude -180
+and ``iy`` northwards from latitude -90. The four cells of a level ``z + 1``
+square make one cell of level ``z`` (``ix // 2, iy // 2``), like the tiles
+of a web map.
+
+Locations are aggregated once at the finest level (``MAX_LEVEL``), by the
+data source (``grid_partials``: in pandas, or a GROUP BY in the database),
+per cell and region (country, province), so that a cell crossing a border
+is split. ``SpatialGrid`` then rolls the cells up level by level, keeps
+each level sorted by cell id, and answers:
+
+- ``cells(level, bounds)``: the non-empty cells of a view, read with one
+  binary search per row of cells instead of a scan;
+- ``level_for(bounds, ...)``: the finest level whose cells are still a few
+  pixels wide in that view;
+- ``by_region(key, ...)``: per country or province totals, rolled up from
+  the finest cells instead of the locations.
+
+Metrics are sums (visitors, revenue, conversions, plus the number of
+locations); ratios are computed from the sums by the caller.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+MIN_LEVEL = 1
+MAX_LEVEL = 12
+
+# Smallest cell drawn, in pixels: a view uses the finest level whose cells are at least this wide
+MIN_CELL_PX = 6
+
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+
+def cell_size(level):
+    """Return the side of a cell of ``level``, in degrees."""
+    return 360.0 / 2 ** level
+
+
+def cell_index(lat, lon, level=MAX_LEVEL):
+    """Return the ``(ix, iy)`` columns and rows of the cells holding the points.
+
+    The arithmetic (``(lon + 180) * 2**level / 360``, truncated) is the one
+    the SQL sources run, so points land in the same cells in every backend.
+    """
+    cells = 2 ** level
+    ix = np.floor((np.asarray(lon, np.float64) + 180.0) * cells / 360.0).astype(np.int64)
+    iy = np.floor((np.asarray(lat, np.float64) + 90.0) * cells / 360.0).astype(np.int64)
+    return ix, iy
+
+
+def grid_partials(points, keys, metrics, level=MAX_LEVEL, lat='lat', lon='lon'):
+    """Return ``ix, iy, <keys>, points, <metrics>``: the sums per cell of ``level`` and region."""
+    ix, iy = cell_index(points[lat], points[lon], level)
+    # Sum in 64 bits: the compact dtypes of single locations overflow on large cells
+    sums = {
+        metric: points[metric].astype(np.int64 if points[metric].dtype.kind in 'iub' else np.float64)
+        for metric in metrics
+    }
+    grouped = points[list(keys)].assign(ix=ix, iy=iy, points=1, **sums)
+    groups = grouped.groupby(['ix', 'iy'] + list(keys), observed=True, dropna=False, sort=False)
+    return groups[['points'] + list(metrics)].sum().reset_index()
+
+
+class SpatialGrid:
+    """Sums of ``metrics`` per cell at every level from ``MIN_LEVEL`` to ``level``."""
+
+    def __init__(self, regions, keys, metrics, level):
+        self.keys = list(keys)
+        self.metrics = ['points'] + [metric for metric in metrics if metric != 'points']
+        self.level = level
+        # Finest cells split by region, for the per-region rollups
+        self.regions = regions
+        # level -> one row per non-empty cell, sorted by cell id
+        self.levels = {level: regions.groupby('cell', sort=True)[self.metrics].sum().reset_index()}
+        for z in range(level - 1, MIN_LEVEL - 1, -1):
+            finer = self.levels[z + 1]
+            cells = 2 ** (z + 1)
+            parent = (finer['cell'] // cells // 2) * (cells // 2) + finer['cell'] % cells // 2
+            self.levels[z] = finer[self.metrics].groupby(parent.rename('cell'), sort=True).sum().reset_index()
+
+    @classmethod
+    def from_partials(cls, parts, metrics, level=MAX_LEVEL):
+        """Build the grid from ``grid_partials`` rows; the other columns are the region keys."""
+        metrics = [metric for metric in metrics if metric != 'points']
+        keys = [column for column in parts.columns if column not in ['ix', 'iy', 'points'] + metrics]
+        cells = 2 ** level
+        # Points on the east edge or the north pole belong to the last cell
+        ix = parts['ix'].to_numpy(np.int64).clip(0, cells - 1)
+        iy = parts['iy'].to_numpy(np.int64).clip(0, cells // 2 - 1)
+        regions = pd.DataFrame({
+            'cell': iy * cells + ix,
+            **{key: parts[key].array for key in keys},
+            **{metric: parts[metric].to_numpy() for metric in ['points'] + metrics},
+        })
+        return cls(regions, keys, metrics, level)
+
+    def __sizeof__(self):
+        frames = [self.regions] + list(self.levels.values())
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+    def totals(self):
+        """Return ``{metric: sum}`` over every cell."""
+        return {metric: self.levels[self.level][metric].sum() for metric in self.metrics}
+
+    def level_for(self, bounds, width_px, height_px, min_cell_px=MIN_CELL_PX):
+        """Return the finest level whose cells are at least ``min_cell_px`` wide in a view of ``bounds``."""
+        lon0, lat0, lon1, lat1 = bounds
+        # Degrees per pixel of an equirectangular map fitted into the view
+        degrees_per_px = max((lon1 - lon0) / width_px, (lat1 - lat0) / height_px)
+        level = math.floor(math.log2(360.0 / (min_cell_px * degrees_per_px)))
+        return min(max(level, MIN_LEVEL), self.level)
+
+    def cells(self, level, bounds=WORLD):
+        """Return ``cell, lon, lat, <metrics>`` for the non-empty cells of ``level`` in ``bounds``.
+
+        ``lon``/``lat`` are the cell centers. Each row of cells crossing the
+        view is a contiguous range of ids, found by binary search.
+        """
+        table = self.levels[level]
+        cells = 2 ** level
+        (ix0, iy0), (ix1, iy1) = [
+            (min(max(int(ix), 0), cells - 1), min(max(int(iy), 0), cells // 2 - 1))
+            for ix, iy in zip(*cell_index([bounds[1], bounds[3]], [bounds[0], bounds[2]], level))
+        ]
+        ids = table['cell'].to_numpy()
+        rows = np.arange(iy0, iy1 + 1, dtype=np.int64) * cells
+        starts = ids.searchsorted(rows + ix0, 'left')
+        stops = ids.searchsorted(rows + ix1, 'right')
+        lengths = stops - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        view = table.iloc[positions].reset_index(drop=True)
+        size = cell_size(level)
+        view.insert(1, 'lon', (view['cell'] % cells + 0.5) * size - 180.0)
+        view.insert(2, 'lat', (view['cell'] // cells + 0.5) * size - 90.0)
+        return view
+
+    def _matching(self, filters):
+        regions = self.regions
+        for key, value in filters.items():
+            regions = regions[regions[key] == value]
+        return regions
+
+    def by_region(self, key, **filters):
+        """Return ``<key>, <metrics>`` summed per value of ``key`` over the finest cells.
+
+        ``filters`` keep the cells of the given regions, e.g.
+        ``by_region('province_code', country_code='CAN')``.
+        """
+        regions = self._matching(filters)
+        return regions.groupby(key, observed=True, sort=True)[self.metrics].sum().reset_index()
+
+    def extent(self, padding=0.1, **filters):
+        """Return the ``(lon0, lat0, lon1, lat1)`` bounds of the cells of the matching regions."""
+        cells = self._matching(filters)['cell']
+        if cells.empty:
+            return WORLD
+        count = 2 ** self.level
+        size = cell_size(self.level)
+        ix, iy = cells % count, cells // count
+        lon0, lon1 = float(ix.min()) * size - 180.0, float(ix.max() + 1) * size - 180.0
+        lat0, lat1 = float(iy.min()) * size - 90.0, float(iy.max() + 1) * size - 90.0
+        pad = padding * max(lon1 - lon0, lat1 - lat0)
+        return (max(lon0 - pad, -180.0), max(lat0 - pad, -90.0), min(lon1 + pad, 180.0), min(lat1 + pad, 90.0))
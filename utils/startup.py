@@ -0,0 +1,239 @@
+"""Startup path of the dashboard: pre-warmed process, lazy imports, startup timeline.
+
+``python -m utils.startup app.py --server.port 8000 ...`` takes the arguments
+of ``streamlit run`` and starts the Streamlit server only once the process
+is warm, so that a new instance answers its first session from memory:
+
+1. import the modules every page needs (pandas, pyarrow, Plotly Express, the
+   data sources);
+2. load every dataset from the data snapshot of the disk cache
+   (``DASHBOARD_CACHE_DIR``), left by a previous process or by another
+   instance sharing the directory, and only extend it with what happened
+   since; without a snapshot, the datasets are generated and saved;
+3. render the main script headless (``streamlit.testing``), which fills the
+   shared result cache and the chart skeletons (``utils.figures``) of its
+   default view and runs Streamlit's own first-run setup. ``--render all``
+   renders every page, ``--render none`` none.
+
+The server then starts without watching the sources for changes, unless
+``--server.fileWatcherType`` is given. ``--prewarm-only`` runs the steps
+and exits, to build the snapshot ahead of time (e.g. before swapping a
+deployment slot).
+
+Each step is recorded in a timeline whose origin is the start of the
+process, together with the first render of each page, however the server
+was started. The launcher prints it, the first render logs it and the
+Diagnostics page shows it.
+
+``lazy_import`` defers an import to the first use of the module: pages use
+it for Plotly Express, which is only needed when a chart skeleton is built.
+"""
+import argparse
+import glob
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the first step of the warm-up
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'plotly.express', 'plotly.graph_objects', 'utils.data_sources']
+
+
+def _process_start():
+    # Wall-clock start of the process, from /proc on Linux; elsewhere the
+    # import of this module stands in for it
+    try:
+        with open('/proc/self/stat') as handle:
+            # Fields after the command name, which may contain spaces
+            fields = handle.read().rsplit(')', 1)[1].split()
+        with open('/proc/stat') as handle:
+            boot = next(float(line.split()[1]) for line in handle if line.startswith('btime'))
+        return boot + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_START = _process_start()
+
+# Recorded phases: {'phase', 'start_s', 'duration_s', 'detail'}, start_s from PROCESS_START
+_timeline = []
+_lock = threading.Lock()
+# Pages already rendered once (``(page, warm_up)``), and whether the warm-up is running
+_rendered = set()
+_warming = threading.Event()
+
+
+def record(phase, start, duration, detail=None):
+    """Add ``phase``, started at wall-clock ``start`` and lasting ``duration`` seconds, to the timeline."""
+    with _lock:
+        _timeline.append({
+            'phase': phase,
+            'start_s': start - PROCESS_START,
+            'duration_s': duration,
+            'detail': detail,
+        })
+
+
+@contextmanager
+def phase(name, detail=None):
+    """Record the block as phase ``name``."""
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - started, detail)
+
+
+def timeline():
+    """Return the recorded phases, in the order they started."""
+    with _lock:
+        return sorted((dict(entry) for entry in _timeline), key=lambda entry: entry['start_s'])
+
+
+def format_timeline(entries=None):
+    """Return the timeline as a text table."""
+    lines = [f"{'phase':<44}{'début (s)':>11}{'durée (s)':>11}  détail"]
+    for entry in timeline() if entries is None else entries:
+        lines.append(
+            f"{entry['phase']:<44}{entry['start_s']:>11.2f}{entry['duration_s']:>11.3f}  {entry['detail'] or ''}"
+        )
+    return '\n'.join(lines)
+
+
+def first_render(page):
+    """Return True the first time ``page`` renders in this process (warm-up renders counted apart)."""
+    key = (page, _warming.is_set())
+    with _lock:
+        if key in _rendered:
+            return False
+        _rendered.add(key)
+        return True
+
+
+def record_render(page, run_record, starts):
+    """Add the first render of ``page`` (a ``PageRun.record()``) and its sections to the timeline.
+
+    ``starts`` maps each section to its start, in seconds from the start of the render.
+    """
+    start = time.time() - run_record['total_s']
+    label = 'préchauffage' if _warming.is_set() else 'première session'
+    record(f'rendu {page} ({label})', start, run_record['total_s'])
+    for section, seconds in run_record['sections_s'].items():
+        # Chart sends are part of their chart's section
+        if '/' not in section:
+            record(f'  {page} · {section}', start + starts[section], seconds)
+    if not _warming.is_set():
+        logger.info("Startup timeline:\n%s", format_timeline())
+
+
+class LazyModule:
+    """Stand-in for module ``name``, imported on the first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            # Only a real import is recorded, not a module another page already imported
+            timed = self._name not in sys.modules
+            with phase(f'import {self._name}', 'au premier usage') if timed else nullcontext():
+                module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Return module ``name`` if it is already imported, else a ``LazyModule`` importing it on first use."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def page_scripts(main_script):
+    """Return the main script and the scripts of its ``pages/`` directory, in navigation order."""
+    pages = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(main_script)), 'pages', '*.py')))
+    return [os.path.abspath(main_script)] + pages
+
+
+def prewarm(main_script='app.py', render='main'):
+    """Warm the process up: heavy imports, datasets from the snapshot, headless renders.
+
+    ``render`` is ``'main'`` (the main script, which every new session opens),
+    ``'all'`` (every page) or ``'none'``.
+    """
+    _warming.set()
+    try:
+        with phase('imports', ', '.join(HEAVY_MODULES)):
+            for name in HEAVY_MODULES:
+                importlib.import_module(name)
+
+        from utils import disk_cache
+        from utils.data_sources import GRID_KEYS, PAGE_DATASETS, current_version, get_source
+
+        with phase('source'):
+            source = get_source()
+        for dataset in PAGE_DATASETS:
+            # Read through the refresher, which keeps the versions the pages ask for
+            with phase(f'données {dataset}', disk_cache.CACHE_DIR):
+                current_version(dataset)
+        for dataset in GRID_KEYS:
+            with phase(f'grille {dataset}'):
+                source.grid_partials(dataset)
+
+        if render != 'none':
+            from streamlit.testing.v1 import AppTest
+
+            scripts = page_scripts(main_script)
+            for script in scripts if render == 'all' else scripts[:1]:
+                name = os.path.basename(script)
+                with phase(f'rendu headless {name}'):
+                    at = AppTest.from_file(script, default_timeout=600)
+                    at.run()
+                if at.exception:
+                    logger.warning("Warm-up render of %s failed: %s", name, at.exception[0].value)
+    finally:
+        _warming.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Warm the process up, then start Streamlit with the arguments of 'streamlit run'."
+    )
+    parser.add_argument('--prewarm-only', action='store_true', help="build the snapshot and exit")
+    parser.add_argument(
+        '--render', choices=['main', 'all', 'none'], default='main',
+        help="pages rendered headless before the server starts (default: the main script)"
+    )
+    args, streamlit_args = parser.parse_known_args(argv)
+    main_script = streamlit_args[0] if streamlit_args else os.path.join(REPO_ROOT, 'app.py')
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    prewarm(main_script, render=args.render)
+    print(format_timeline(), flush=True)
+    if args.prewarm_only:
+        return
+
+    from streamlit.web import cli
+
+    options = streamlit_args[1:]
+    # Production server: no watching of the sources for changes, which walks
+    # every imported module after each run
+    if not any(option.startswith('--server.fileWatcherType') for option in options):
+        options += ['--server.fileWatcherType', 'none']
+    record('démarrage du serveur', time.time(), 0.0)
+    cli.main(['run', main_script, *options], prog_name='streamlit')
+
+
+if __name__ == '__main__':
+    # Run from the imported module, whose timeline the pages share
+    from utils import startup
+
+    startup.main()
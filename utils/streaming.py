@@ -0,0 +1,214 @@
+"""Seeded, chunked synthetic data for very large date ranges.
+
+Rows live on a fixed time grid (``epoch + k * step``). The grid is cut into
+blocks of ``BLOCK_ROWS`` timestamps and every block draws from its own
+generator seeded with ``(seed, dataset, block number)``, so a row's values
+only depend on the seed and its timestamp: the output is identical whatever
+the chunk size or the way the range is split across processes.
+
+Generate parquet partitions in parallel from the command line:
+
+    python -m utils.streaming analytics 2020-01-01 2025-01-01 out/ --processes 4
+"""
+import argparse
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.data_generator import (
+    CHANNELS,
+    analytics_columns,
+    marketing_columns,
+    sales_columns,
+    sample_columns,
+    user_columns,
+)
+
+# Part of the reproducibility contract: changing it changes the generated values
+BLOCK_ROWS = 8192
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# dataset name -> (default frequency, builder(dates, rng, **params))
+DATASETS = {
+    'sample': ('D', lambda dates, rng: sample_columns(dates, rng)),
+    'analytics': ('h', lambda dates, rng: analytics_columns(dates, rng)),
+    'sales': ('D', lambda dates, rng: sales_columns(dates, rng)),
+    'users': ('D', lambda dates, rng: user_columns(dates, rng)),
+    'marketing': ('D', lambda dates, rng, channels=None: marketing_columns(
+        dates, CHANNELS if channels is None else channels, rng)),
+}
+
+
+def _dataset(name):
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset {name!r}, expected one of {sorted(DATASETS)}")
+    return DATASETS[name]
+
+
+def _step_ns(freq):
+    try:
+        step = pd.Timedelta(freq) if freq[:1].isdigit() else pd.Timedelta(1, unit=freq)
+    except ValueError:
+        raise ValueError(f"Frequency {freq!r} must be a fixed duration such as 'D', 'h' or '15min'") from None
+    if step <= pd.Timedelta(0):
+        raise ValueError(f"Frequency {freq!r} must be a fixed, positive duration")
+    return step.value
+
+
+def _grid_bounds(start, end, step):
+    """Return the [k_start, k_end) grid positions covering ``start <= t < end``."""
+    start_ns, end_ns = pd.Timestamp(start).value, pd.Timestamp(end).value
+    return -(-start_ns // step), -(-end_ns // step)
+
+
+def block_rng(seed, dataset, step, block):
+    """Return the generator for one block of the grid."""
+    salt = zlib.crc32(f'{dataset}:{step}'.encode())
+    # Blocks before 1970 are negative; SeedSequence only takes non-negative words
+    return np.random.default_rng(np.random.SeedSequence([seed, salt, block % 2**64]))
+
+
+def _build_block(dataset, block, seed, step, params, stream=None):
+    _, builder = _dataset(dataset)
+    k = np.arange(block * BLOCK_ROWS, (block + 1) * BLOCK_ROWS, dtype=np.int64)
+    dates = pd.DatetimeIndex(k * step)
+    return builder(dates, block_rng(seed, stream or dataset, step, block), **params)
+
+
+def iter_chunks(dataset, start, end, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, freq=None,
+                as_arrow=False, stream=None, **params):
+    """Yield the rows of ``dataset`` for ``start <= t < end`` in chunks.
+
+    ``chunk_size`` counts timestamps of the grid (a marketing chunk holds
+    ``chunk_size * len(channels)`` rows). Chunks are pandas DataFrames, or
+    ``pyarrow.Table`` objects with ``as_arrow=True``. Only one block is held
+    in memory besides the chunk being assembled.
+
+    ``stream`` names the random stream (the dataset by default): series of
+    the same dataset generated under different names are independent, e.g.
+    one stream per marketing channel.
+    """
+    default_freq, _ = _dataset(dataset)
+    step = _step_ns(freq or default_freq)
+    k_start, k_end = _grid_bounds(start, end, step)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    cached_block, cached_frame = None, None
+    for chunk_start in range(k_start, k_end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, k_end)
+        parts = []
+        k = chunk_start
+        while k < chunk_end:
+            block = k // BLOCK_ROWS
+            if block != cached_block:
+                cached_block = block
+                cached_frame = _build_block(dataset, block, seed, step, params, stream)
+            rows_per_bucket = len(cached_frame) // BLOCK_ROWS
+            stop = min(chunk_end, (block + 1) * BLOCK_ROWS)
+            offset = block * BLOCK_ROWS
+            parts.append(cached_frame.iloc[(k - offset) * rows_per_bucket:(stop - offset) * rows_per_bucket])
+            k = stop
+
+        chunk = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        if as_arrow:
+            import pyarrow as pa
+            chunk = pa.Table.from_pandas(chunk, preserve_index=False)
+        yield chunk
+
+
+def generate_range(dataset, start, end, seed=0, freq=None, stream=None, **params):
+    """Return the whole ``start <= t < end`` range of ``dataset`` as one DataFrame."""
+    chunks = list(iter_chunks(dataset, start, end, seed=seed, freq=freq, stream=stream, **params))
+    if not chunks:
+        default_freq, _ = _dataset(dataset)
+        return _build_block(dataset, 0, seed, _step_ns(freq or default_freq), params, stream).iloc[:0]
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def partition_bounds(start, end, parts, freq):
+    """Split ``[start, end)`` into at most ``parts`` disjoint, block-aligned ranges."""
+    step = _step_ns(freq)
+    k_start, k_end = _grid_bounds(start, end, step)
+    first_block, last_block = k_start // BLOCK_ROWS, -(-k_end // BLOCK_ROWS)
+    edges = np.linspace(first_block, last_block, max(1, parts) + 1).round().astype(np.int64)
+
+    bounds = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        lo_k, hi_k = max(k_start, lo * BLOCK_ROWS), min(k_end, hi * BLOCK_ROWS)
+        if lo_k < hi_k:
+            bounds.append((pd.Timestamp(lo_k * step), pd.Timestamp(hi_k * step)))
+    return bounds
+
+
+def _write_partition(task):
+    import pyarrow.parquet as pq
+
+    dataset, start, end, seed, chunk_size, freq, params, path = task
+    rows = 0
+    writer = None
+    try:
+        for table in iter_chunks(dataset, start, end, seed=seed, chunk_size=chunk_size,
+                                 freq=freq, as_arrow=True, **params):
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return path, rows
+
+
+def generate_partitions(dataset, start, end, output_dir, seed=0, parts=None, processes=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, freq=None, **params):
+    """Write ``[start, end)`` of ``dataset`` as disjoint parquet partitions in parallel.
+
+    Returns a list of ``(path, rows)``. Each partition is streamed chunk by
+    chunk to its file, so memory stays bounded by ``chunk_size``.
+    """
+    default_freq, _ = _dataset(dataset)
+    freq = freq or default_freq
+    processes = processes or os.cpu_count() or 1
+    bounds = partition_bounds(start, end, parts or processes, freq)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tasks = [
+        (dataset, lo, hi, seed, chunk_size, freq, params,
+         os.path.join(output_dir, f'{dataset}-part-{i:05d}.parquet'))
+        for i, (lo, hi) in enumerate(bounds)
+    ]
+    if processes == 1:
+        return [_write_partition(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_write_partition, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic data as parquet partitions.")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('start')
+    parser.add_argument('end')
+    parser.add_argument('output_dir')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--freq', default=None, help="grid frequency, e.g. 'h' or 'min'")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--parts', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    results = generate_partitions(
+        args.dataset, args.start, args.end, args.output_dir, seed=args.seed, parts=args.parts,
+        processes=args.processes, chunk_size=args.chunk_size, freq=args.freq
+    )
+    for path, rows in results:
+        print(f"{path}: {rows:,} lignes")
+    print(f"Total : {sum(rows for _, rows in results):,} lignes")
+
+
+if __name__ == '__main__':
+    main()
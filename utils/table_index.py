@@ -0,0 +1,53 @@
+"""Sorted indexes for the paginated detail table.
+
+``SortedTable`` computes one sort order per sortable column when the data is
+refreshed. A query then finds the rows above each minimum threshold with a
+binary search in those orders, walks the rows in the requested sort order and
+only materializes the requested page.
+"""
+import numpy as np
+
+
+class SortedTable:
+    """Per-column sort orders of a DataFrame, built once and shared by every query."""
+
+    def __init__(self, df, sort_columns):
+        self.df = df
+        self.orders = {}
+        self.sorted_values = {}
+        for column in sort_columns:
+            values = df[column].values
+            order = np.argsort(values, kind='stable')
+            self.orders[column] = order
+            self.sorted_values[column] = values[order]
+
+    def __len__(self):
+        return len(self.df)
+
+    def _suffix(self, column, minimum):
+        # Position of the first row >= minimum in the ascending order
+        return int(np.searchsorted(self.sorted_values[column], minimum, side='left'))
+
+    def row_ids(self, minimums, sort_by, ascending=False):
+        """Return the positions of the rows passing ``minimums``, in ``sort_by`` order."""
+        suffixes = {
+            column: self._suffix(column, minimum)
+            for column, minimum in minimums.items() if minimum is not None
+        }
+        order = self.orders[sort_by]
+
+        # Thresholds on the sort column itself only trim the ordered index
+        start = suffixes.pop(sort_by, 0)
+        ordered = order[start:] if ascending else order[start:][::-1]
+        if not suffixes:
+            return ordered
+
+        passing = np.ones(len(self.df), dtype=bool)
+        for column, position in suffixes.items():
+            passing[self.orders[column][:position]] = False
+        return ordered[passing[ordered]]
+
+    def take(self, ids, page=0, page_size=50):
+        """Return the rows of page ``page`` (zero-based) of ``ids``."""
+        start = page * page_size
+        return self.df.iloc[ids[start:start + page_size]]